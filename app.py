@@ -1,10 +1,13 @@
+import os
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from datetime import datetime
 from utils import get_eodhd_data
-from strategy import apply_hedging_logic
+from strategy import apply_hedging_logic, SignalStats, DEFAULT_PARAMS
+from snapshot import load_snapshot, SNAPSHOT_MAX_AGE_HOURS
+from episodes import EpisodeTable
+from signal_log import SignalLog, SIGNAL_LOG_PATH, params_hash
+from charting import select_window, build_chart
 
 # --- CONFIGURAZIONE PAGINA ---
 st.set_page_config(
@@ -150,23 +153,47 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Parametri attivi della strategia, mostrati nei testi della pagina
+SMA_LABEL = f"SMA {DEFAULT_PARAMS['window']}"
+BUFFER_LABEL = f"{DEFAULT_PARAMS['buffer_pct'] * 100:g}%"
+
 # --- HEADER ---
-st.markdown("""
+st.markdown(f"""
 <div class="main-header">
     <h1>🛡️ Kriterion Quant - FX Hedging Dashboard</h1>
-    <p>Copertura Dinamica EUR/USD | Strategia SMA 200 + Hysteresis Buffer</p>
+    <p>Copertura Dinamica EUR/USD | Strategia {SMA_LABEL} + Hysteresis Buffer</p>
 </div>
 """, unsafe_allow_html=True)
 
 # Caricamento Dati (Cache per evitare chiamate API continue)
 @st.cache_data(ttl=3600)
 def load_data():
+    # Snapshot precalcolato dal job giornaliero: nessuna chiamata API se presente e recente
+    snapshot = load_snapshot("EURUSD.FOREX")
+    if snapshot is not None:
+        df, meta = snapshot
+        return df, SignalStats.from_dict(meta['stats']), EpisodeTable.from_frame(df)
+    # Storico dal registro dei segnali scritto dal bot (nessun ricalcolo), solo se aggiornato
+    # quanto uno snapshot valido: l'ultima barra giornaliera si chiude a fine giornata
+    if os.path.exists(SIGNAL_LOG_PATH):
+        p_hash = params_hash(DEFAULT_PARAMS)
+        log = SignalLog()
+        try:
+            last_date = log.last_date("EURUSD.FOREX", p_hash)
+            is_recent = (last_date is not None and
+                         datetime.now() - (last_date + pd.Timedelta(days=1)) <= pd.Timedelta(hours=SNAPSHOT_MAX_AGE_HOURS))
+            history = log.history("EURUSD.FOREX", p_hash) if is_recent else None
+        finally:
+            log.close()
+        if history is not None and len(history) >= DEFAULT_PARAMS['window']:
+            return history, SignalStats.from_frame(history), EpisodeTable.from_frame(history)
+    # Fallback: download e calcolo dal vivo (statistiche ed episodi calcolati una volta insieme ai segnali)
     raw_df = get_eodhd_data("EURUSD.FOREX")
-    processed_df = apply_hedging_logic(raw_df)
-    return processed_df
+    processed_df, episodes = apply_hedging_logic(raw_df, return_episodes=True)
+    return processed_df, SignalStats.from_frame(processed_df), episodes
 
 try:
-    df = load_data()
+    df, stats, episodes = load_data()
     
     # Ultimi dati
     last_row = df.iloc[-1]
@@ -193,7 +220,7 @@ try:
         sma_diff_pct = (sma_diff / last_row['SMA200']) * 100
         st.markdown(f"""
         <div class="metric-card">
-            <div class="metric-label">📊 SMA 200</div>
+            <div class="metric-label">📊 {SMA_LABEL}</div>
             <div class="metric-value">{last_row['SMA200']:.4f}</div>
             <div class="metric-delta">Distanza: {sma_diff_pct:+.2f}%</div>
         </div>
@@ -230,115 +257,17 @@ try:
 
     # --- GRAFICO INTERATTIVO (PLOTLY) ---
     st.markdown("### 📈 Analisi Storica e Segnali")
-    
-    # Creiamo subplot con indicatore di distanza
-    fig = make_subplots(
-        rows=2, cols=1,
-        shared_xaxes=True,
-        vertical_spacing=0.08,
-        row_heights=[0.75, 0.25],
-        subplot_titles=("EUR/USD con Bande di Isteresi", "Distanza % dalla SMA 200")
-    )
-
-    # Banda di isteresi (area colorata)
-    fig.add_trace(go.Scatter(
-        x=df.index.tolist() + df.index.tolist()[::-1],
-        y=df['Upper_Band'].tolist() + df['Lower_Band'].tolist()[::-1],
-        fill='toself',
-        fillcolor='rgba(45, 90, 135, 0.1)',
-        line=dict(color='rgba(0,0,0,0)'),
-        name='Buffer Zone (±1%)',
-        hoverinfo='skip',
-        showlegend=True
-    ), row=1, col=1)
 
-    # Banda superiore
-    fig.add_trace(go.Scatter(
-        x=df.index, y=df['Upper_Band'],
-        mode='lines', name='Upper Band (+1%)',
-        line=dict(color='rgba(16, 185, 129, 0.6)', width=1, dash='dot'),
-        hovertemplate='Upper: %{y:.4f}<extra></extra>'
-    ), row=1, col=1)
-    
-    # Banda inferiore
-    fig.add_trace(go.Scatter(
-        x=df.index, y=df['Lower_Band'],
-        mode='lines', name='Lower Band (-1%)',
-        line=dict(color='rgba(239, 68, 68, 0.6)', width=1, dash='dot'),
-        hovertemplate='Lower: %{y:.4f}<extra></extra>'
-    ), row=1, col=1)
-
-    # SMA 200
-    fig.add_trace(go.Scatter(
-        x=df.index, y=df['SMA200'],
-        mode='lines', name='SMA 200',
-        line=dict(color='#f59e0b', width=2),
-        hovertemplate='SMA200: %{y:.4f}<extra></extra>'
-    ), row=1, col=1)
-
-    # Prezzo EUR/USD
-    fig.add_trace(go.Scatter(
-        x=df.index, y=df['Close'],
-        mode='lines', name='EUR/USD',
-        line=dict(color='#1e3a5f', width=1.5),
-        hovertemplate='Spot: %{y:.4f}<extra></extra>'
-    ), row=1, col=1)
-    
-    # Marker per cambi di stato
-    hedge_entries = df[df['Action'] == 'OPEN_HEDGE']
-    hedge_exits = df[df['Action'] == 'CLOSE_HEDGE']
-    
-    fig.add_trace(go.Scatter(
-        x=hedge_entries.index, y=hedge_entries['Close'],
-        mode='markers', name='🔴 Entry Hedge',
-        marker=dict(color='#ef4444', size=12, symbol='triangle-down', 
-                   line=dict(color='white', width=2)),
-        hovertemplate='OPEN HEDGE<br>%{x}<br>Price: %{y:.4f}<extra></extra>'
-    ), row=1, col=1)
-    
-    fig.add_trace(go.Scatter(
-        x=hedge_exits.index, y=hedge_exits['Close'],
-        mode='markers', name='🟢 Exit Hedge',
-        marker=dict(color='#10b981', size=12, symbol='triangle-up',
-                   line=dict(color='white', width=2)),
-        hovertemplate='CLOSE HEDGE<br>%{x}<br>Price: %{y:.4f}<extra></extra>'
-    ), row=1, col=1)
-
-    # Subplot: Distanza percentuale
-    colors = ['#ef4444' if x < -1 else '#10b981' if x > 1 else '#6b7280' for x in df['Distance_Pct']]
-    fig.add_trace(go.Bar(
-        x=df.index, y=df['Distance_Pct'],
-        marker_color=colors,
-        name='Distanza %',
-        showlegend=False,
-        hovertemplate='Distanza: %{y:.2f}%<extra></extra>'
-    ), row=2, col=1)
-    
-    # Linee di riferimento sul subplot
-    fig.add_hline(y=1, line_dash="dash", line_color="#10b981", line_width=1, row=2, col=1)
-    fig.add_hline(y=-1, line_dash="dash", line_color="#ef4444", line_width=1, row=2, col=1)
-    fig.add_hline(y=0, line_color="#9ca3af", line_width=1, row=2, col=1)
-
-    fig.update_layout(
-        height=700,
-        template="plotly_white",
-        hovermode="x unified",
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="center",
-            x=0.5,
-            bgcolor="rgba(255,255,255,0.8)"
-        ),
-        margin=dict(l=60, r=40, t=80, b=40),
-        font=dict(family="Inter, sans-serif")
+    # Finestra del grafico: la risoluzione del downsampling segue il periodo selezionato
+    first_date, last_date = df.index[0].date(), df.index[-1].date()
+    chart_range = st.slider(
+        "Periodo visualizzato",
+        min_value=first_date, max_value=last_date,
+        value=(first_date, last_date),
+        format="YYYY-MM-DD"
     )
-    
-    fig.update_xaxes(title_text="", row=1, col=1)
-    fig.update_xaxes(title_text="Data", row=2, col=1)
-    fig.update_yaxes(title_text="Prezzo", row=1, col=1)
-    fig.update_yaxes(title_text="Distanza %", row=2, col=1)
+    # Al massimo MAX_CHART_POINTS punti per traccia; i marker dei segnali restano completi
+    fig = build_chart(select_window(df, chart_range), episodes=episodes)
     
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     st.plotly_chart(fig, use_container_width=True)
@@ -351,23 +280,23 @@ try:
         col_a, col_b = st.columns(2)
         
         with col_a:
-            st.markdown("""
+            st.markdown(f"""
             #### 🎯 Obiettivo
             Proteggere il portafoglio (Asset USA) dal rischio cambio in regime di debolezza strutturale del Dollaro.
             
             #### 📐 Indicatori
-            - **Core:** Media Mobile Semplice 200 giorni
-            - **Filtro:** Isteresi ±1% per evitare whipsaw
+            - **Core:** Media Mobile Semplice {DEFAULT_PARAMS['window']} giorni
+            - **Filtro:** Isteresi ±{BUFFER_LABEL} per evitare whipsaw
             """)
         
         with col_b:
-            st.markdown("""
+            st.markdown(f"""
             #### ⚡ Regole Operative
             
             | Regime | Condizione | Azione |
             |--------|------------|--------|
-            | 🟢 BULL | Price > SMA+1% | Unhedged |
-            | 🔴 BEAR | Price < SMA-1% | Collar attivo |
+            | 🟢 BULL | Price > SMA+{BUFFER_LABEL} | Unhedged |
+            | 🔴 BEAR | Price < SMA-{BUFFER_LABEL} | Collar attivo |
             | ⚪ BUFFER | Tra le bande | Hold stato |
             """)
         
@@ -380,15 +309,39 @@ try:
     
     # --- STATISTICHE AGGIUNTIVE ---
     with st.expander("📊 Statistiche Strategia", expanded=False):
-        total_signals = len(df[df['Action'] != 'HOLD'])
-        hedge_days = len(df[df['State'] == 'BEAR'])
-        unhedged_days = len(df[df['State'] == 'BULL'])
-        
         stat_col1, stat_col2, stat_col3, stat_col4 = st.columns(4)
-        stat_col1.metric("Segnali Totali", total_signals)
-        stat_col2.metric("Giorni Hedged", hedge_days)
-        stat_col3.metric("Giorni Unhedged", unhedged_days)
-        stat_col4.metric("% Tempo Hedged", f"{(hedge_days/(hedge_days+unhedged_days))*100:.1f}%")
+        stat_col1.metric("Segnali Totali", stats.switches)
+        stat_col2.metric("Giorni Hedged", stats.hedge_days)
+        stat_col3.metric("Giorni Unhedged", stats.unhedged_days)
+        stat_col4.metric("% Tempo Hedged", f"{stats.hedge_pct:.1f}%")
+
+        run_col1, run_col2, run_col3, run_col4 = st.columns(4)
+        run_col1.metric("Durata Media Hedge", f"{stats.avg_hedge_duration:.0f} gg")
+        run_col2.metric("Durata Media Unhedged", f"{stats.avg_unhedged_duration:.0f} gg")
+        run_col3.metric("Hedge Più Lungo", f"{stats.longest_run['BEAR']} gg")
+        run_col4.metric("Regime Attuale Da", f"{stats.current_run} gg")
+
+        if stats.recent_signals:
+            st.markdown("##### Ultimi segnali")
+            recent = pd.DataFrame(list(stats.recent_signals)[::-1])
+            recent['date'] = pd.to_datetime(recent['date']).dt.strftime('%Y-%m-%d')
+            st.dataframe(recent.rename(columns={'date': 'Data', 'action': 'Azione', 'close': 'Prezzo'}),
+                         hide_index=True, use_container_width=True)
+
+        # Episodi di copertura: quando, per quanto e come si è mosso EUR/USD
+        hedges = episodes.of_regime('BEAR').iloc[::-1]
+        if not hedges.empty:
+            st.markdown("##### Periodi in copertura")
+            table = pd.DataFrame({
+                'Inizio': hedges['start'].dt.strftime('%Y-%m-%d'),
+                'Fine': hedges['end'].dt.strftime('%Y-%m-%d'),
+                'Giorni': hedges['duration'],
+                'Prezzo Ingresso': hedges['entry_price'].round(4),
+                'Prezzo Uscita': hedges['exit_price'].round(4),
+                'Max Avverso %': hedges['max_adverse_pct'].round(2),
+                'In Corso': hedges['open']
+            })
+            st.dataframe(table, hide_index=True, use_container_width=True)
 
 except Exception as e:
     st.error(f"⚠️ Si è verificato un errore nel caricamento dei dati: {e}")
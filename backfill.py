@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from utils import _download_eodhd
+from data_quality import validate_prices, SPIKE_WINDOW
+
+# Archivio storico per i backtest: ticker=<T>/year=<Y>/data.parquet (partizioni Hive)
+BACKFILL_DIR = os.environ.get("HEDGE_BACKFILL_DIR", os.path.join("data", "history"))
+# Download simultanei: il rate limit per host resta quello del client condiviso (http_client.py)
+MAX_WORKERS = int(os.environ.get("HEDGE_BACKFILL_WORKERS", 8))
+CHECKPOINT_FILE = "_backfill_checkpoint.jsonl"   # il prefisso '_' lo esclude dalla lettura del dataset
+COMPRESSION = "zstd"
+COLUMNS = ['Close', 'high', 'low', 'open', 'volume']
+# Contesto scaricato attorno a ogni anno per i controlli di qualità: SPIKE_WINDOW barre
+# lavorative prima (statistiche dei picchi sin dalla prima barra) e qualche giorno dopo
+# (rientro del picco sull'ultima barra, buchi a cavallo di fine anno)
+CONTEXT_BEFORE_DAYS = SPIKE_WINDOW * 7 // 5 + 14
+CONTEXT_AFTER_DAYS = 10
+
+PARTITIONING = ds.partitioning(pa.schema([('ticker', pa.string()), ('year', pa.int32())]), flavor='hive')
+
+def year_chunks(start, end):
+    """Intervallo [start, end] diviso per anno solare: lista di (anno, inizio, fine)."""
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    return [(year, max(start, pd.Timestamp(year, 1, 1)), min(end, pd.Timestamp(year, 12, 31)))
+            for year in range(start.year, end.year + 1)]
+
+def partition_path(root, ticker, year):
+    return os.path.join(root, f"ticker={ticker}", f"year={year}", "data.parquet")
+
+class Checkpoint:
+    """
+    Avanzamento del backfill su disco: un giornale JSON Lines con una riga per
+    (ticker, anno) completato, aggiunta dopo ogni blocco, così
+    un'esecuzione interrotta riparte dai blocchi mancanti. Ogni registrazione costa
+    O(1) anche con migliaia di blocchi; una riga troncata da un crash viene ignorata.
+    L'anno in corso non viene mai segnato come completo: le sue barre crescono ogni giorno.
+    """
+
+    def __init__(self, root):
+        self.path = os.path.join(root, CHECKPOINT_FILE)
+        self._lock = threading.Lock()
+        self.chunks = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.chunks[self.key(record['ticker'], record['year'])] = record
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def key(ticker, year):
+        return f"{ticker}|{year}"
+
+    def is_done(self, ticker, year, start, end):
+        record = self.chunks.get(self.key(ticker, year))
+        return (record is not None and record['from'] <= start.strftime('%Y-%m-%d')
+                and record['to'] >= end.strftime('%Y-%m-%d'))
+
+    def mark(self, ticker, year, start, end, rows):
+        record = {'ticker': ticker, 'year': year, 'from': start.strftime('%Y-%m-%d'),
+                  'to': end.strftime('%Y-%m-%d'), 'rows': rows}
+        with self._lock:
+            self.chunks[self.key(ticker, year)] = record
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+def _write_partition(root, ticker, year, df):
+    """Scrive un anno di barre (date come colonna) in modo atomico, compresso zstd."""
+    path = partition_path(root, ticker, year)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Il prefisso '.' esclude il file temporaneo dalla lettura del dataset
+    tmp_path = os.path.join(os.path.dirname(path), f".data.{os.getpid()}.{threading.get_ident()}.tmp")
+    table = df[COLUMNS].astype(float).reset_index(names='date')
+    table['date'] = table['date'].astype('datetime64[ms]')
+    table.to_parquet(tmp_path, compression=COMPRESSION, index=False)
+    os.replace(tmp_path, path)
+
+def _backfill_chunk(root, ticker, year, start, end, fetch, validate, quality_policies):
+    """
+    Scarica e salva un anno. Con validate i controlli girano sull'anno più il contesto
+    degli anni vicini, poi si tiene solo l'anno: un anno chiuso non viene più riscaricato,
+    quindi la sua ultima barra non va giudicata come se fosse l'ultima della serie.
+    Le anomalie segnalate possono riguardare anche le barre di contesto.
+    """
+    if validate:
+        df = fetch(ticker, start - pd.Timedelta(days=CONTEXT_BEFORE_DAYS), end + pd.Timedelta(days=CONTEXT_AFTER_DAYS))
+        if not df.empty:
+            df, report = validate_prices(df, quality_policies)
+            if not report.ok:
+                print(f"⚠️ Qualità dati {ticker} {year}: {report.summary()}")
+    else:
+        df = fetch(ticker, start, end)
+    df = df[(df.index >= start) & (df.index <= end)]
+    if not df.empty:
+        _write_partition(root, ticker, year, df)
+    return len(df)
+
+def backfill(tickers, start, end=None, root=BACKFILL_DIR, max_workers=MAX_WORKERS, fetch=_download_eodhd,
+             validate=True, quality_policies=None, max_chunks=None):
+    """
+    Scarica lo storico di più ticker su un intervallo lungo, un anno solare per
+    richiesta, con un pool di thread limitato (il client condiviso applica rate
+    limit e retry). Ogni anno diventa una partizione Parquet e viene registrato
+    nel checkpoint: rieseguendo con gli stessi argomenti si scaricano solo i
+    blocchi mancanti, quelli falliti e l'anno in corso.
+    fetch(ticker, from_date, to_date): download di un blocco (default EODHD).
+    max_chunks: limite di blocchi scaricati in questa esecuzione.
+    Restituisce un dict con blocchi scaricati/saltati, errori, barre e barre/s.
+    """
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    today = pd.Timestamp.now().normalize()
+    end = min(pd.Timestamp(end).normalize(), today) if end is not None else today
+    os.makedirs(root, exist_ok=True)
+    checkpoint = Checkpoint(root)
+
+    pending, skipped = [], 0
+    for ticker in tickers:
+        for year, chunk_start, chunk_end in year_chunks(start, end):
+            if checkpoint.is_done(ticker, year, chunk_start, chunk_end):
+                skipped += 1
+            else:
+                pending.append((ticker, year, chunk_start, chunk_end))
+    if max_chunks is not None:
+        pending = pending[:max_chunks]
+
+    started = time.perf_counter()
+    bars, errors = 0, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_backfill_chunk, root, *chunk, fetch, validate, quality_policies): chunk
+                   for chunk in pending}
+        try:
+            for future in as_completed(futures):
+                ticker, year, chunk_start, chunk_end = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    errors[Checkpoint.key(ticker, year)] = str(e)
+                    continue
+                bars += rows
+                if chunk_end.year < today.year:
+                    checkpoint.mark(ticker, year, chunk_start, chunk_end, rows)
+        except KeyboardInterrupt:
+            # I blocchi completati sono già nel checkpoint: la prossima esecuzione riprende da lì
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+    elapsed = time.perf_counter() - started
+    return {
+        'chunks': len(pending) - len(errors),
+        'skipped': skipped,
+        'errors': errors,
+        'bars': bars,
+        'elapsed_s': elapsed,
+        'bars_per_s': bars / elapsed if elapsed > 0 else 0.0,
+    }
+
+def read_history(tickers, start=None, end=None, columns=None, root=BACKFILL_DIR):
+    """
+    Legge l'archivio con pruning: solo le partizioni dei ticker e degli anni
+    richiesti, solo le colonne indicate (default tutte).
+    tickers: un ticker -> DF indicizzato per data come get_eodhd_data;
+        una lista -> DF indicizzato per data con la colonna 'ticker'.
+    """
+    single = isinstance(tickers, str)
+    names = [tickers] if single else list(tickers)
+    columns = list(columns or COLUMNS)
+
+    condition = ds.field('ticker').isin(names)
+    if start is not None:
+        start = pd.Timestamp(start)
+        condition &= (ds.field('year') >= start.year) & (ds.field('date') >= np.datetime64(start, 'ms'))
+    if end is not None:
+        end = pd.Timestamp(end)
+        condition &= (ds.field('year') <= end.year) & (ds.field('date') <= np.datetime64(end, 'ms'))
+
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name='date'))
+    dataset = ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+    table = dataset.to_table(columns=['date'] + columns + ([] if single else ['ticker']), filter=condition)
+    df = table.to_pandas()
+    if single:
+        return df.sort_values('date').set_index('date')
+    return df.sort_values(['ticker', 'date']).set_index('date')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill dello storico EODHD in Parquet partizionato")
+    parser.add_argument("--tickers", nargs="+", required=True, help="es. EURUSD.FOREX GBPUSD.FOREX")
+    parser.add_argument("--start", required=True, help="data iniziale YYYY-MM-DD")
+    parser.add_argument("--end", help="data finale YYYY-MM-DD (default oggi)")
+    parser.add_argument("--out", default=BACKFILL_DIR, help=f"directory dell'archivio (default {BACKFILL_DIR})")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="download simultanei")
+    parser.add_argument("--max-chunks", type=int, help="scarica al massimo questi blocchi (anni x ticker)")
+    parser.add_argument("--no-validate", action="store_true", help="salta i controlli di qualità")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        stats = backfill(args.tickers, args.start, args.end, root=args.out, max_workers=args.workers,
+                         validate=not args.no_validate, max_chunks=args.max_chunks)
+    except KeyboardInterrupt:
+        print("\n⏸️ Backfill interrotto: rieseguire lo stesso comando per riprendere")
+        raise SystemExit(130)
+    for key, error in stats['errors'].items():
+        print(f"✗ {key}: {error}")
+    print(f"📦 {stats['bars']:,} barre in {stats['chunks']} blocchi ({stats['skipped']} già nel checkpoint) "
+          f"in {stats['elapsed_s']:.1f}s: {stats['bars_per_s']:,.0f} barre/s → {args.out}")
+    if stats['errors']:
+        raise SystemExit(1)
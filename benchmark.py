@@ -0,0 +1,1276 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from strategy import apply_hedging_logic, apply_hedging_logic_wide, get_bands, HysteresisEngine, SignalStats
+from sweep import run_parameter_sweep
+from filters import RegimeFilter, WeeklySmaFilter, AtrBufferFilter, ConfirmationDaysFilter
+from robustness import block_bootstrap_paths, _simulate_chunk, monte_carlo, walk_forward
+from collar import backtest_collar
+from portfolio import RollingCovariance, rolling_covariances, currency_returns, pair_matrix, compute_portfolio_hedges
+from intraday import iter_tick_chunks, resample_ticks_stream, run_intraday
+from profiling import measure
+from stub_server import StubServer
+from http_client import HttpClient
+
+def make_synthetic_prices(n_rows, seed=42, start_price=1.10, daily_vol=0.006):
+    """
+    Genera una serie sintetica EUR/USD (random walk geometrico) con lo stesso
+    formato restituito da get_eodhd_data.
+    """
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, daily_vol, n_rows)
+    close = start_price * np.exp(np.cumsum(returns))
+    index = pd.date_range("1990-01-01", periods=n_rows, freq="D")
+    spread = np.abs(rng.normal(0, daily_vol / 2, n_rows)) * close
+    open_ = np.roll(close, 1)
+    return pd.DataFrame({
+        'Close': close,
+        'high': np.maximum(close, open_) + spread,
+        'low': np.minimum(close, open_) - spread,
+        'open': open_,
+        'volume': np.zeros(n_rows)
+    }, index=index)
+
+def reference_hedging_logic(df, buffer_pct=0.01):
+    """
+    Implementazione originale con iterrows, usata come riferimento di parità.
+    """
+    df = df.copy()
+    df['SMA200'] = df['Close'].rolling(window=200).mean()
+    df['Upper_Band'] = df['SMA200'] * (1 + buffer_pct)
+    df['Lower_Band'] = df['SMA200'] * (1 - buffer_pct)
+    df.dropna(subset=['SMA200'], inplace=True)
+
+    states = []
+    actions = []
+    current_state = 'BULL' if df['Close'].iloc[0] > df['SMA200'].iloc[0] else 'BEAR'
+    for index, row in df.iterrows():
+        previous_state = current_state
+        if current_state == 'BULL':
+            if row['Close'] < row['Lower_Band']:
+                current_state = 'BEAR'
+        elif current_state == 'BEAR':
+            if row['Close'] > row['Upper_Band']:
+                current_state = 'BULL'
+        states.append(current_state)
+        if current_state != previous_state:
+            actions.append("OPEN_HEDGE" if current_state == 'BEAR' else "CLOSE_HEDGE")
+        else:
+            actions.append("HOLD")
+    df['State'] = states
+    df['Action'] = actions
+    df['Distance_Pct'] = ((df['Close'] - df['SMA200']) / df['SMA200']) * 100
+    return df
+
+def timed(func, *args, **kwargs):
+    """Esegue func e restituisce (risultato, secondi)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def check_parity(n_rows=10_000, buffers=(0.0, 0.005, 0.01, 0.02)):
+    """Verifica che la versione vettoriale coincida con il loop originale."""
+    df = make_synthetic_prices(n_rows)
+    for buffer_pct in buffers:
+        expected = reference_hedging_logic(df, buffer_pct)
+        actual = apply_hedging_logic(df, buffer_pct)
+        pd.testing.assert_frame_equal(actual, expected)
+    print(f"✓ Parità verificata su {n_rows:,} righe (buffer {list(buffers)})")
+
+def check_compact_parity(n_rows=10_000, buffer_pct=0.005):
+    """Verifica che l'output compatto (codici + bande derivate) coincida con quello completo."""
+    df = make_synthetic_prices(n_rows)
+    full = apply_hedging_logic(df, buffer_pct)
+    compact = apply_hedging_logic(df, buffer_pct, compact=True)
+    assert (compact['State'].astype(str) == full['State']).all()
+    assert (compact['Action'].astype(str) == full['Action']).all()
+    lower, upper = get_bands(compact)
+    np.testing.assert_allclose(lower, full['Lower_Band'])
+    np.testing.assert_allclose(upper, full['Upper_Band'])
+    assert np.shares_memory(compact['Close'].to_numpy(), df['Close'].to_numpy()), "input copiato"
+    print("✓ Output compatto allineato a quello completo (senza copia dell'input)")
+
+def bench_memory(n_rows=1_000_000):
+    """Byte per riga del DF elaborato e tempo del filtro State == 'BEAR' per ciascuna modalità."""
+    df = make_synthetic_prices(n_rows)
+    modes = [('completo', {}), ('compatto', {'compact': True}),
+             ('compatto float32', {'compact': True, 'float_dtype': np.float32})]
+    print(f"{'Modalità':<18} | {'Byte/riga':>9} | {'Picco (MB)':>10} | {'Filtro BEAR (ms)':>16}")
+    for name, kwargs in modes:
+        processed, stats = measure(apply_hedging_logic, df, **kwargs)
+        bytes_per_row = processed.memory_usage(deep=True).sum() / len(processed)
+        _, t_filter = timed(lambda: processed[processed['State'] == 'BEAR'])
+        print(f"{name:<18} | {bytes_per_row:>9.1f} | {stats['peak_kb'] / 1024:>10.1f} | {t_filter * 1000:>16.2f}")
+
+def check_episodes(n_rows=10_000, n_queries=1_000):
+    """Verifica la tabella degli episodi e le ricerche per data contro una scansione di State."""
+    df, episodes = apply_hedging_logic(make_synthetic_prices(n_rows), return_episodes=True)
+    table = episodes.episodes
+    assert table['duration'].sum() == len(df)
+    assert (table['regime'].iloc[1:].to_numpy() != table['regime'].iloc[:-1].to_numpy()).all()
+    rng = np.random.default_rng(3)
+    dates = df.index[rng.integers(0, len(df), n_queries)]
+    assert [episodes.regime_at(d) for d in dates] == df.loc[dates, 'State'].tolist()
+    for a, b in zip(dates[::2], dates[1::2]):
+        a, b = min(a, b), max(a, b)
+        expected = table[(table['start'] <= b) & (table['end'] >= a)]
+        assert episodes.overlapping(a, b).equals(expected), (a, b)
+    for _, ep in table.iterrows():
+        segment = df.loc[ep['start']:ep['end'], 'Close']
+        worst = segment.min() if ep['regime'] == 'BULL' else segment.max()
+        assert np.isclose(ep['max_adverse_pct'], (worst / ep['entry_price'] - 1) * 100)
+    print(f"✓ {len(episodes)} episodi coerenti con State su {n_rows:,} righe ({n_queries:,} ricerche)")
+
+def check_filters(n_rows=6_000, weeks=40, atr_period=14, multiplier=1.5, days=3):
+    """
+    Verifica i filtri di conferma: filtri neutri = regola base, e la combinazione
+    SMA settimanale + ATR + N giorni contro un loop barra per barra con indicatori
+    ricavati indipendentemente (merge_asof per la settimanale).
+    """
+    df = make_synthetic_prices(n_rows)
+    base = apply_hedging_logic(df)
+    pd.testing.assert_frame_equal(apply_hedging_logic(df, filters=[RegimeFilter(), ConfirmationDaysFilter(1)]), base)
+
+    filters = [WeeklySmaFilter(weeks), AtrBufferFilter(atr_period, multiplier), ConfirmationDaysFilter(days)]
+    actual = apply_hedging_logic(df, filters=filters)
+
+    weekly = df['Close'].resample('W-FRI').last().rolling(weeks).mean().rename('weekly').reset_index()
+    weekly['date'] = weekly.iloc[:, 0]
+    daily = pd.merge_asof(df[['Close']].reset_index().rename(columns={'index': 'date'}),
+                          weekly[['date', 'weekly']], on='date').set_index('date')
+    prev_close = df['Close'].shift(1)
+    tr = pd.concat([df['high'] - df['low'], (df['high'] - prev_close).abs(), (df['low'] - prev_close).abs()], axis=1).max(axis=1)
+    atr = tr.ewm(alpha=1 / atr_period, min_periods=atr_period).mean()
+    sma = df['Close'].rolling(200).mean()
+
+    state, up_run, down_run, states = None, 0, 0, []
+    for i in range(len(df)):
+        close = df['Close'].iloc[i]
+        up = close > sma.iloc[i] + multiplier * atr.iloc[i] and close > daily['weekly'].iloc[i]
+        down = close < sma.iloc[i] - multiplier * atr.iloc[i] and close < daily['weekly'].iloc[i]
+        up_run = up_run + 1 if up else 0
+        down_run = down_run + 1 if down else 0
+        if np.isnan(sma.iloc[i]):
+            continue
+        if state is None:
+            state = 'BULL' if close > sma.iloc[i] else 'BEAR'
+        if up_run >= days:
+            state = 'BULL'
+        elif down_run >= days:
+            state = 'BEAR'
+        states.append(state)
+    assert actual['State'].tolist() == states
+    assert (actual['State'] != base['State']).any(), "I filtri non hanno effetto"
+    print(f"✓ Filtri di conferma allineati al loop di riferimento ({(actual['Action'] != 'HOLD').sum()} "
+          f"segnali contro {(base['Action'] != 'HOLD').sum()} della regola base)")
+
+def bench_filters(n_rows=200_000):
+    """Costo dei filtri di conferma rispetto alla sola SMA (una passata anche con filtri combinati)."""
+    df = make_synthetic_prices(n_rows)
+    variants = [
+        ('SMA200', None),
+        ('+ settimanale', [WeeklySmaFilter()]),
+        ('+ ATR', [AtrBufferFilter()]),
+        ('+ N giorni', [ConfirmationDaysFilter()]),
+        ('tutti', [WeeklySmaFilter(), AtrBufferFilter(), ConfirmationDaysFilter()]),
+    ]
+    _, base_stats = measure(apply_hedging_logic, df)
+    print(f"{'Variante':<14} | {'Tempo (ms)':>10} | {'vs SMA200':>9} | {'Segnali':>7}")
+    for name, filters in variants:
+        processed, stats = measure(apply_hedging_logic, df, filters=filters)
+        print(f"{name:<14} | {stats['wall_s'] * 1000:>10.1f} | {stats['wall_s'] / base_stats['wall_s']:>8.2f}x | "
+              f"{(processed['Action'] != 'HOLD').sum():>7,}")
+
+def check_engine_parity(n_rows=10_000, buffer_pct=0.01):
+    """
+    Verifica che il replay barra-per-barra del motore incrementale (con uno
+    snapshot salvato e ripristinato a metà) dia gli stessi stati del batch.
+    """
+    df = make_synthetic_prices(n_rows)
+    expected = apply_hedging_logic(df, buffer_pct)
+
+    engine = HysteresisEngine(buffer_pct=buffer_pct)
+    states, actions = [], []
+    half = n_rows // 2
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "engine.json")
+        for i, (timestamp, close) in enumerate(df['Close'].items()):
+            if i == half:
+                engine.save(path)
+                engine = HysteresisEngine.load(path, buffer_pct=buffer_pct)
+            state, action, _ = engine.update(close, timestamp)
+            if state is not None:
+                states.append(state)
+                actions.append(action)
+
+    assert states == expected['State'].tolist(), "Stati diversi dal batch"
+    assert actions == expected['Action'].tolist(), "Azioni diverse dal batch"
+    assert np.isclose(engine.sma, expected['SMA200'].iloc[-1], rtol=0, atol=1e-12)
+    assert engine.stats.to_dict() == SignalStats.from_frame(expected).to_dict(), "Statistiche diverse dal batch"
+    print(f"✓ Motore incrementale allineato al batch su {n_rows:,} righe")
+
+def check_engine_revision(n_rows=2_000, buffer_pct=0.01):
+    """
+    Verifica che una chiusura provvisoria corretta dal fornitore venga rielaborata:
+    con revise, con update_many sulla stessa data e dopo un salvataggio/ripristino
+    il motore deve coincidere con uno che ha visto solo la chiusura definitiva.
+    """
+    df = make_synthetic_prices(n_rows)
+    corrected = df.copy()
+    # Correzione ampia sull'ultima barra: cambia regime rispetto alla provvisoria
+    corrected.iloc[-1, corrected.columns.get_loc('Close')] *= 1.2
+    reference = HysteresisEngine(buffer_pct=buffer_pct).update_many(corrected)
+    expected = {k: v for k, v in reference.to_dict().items() if k != 'undo'}
+
+    def snapshot(engine):
+        return {k: v for k, v in engine.to_dict().items() if k != 'undo'}
+
+    direct = HysteresisEngine(buffer_pct=buffer_pct).update_many(df)
+    assert snapshot(direct) != expected, "La correzione non cambia lo stato: verifica poco significativa"
+    direct.revise(corrected['Close'].iloc[-1], corrected.index[-1])
+    assert snapshot(direct) == expected, "revise diverso dal motore con la chiusura definitiva"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "engine.json")
+        HysteresisEngine(buffer_pct=buffer_pct).update_many(df).save(path)
+        restored = HysteresisEngine.load(path, buffer_pct=buffer_pct)
+    restored.update_many(corrected.iloc[-1:])
+    assert snapshot(restored) == expected, "update_many non rielabora la barra corretta dopo il ripristino"
+
+    unchanged = HysteresisEngine(buffer_pct=buffer_pct).update_many(corrected)
+    unchanged.update_many(corrected.iloc[-1:])
+    assert snapshot(unchanged) == expected, "Una barra identica già vista non va rielaborata"
+    try:
+        HysteresisEngine(buffer_pct=buffer_pct).revise(1.0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("revise senza barre deve fallire")
+    print(f"✓ Barra provvisoria corretta rielaborata su {n_rows:,} righe")
+
+def check_wide_parity(n_tickers=5, n_rows=5_000):
+    """Verifica che la passata multi-ticker coincida con la versione singola (anche con buchi)."""
+    frames = {f"T{i}": make_synthetic_prices(n_rows + 100 * i, seed=i) for i in range(n_tickers)}
+    frames["T0"] = frames["T0"].drop(frames["T0"].index[500:520])
+    close = pd.DataFrame({ticker: df['Close'] for ticker, df in frames.items()})
+    wide = apply_hedging_logic_wide(close)
+    for ticker, df in frames.items():
+        expected = apply_hedging_logic(df)
+        assert wide['State'][ticker].dropna().tolist() == expected['State'].tolist(), ticker
+        assert wide['Action'][ticker].dropna().tolist() == expected['Action'].tolist(), ticker
+    print(f"✓ Passata multi-ticker allineata su {n_tickers} ticker")
+
+def bench_hedging_logic(sizes=(10_000, 100_000, 1_000_000), reference_limit=100_000):
+    """Confronta i tempi del motore vettoriale con il loop iterrows."""
+    print(f"{'Righe':>12} | {'iterrows (s)':>12} | {'vettoriale (s)':>14} | {'speedup':>8}")
+    for n_rows in sizes:
+        df = make_synthetic_prices(n_rows)
+        _, t_vec = timed(apply_hedging_logic, df)
+        if n_rows <= reference_limit:
+            _, t_ref = timed(reference_hedging_logic, df)
+            print(f"{n_rows:>12,} | {t_ref:>12.3f} | {t_vec:>14.4f} | {t_ref / t_vec:>7.0f}x")
+        else:
+            print(f"{n_rows:>12,} | {'—':>12} | {t_vec:>14.4f} | {'—':>8}")
+
+def check_sweep_parity(n_rows=5_000, windows=(100, 200, 250), buffers=(0.005, 0.01)):
+    """Verifica le celle della griglia contro apply_hedging_logic sullo stesso periodo."""
+    df = make_synthetic_prices(n_rows)
+    grid = run_parameter_sweep(df['Close'], windows, buffers, max_workers=1)
+    eval_start = df.index[max(windows) - 1]
+    for window in windows:
+        for buffer_pct in buffers:
+            expected = apply_hedging_logic(df, buffer_pct, window=window)
+            expected = expected[expected.index >= eval_start]
+            cell = grid.loc[(window, buffer_pct)]
+            assert cell['switches'] == (expected['Action'] != 'HOLD').sum(), (window, buffer_pct)
+            assert np.isclose(cell['hedge_time_pct'], (expected['State'] == 'BEAR').mean() * 100)
+    print(f"✓ Sweep allineato ad apply_hedging_logic su {len(windows) * len(buffers)} celle")
+
+def bench_sweep(n_rows=5_200, n_windows=50, n_buffers=50):
+    """Griglia n_windows x n_buffers su ~20 anni di barre giornaliere."""
+    df = make_synthetic_prices(n_rows)
+    windows = np.linspace(20, 300, n_windows).astype(int)
+    buffers = np.linspace(0.0, 0.03, n_buffers)
+    _, t_serial = timed(run_parameter_sweep, df['Close'], windows, buffers, max_workers=1)
+    _, t_pool = timed(run_parameter_sweep, df['Close'], windows, buffers)
+    print(f"Sweep {n_windows}x{n_buffers} su {n_rows:,} barre: "
+          f"{t_serial:.2f}s seriale, {t_pool:.2f}s con process pool")
+
+def check_monte_carlo_parity(n_paths=5, n_days=1_500, window=200, buffer_pct=0.01):
+    """Verifica la passata 2-D sui percorsi contro apply_hedging_logic percorso per percorso."""
+    close = make_synthetic_prices(3_000)['Close'].to_numpy()
+    log_returns = np.diff(np.log(close))
+    seed = np.random.SeedSequence(1)
+    results = _simulate_chunk((log_returns, n_paths, n_days, window, buffer_pct, 20, close[-1], seed, 20))
+    paths = block_bootstrap_paths(log_returns, n_paths, n_days, 20, close[-1], np.random.default_rng(seed))
+    index = pd.date_range("2000-01-01", periods=n_days, freq="D")
+    for i, path in enumerate(paths):
+        expected = apply_hedging_logic(pd.DataFrame({'Close': path}, index=index), buffer_pct, window=window)
+        assert results.loc[i, 'switches'] == (expected['Action'] != 'HOLD').sum(), i
+        assert np.isclose(results.loc[i, 'hedge_time_pct'], (expected['State'] == 'BEAR').mean() * 100)
+    print(f"✓ Monte Carlo allineato ad apply_hedging_logic su {n_paths} percorsi")
+
+def bench_robustness(n_paths=10_000, n_days=5_000):
+    """Monte Carlo n_paths x n_days e walk-forward su ~20 anni di barre."""
+    df = make_synthetic_prices(5_200)
+    results, elapsed = timed(monte_carlo, df['Close'], n_paths=n_paths, n_days=n_days)
+    print(f"Monte Carlo {n_paths:,} percorsi x {n_days:,} giorni: {elapsed:.2f}s "
+          f"(switch mediani {results['switches'].median():.0f}, "
+          f"hedge time p5-p95 {results['hedge_time_pct'].quantile(0.05):.1f}%-"
+          f"{results['hedge_time_pct'].quantile(0.95):.1f}%)")
+    folds, elapsed = timed(walk_forward, df['Close'], windows=range(50, 301, 25),
+                           buffers=np.linspace(0.0, 0.03, 13))
+    print(f"Walk-forward {len(folds)} fold (griglia 11x13): {elapsed:.2f}s")
+
+def make_synthetic_portfolio(n_currencies, n_days, n_crosses=10, seed=11, regime_days=50):
+    """Cambi EUR/valuta sintetici, coppie EURxxx più alcuni cross, regimi persistenti ed esposizioni."""
+    rng = np.random.default_rng(seed)
+    currencies = [f"C{i:02d}" for i in range(n_currencies)]
+    index = pd.bdate_range("2005-01-03", periods=n_days)
+    rates = pd.DataFrame(np.exp(np.cumsum(rng.normal(0, 0.006, (n_days, n_currencies)), axis=0)),
+                         index=index, columns=currencies)
+    pairs = [f"EUR{c}.FOREX" for c in currencies]
+    pairs += [f"{currencies[i]}{currencies[i + 1]}.FOREX" for i in range(0, 2 * n_crosses, 2)]
+    blocks = rng.random((n_days // regime_days + 1, len(pairs))) < 0.5
+    states = pd.DataFrame(np.where(np.repeat(blocks, regime_days, axis=0)[:n_days], 'BEAR', 'BULL'),
+                          index=index, columns=pairs)
+    exposures = pd.Series(rng.uniform(1e5, 1e6, n_currencies), index=currencies)
+    return exposures, rates, states
+
+def check_portfolio(n_currencies=8, n_days=600, window=60):
+    """Covarianza incrementale contro ricalcolo completo, coperture contro la soluzione giorno per giorno."""
+    exposures, rates, states = make_synthetic_portfolio(n_currencies, n_days, n_crosses=3)
+    returns = currency_returns(rates).to_numpy()
+    batch = rolling_covariances(returns, window)
+    streaming = RollingCovariance(n_currencies, window)
+    for t, x in enumerate(returns):
+        streaming.update(x)
+        if t >= window - 1 and t % 50 == 0:
+            assert np.allclose(streaming.covariance, batch[t], rtol=1e-9, atol=1e-15), t
+            assert np.allclose(np.cov(returns[t - window + 1:t + 1].T), batch[t], rtol=1e-9, atol=1e-15), t
+
+    result = compute_portfolio_hedges(exposures, rates, states, window=window)
+    A = pair_matrix(list(states.columns), list(exposures.index))
+    e = exposures.to_numpy()
+    for t in range(window - 1, len(result['hedge_ratio']), 97):
+        mask = (states.loc[result['hedge_ratio'].index[t]] == 'BEAR').to_numpy()
+        A_s = A[:, mask]
+        # Varianza minima: minimi quadrati su (e + A_s n) con la radice della covarianza
+        root = np.linalg.cholesky(batch[t]).T
+        n = np.linalg.lstsq(root @ A_s, -root @ e, rcond=None)[0]
+        assert np.allclose(result['minvar_net_hedge'].iloc[t], A_s @ n, rtol=1e-5, atol=1e-3), t
+        touched = np.abs(A_s).sum(axis=1) > 0
+        expected = A_s @ np.linalg.lstsq(A_s, -e * touched, rcond=None)[0]
+        assert np.allclose(result['net_hedge'].iloc[t], expected, atol=1e-6), t
+
+    # Una sola valuta coperta dalla propria coppia: hedge ratio 1; cross sovrapposti non raddoppiano
+    single = compute_portfolio_hedges(exposures[['C00']], rates[['C00']], states[['EURC00.FOREX']].assign(
+        **{'EURC00.FOREX': 'BEAR'}), window=window)
+    assert np.allclose(single['hedge_ratio'].dropna(), 1.0)
+    triangle = states[['EURC00.FOREX', 'EURC01.FOREX']].assign(
+        **{'EURC00.FOREX': 'BEAR', 'EURC01.FOREX': 'BEAR', 'C00C01.FOREX': 'BEAR'})
+    both = compute_portfolio_hedges(exposures[['C00', 'C01']], rates[['C00', 'C01']], triangle, window=window)
+    assert np.allclose(both['net_hedge'], -exposures[['C00', 'C01']].to_numpy())
+    assert np.allclose(both['hedge_ratio'].dropna(), 1.0)
+    print(f"✓ Coperture di portafoglio e covarianza incrementale allineate ({n_currencies} valute, {n_days} giorni)")
+
+def bench_portfolio(n_currencies=50, n_days=5_200):
+    """Coperture di portafoglio su 50 valute x ~20 anni di giorni lavorativi."""
+    exposures, rates, states = make_synthetic_portfolio(n_currencies, n_days)
+    result = compute_portfolio_hedges(exposures, rates, states)
+    print(f"Portafoglio {n_currencies} valute x {n_days:,} giorni ({states.shape[1]} coppie): "
+          f"coperture nette e hedge ratio a varianza minima in {result['elapsed_s']:.2f}s")
+
+def check_collar(n_rows=5_000, vol=0.08, rd=0.05, rf=0.03):
+    """
+    Collar: gli strike riproducono i delta obiettivo, i prezzi Garman–Kohlhagen
+    rispettano la parità put-call e, con tutti i collar chiusi, la somma dei P&L
+    dei trade coincide con il Collar_PnL finale.
+    """
+    from collar import garman_kohlhagen, strike_from_delta, _norm_cdf, PUT_DELTA, CALL_DELTA
+
+    rng = np.random.default_rng(11)
+    spot = rng.uniform(0.8, 1.6, 1_000)
+    strike = spot * rng.uniform(0.8, 1.2, 1_000)
+    t = rng.uniform(1 / 365, 2.0, 1_000)
+    sigma = rng.uniform(0.03, 0.3, 1_000)
+    r_d, r_f = rng.uniform(-0.01, 0.08, 1_000), rng.uniform(-0.01, 0.08, 1_000)
+
+    # Parità put-call: C - P = S e^(-rf t) - K e^(-rd t); a scadenza il payoff intrinseco
+    call = garman_kohlhagen(spot, strike, t, sigma, r_d, r_f, 'call')
+    put = garman_kohlhagen(spot, strike, t, sigma, r_d, r_f, 'put')
+    assert np.allclose(call - put, spot * np.exp(-r_f * t) - strike * np.exp(-r_d * t), rtol=0, atol=1e-6)
+    assert np.allclose(garman_kohlhagen(spot, strike, 0.0, sigma, r_d, r_f, 'put'), np.maximum(strike - spot, 0))
+
+    # Delta spot degli strike: e^(-rf t) N(d1) per la call, -e^(-rf t) N(-d1) per la put
+    def spot_delta(k, kind):
+        d1 = (np.log(spot / k) + (r_d - r_f + 0.5 * sigma ** 2) * t) / (sigma * np.sqrt(t))
+        return np.exp(-r_f * t) * (_norm_cdf(d1) if kind == 'call' else -_norm_cdf(-d1))
+
+    for delta, kind in ((PUT_DELTA, 'put'), (CALL_DELTA, 'call')):
+        k = strike_from_delta(spot, t, sigma, r_d, r_f, delta, kind)
+        assert np.allclose(np.abs(spot_delta(k, kind)), delta, rtol=0, atol=1e-6), f"Delta {kind} errato"
+
+    # Backtest troncato subito dopo l'ultimo CLOSE_HEDGE: nessun collar aperto a fine serie
+    processed = apply_hedging_logic(make_synthetic_prices(n_rows))
+    last_close = np.flatnonzero((processed['Action'] == 'CLOSE_HEDGE').to_numpy())[-1]
+    processed = processed.iloc[:last_close + 1]
+    equity, trades = backtest_collar(processed, vol=vol, rd=rd, rf=rf, notional=1_000_000)
+    assert len(trades) > 0 and (trades['Exit_Reason'] != 'OPEN').all()
+    assert set(trades['Exit_Reason']) == {'ROLL', 'CLOSE_HEDGE'}
+    assert np.isclose(trades['PnL'].sum(), equity['Collar_PnL'].iloc[-1], rtol=1e-12, atol=1e-6), \
+        "Somma dei P&L dei trade diversa dal Collar_PnL finale"
+    assert np.allclose(equity['Hedged'] - equity['Unhedged'], equity['Collar_PnL'])
+    hedged_days = (processed['State'] == 'BEAR').to_numpy()
+    assert ((equity['Trade_Id'] >= 0).to_numpy() == hedged_days).all(), "Collar attivo fuori dal regime BEAR"
+    print(f"✓ Collar: delta degli strike, parità put-call e P&L di {len(trades):,} trade coerenti")
+
+def bench_collar(n_rows=100_000, tenor_days=7):
+    """Backtest del collar con migliaia di rinnovi (pricing vettoriale in un colpo solo)."""
+    df = apply_hedging_logic(make_synthetic_prices(n_rows))
+    (equity, trades), elapsed = timed(backtest_collar, df, vol=0.08, rd=0.05, rf=0.03, tenor_days=tenor_days)
+    print(f"Collar backtest su {n_rows:,} barre: {len(trades):,} collar prezzati in {elapsed:.3f}s")
+
+def write_synthetic_ticks(path, size_mb, seed=7, block_rows=500_000, tick_ms=250):
+    """Scrive a blocchi un CSV di tick sintetici (timestamp epoch ms, price) di circa size_mb MB."""
+    rng = np.random.default_rng(seed)
+    price, t0 = 1.10, 1_600_000_000_000
+    with open(path, 'w') as f:
+        f.write("timestamp,price\n")
+        while f.tell() < size_mb * 1024 * 1024:
+            steps = rng.normal(0, 2e-5, block_rows)
+            prices = price * np.exp(np.cumsum(steps))
+            times = t0 + np.arange(block_rows) * tick_ms
+            pd.DataFrame({'timestamp': times, 'price': prices}).to_csv(
+                f, header=False, index=False, float_format="%.6f")
+            price, t0 = prices[-1], times[-1] + tick_ms
+
+def peak_rss_mb():
+    """Picco di memoria residente del processo (MB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def check_intraday_resample(size_mb=5, rule='1min'):
+    """Verifica che il ricampionamento a blocchi coincida con quello sull'intero file."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "ticks.csv")
+        write_synthetic_ticks(path, size_mb)
+        streamed = pd.concat(resample_ticks_stream(
+            iter_tick_chunks(path, time_unit='ms', chunk_rows=33_333), rule=rule))
+        full = pd.read_csv(path)
+        full.index = pd.to_datetime(full['timestamp'], unit='ms')
+        expected = full['price'].resample(rule).ohlc().dropna()
+        expected.columns = ['open', 'high', 'low', 'Close']
+        expected.index.name = None
+        streamed.index.name = None
+        pd.testing.assert_frame_equal(streamed, expected, check_freq=False)
+    print(f"✓ Ricampionamento a blocchi allineato su {len(streamed):,} barre {rule}")
+
+def bench_intraday(sizes_mb=(256, 2048), rule='1min'):
+    """
+    Ingestione in streaming di file di tick sintetici di dimensione crescente:
+    il picco di memoria deve restare piatto al crescere del file.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size_mb in sizes_mb:
+            path = os.path.join(tmp_dir, f"ticks_{size_mb}.csv")
+            write_synthetic_ticks(path, size_mb)
+            (engine, signals, n_bars), elapsed = timed(run_intraday, path, rule=rule, buffer_pct=0.001,
+                                                         time_unit='ms')
+            file_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"Tick file {file_mb:,.0f} MB → {n_bars:,} barre {rule}, {len(signals)} segnali "
+                  f"in {elapsed:.1f}s ({file_mb / elapsed:.0f} MB/s), picco RSS {peak_rss_mb():.0f} MB")
+            os.remove(path)
+
+def check_downsample(n_rows=20_000, budgets=(4, 5, 9, 64, 501, 2_000)):
+    """
+    Downsampling del grafico: mai più di max_points righe, prima e ultima barra
+    e minimo/massimo della finestra sempre presenti, segnali tutti conservati
+    finché rientrano nel budget. Serie rumorosa (molti segnali), regolare (pochi)
+    e con un solo segnale.
+    """
+    from charting import downsample_frame
+
+    x = np.arange(n_rows)
+    index = pd.date_range("1990-01-01", periods=n_rows, freq="D")
+    smooth = pd.DataFrame({'Close': 1.1 + 0.1 * np.sin(x / 800) + 0.02 * np.sin(x / 37)}, index=index)
+    single = pd.DataFrame({'Close': np.where(x < n_rows // 2, 1.5 - x * 1e-6, 2.0 + x * 1e-6)}, index=index)
+    frames = {'rumorosa': make_synthetic_prices(n_rows), 'regolare': smooth, 'un segnale': single}
+    windows = (None, (index[n_rows // 3], index[2 * n_rows // 3]))
+
+    for name, frame in frames.items():
+        processed = apply_hedging_logic(frame)
+        for x_range in windows:
+            window = processed if x_range is None else processed.loc[x_range[0]:x_range[1]]
+            signals = window.index[window['Action'] != 'HOLD']
+            for max_points in budgets:
+                out = downsample_frame(processed, max_points, x_range=x_range)
+                label = f"{name}, max_points={max_points}, finestra={x_range is not None}"
+                assert len(out) <= max_points, f"{label}: {len(out)} righe"
+                assert out.index.is_monotonic_increasing and out.index.isin(window.index).all(), label
+                assert out.index[0] == window.index[0] and out.index[-1] == window.index[-1], label
+                assert out['Close'].min() == window['Close'].min(), label
+                assert out['Close'].max() == window['Close'].max(), label
+                if len(signals) <= (max_points - 4) // 4:
+                    assert signals.isin(out.index).all(), f"{label}: segnali persi"
+            assert downsample_frame(window, len(window)) is window, "Finestra già nel budget: DF invariato"
+    try:
+        downsample_frame(processed, 3)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("max_points < 4 deve essere rifiutato")
+    print(f"✓ Downsampling entro il budget con estremi e segnali conservati su {n_rows:,} righe")
+
+def check_chart_shading(n_rows=20_000, max_seconds=1.0):
+    """Aree dei periodi in copertura: un rettangolo per episodio BEAR, costo indipendente dal loro numero."""
+    from charting import build_chart
+    df, episodes = apply_hedging_logic(make_synthetic_prices(n_rows), return_episodes=True)
+    n_bear = len(episodes.of_regime('BEAR'))
+    fig, elapsed = timed(build_chart, df, episodes=episodes)
+    rects = [s for s in fig.layout.shapes if s.type == 'rect']
+    assert len(rects) == n_bear, (len(rects), n_bear)
+    assert all(s.xref == 'x' and s.yref == 'y domain' for s in rects)
+    assert len(fig.layout.shapes) == n_bear + 3                               # più le 3 linee di riferimento
+    assert elapsed < max_seconds, f"Grafico con {n_bear} episodi in {elapsed:.2f}s"
+    print(f"✓ Grafico con {n_bear} episodi in copertura ({n_rows:,} righe) in {elapsed * 1000:.0f} ms")
+
+def check_chart_labels(window=50):
+    """Etichette del grafico dal periodo effettivo della SMA (attrs del DF, anche dopo lo snapshot)."""
+    from charting import build_chart
+    from snapshot import write_snapshot, load_snapshot
+    df = apply_hedging_logic(make_synthetic_prices(2_000), window=window)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_snapshot(df, "LABELS", snapshot_dir=tmp_dir)
+        restored, _ = load_snapshot("LABELS", snapshot_dir=tmp_dir)
+    for frame in (df, restored):
+        fig = build_chart(frame)
+        assert f"SMA {window}" in [trace.name for trace in fig.data], [trace.name for trace in fig.data]
+        assert fig.layout.annotations[1].text == f"Distanza % dalla SMA {window}"
+    assert build_chart(df, window=200).layout.annotations[1].text == "Distanza % dalla SMA 200"
+    print(f"✓ Etichette del grafico con SMA {window} (anche da snapshot)")
+
+def bench_pipeline(sizes=(2_000, 20_000, 200_000), ticker="EURUSD.FOREX"):
+    """
+    Misura ogni stadio della pipeline fetch → signal → render → notify su serie
+    sintetiche di lunghezza crescente, con EODHD e Telegram simulati da un server locale.
+    Restituisce una lista di risultati (stadio, righe, tempo, picco memoria, blocchi allocati).
+    """
+    import utils
+    from daily_bot_runner import build_telegram_message
+    from charting import build_chart
+
+    os.environ.setdefault("EODHD_API_KEY", "benchmark")
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+    os.environ.setdefault("TELEGRAM_CHAT_ID", "1")
+    original_urls = utils.EODHD_BASE_URL, utils.TELEGRAM_BASE_URL
+
+    results = []
+    print(f"{'Stadio':<14} | {'Righe':>9} | {'Tempo (ms)':>10} | {'Picco (KB)':>11} | {'Blocchi':>8}")
+    try:
+        for n_rows in sizes:
+            with StubServer(n_rows=n_rows) as stub:
+                utils.EODHD_BASE_URL, utils.TELEGRAM_BASE_URL = f"{stub.url}/api", stub.url
+                df, fetch = measure(utils.get_eodhd_data, ticker, days=n_rows, use_cache=False)
+                processed, signal = measure(apply_hedging_logic, df)
+                last_row, prev_row = processed.iloc[-1], processed.iloc[-2]
+                message, render_message = measure(build_telegram_message, last_row, prev_row, processed)
+                _, render_chart = measure(build_chart, processed)
+                _, notify = measure(utils.send_telegram_message, message)
+
+            stages = [('fetch', fetch), ('signal', signal), ('render_message', render_message),
+                      ('render_chart', render_chart), ('notify', notify)]
+            for stage, stats in stages:
+                results.append({'stage': stage, 'rows': n_rows, **stats})
+                print(f"{stage:<14} | {n_rows:>9,} | {stats['wall_s'] * 1000:>10.2f} | "
+                      f"{stats['peak_kb']:>11,.0f} | {stats['net_blocks']:>8,}")
+    finally:
+        utils.EODHD_BASE_URL, utils.TELEGRAM_BASE_URL = original_urls
+    return results
+
+def bench_signal_log(n_tickers=20, rows_per_ticker=100_000, n_queries=200):
+    """Registro dei segnali con milioni di righe: inserimento, ricerche per data e per intervallo."""
+    from signal_log import SignalLog
+    processed = apply_hedging_logic(make_synthetic_prices(rows_per_ticker + 199))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log = SignalLog(os.path.join(tmp_dir, "signals.db"))
+        start = time.perf_counter()
+        for i in range(n_tickers):
+            log.append(f"T{i}", "bench", processed)
+        t_insert = time.perf_counter() - start
+        _, t_reinsert = timed(log.append, "T0", "bench", processed)
+
+        rng = np.random.default_rng(5)
+        dates = processed.index[rng.integers(0, len(processed) - 365, n_queries)]
+        _, t_point = timed(lambda: [log.is_sent(f"T{i % n_tickers}", "bench", d) for i, d in enumerate(dates)])
+        _, t_range = timed(lambda: [log.history(f"T{i % n_tickers}", "bench", d, d + pd.Timedelta(days=365))
+                                    for i, d in enumerate(dates)])
+        log.close()
+    total = n_tickers * len(processed)
+    print(f"Registro segnali {total:,} righe: inserimento {total / t_insert:,.0f} righe/s, "
+          f"reinserimento idempotente {t_reinsert:.2f}s, "
+          f"ricerca per data {t_point / n_queries * 1e6:.0f} µs, storico di un anno {t_range / n_queries * 1000:.1f} ms")
+
+async def _load_client(url, paths, n_requests, latencies, conditional):
+    """Client keep-alive: n_requests GET in sequenza, con If-None-Match se conditional."""
+    host, port = url.split('//')[1].split(':')
+    reader, writer = await asyncio.open_connection(host, int(port))
+    etags = {}
+    statuses = {}
+    for i in range(n_requests):
+        path = paths[i % len(paths)]
+        extra = f"If-None-Match: {etags[path]}\r\n" if conditional and path in etags else ""
+        start = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{extra}\r\n".encode())
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while (line := await reader.readline()) != b'\r\n':
+            name, _, value = line.decode().partition(':')
+            headers[name.lower()] = value.strip()
+        await reader.readexactly(int(headers['content-length']))
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+        if 'etag' in headers:
+            etags[path] = headers['etag']
+    writer.close()
+    return statuses
+
+def check_signal_api(n_rows=1_000):
+    """API dei segnali: stesso risultato di apply_hedging_logic, ETag/304, errori e cache TTL."""
+    from signal_api import SignalService, SignalServer, TTLCache
+    df = make_synthetic_prices(n_rows)
+    service = SignalService(fetch=lambda ticker: df)
+    expected = apply_hedging_logic(df)
+
+    async def run():
+        signal = await service.handle('/signal/eurusd.forex', {})
+        assert signal.status == 200 and signal is await service.handle('/signal/eurusd.forex', {})
+        body = json.loads(signal.body)
+        assert body['State'] == expected['State'].iloc[-1] and np.isclose(body['Close'], expected['Close'].iloc[-1])
+        history = json.loads((await service.handle('/signal/EURUSD.FOREX/history',
+                                                   {'start': [str(expected.index[-30].date())]})).body)
+        assert [r['State'] for r in history['signals']] == list(expected['State'].iloc[-30:])
+        assert (await service.handle('/signal/EURUSD.FOREX', {'buffer_pct': ['x']})).status == 400
+        assert (await service.handle('/nope', {})).status == 404
+        assert SignalServer._encode(signal, True, True).startswith(b"HTTP/1.1 304")
+
+    asyncio.run(run())
+
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set('a', 1); cache.set('b', 2); cache.get('a'); cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1
+    now[0] = 11
+    assert cache.get('a') is None
+    print("✓ API segnali allineata ad apply_hedging_logic (ETag, errori, cache LRU/TTL)")
+
+def bench_signal_api(n_tickers=20, n_clients=50, requests_per_client=400, n_rows=2_000):
+    """
+    Load test dell'API dei segnali con EODHD simulato dal server locale:
+    richieste al secondo e p99 per risposte in cache (200) e condizionali (304).
+    """
+    import utils
+    from signal_api import SignalService, SignalServer
+
+    os.environ.setdefault("EODHD_API_KEY", "benchmark")
+    original_url = utils.EODHD_BASE_URL
+    tickers = [f"T{i:02d}.FOREX" for i in range(n_tickers)]
+    paths = [f"/signal/{t}" for t in tickers] + [f"/signal/{t}/history?start=2020-01-01" for t in tickers]
+
+    async def run():
+        service = SignalService(fetch=lambda ticker: utils.get_eodhd_data(ticker, days=n_rows, use_cache=False))
+        server = await SignalServer(service, port=0).start()
+        try:
+            start = time.perf_counter()
+            await asyncio.gather(*(service.handle(p.split('?')[0], {}) for p in paths))
+            cold = time.perf_counter() - start
+            for conditional in (False, True):
+                latencies = []
+                start = time.perf_counter()
+                statuses = await asyncio.gather(*(_load_client(server.url, paths[i:] + paths[:i], requests_per_client,
+                                                               latencies, conditional) for i in range(n_clients)))
+                elapsed = time.perf_counter() - start
+                codes = sorted({code for s in statuses for code in s})
+                print(f"API segnali {'condizionali' if conditional else 'in cache':<12}: "
+                      f"{len(latencies) / elapsed:,.0f} req/s, p50 {np.percentile(latencies, 50) * 1000:.2f} ms, "
+                      f"p99 {np.percentile(latencies, 99) * 1000:.2f} ms, status {codes} "
+                      f"({n_clients} client keep-alive)")
+            print(f"API segnali: primo calcolo di {n_tickers} ticker dallo stub in {cold * 1000:.0f} ms")
+        finally:
+            await server.stop()
+
+    try:
+        with StubServer(n_rows=n_rows) as stub:
+            utils.EODHD_BASE_URL = f"{stub.url}/api"
+            asyncio.run(run())
+    finally:
+        utils.EODHD_BASE_URL = original_url
+
+def check_report():
+    """Template compilati: escape Markdown/HTML nei diversi contesti e tutte le combinazioni stato x azione."""
+    from report import compile_template, get_renderer, build_context, LOCALES
+    template = '<b>{a}</b> {a} <i>{a}</i> <code>{a}</code> <a href="{url}">x_y</a>'
+    context = {'a': 'A_B*C`[1]<&>', 'url': 'https://x.io/a_(b)?c=1&d=2'}
+    assert compile_template(template, 'markdown').render(context) == (
+        "*A_B*\\**C`[1]<&>* A\\_B\\*C\\`\\[1]<&> _A_\\__B*C`[1]<&>_ `A_B*C'[1]<&>` "
+        "[x\\_y](https://x.io/a_(b%29?c=1&d=2)")
+    assert compile_template(template, 'html').render(context) == (
+        "<b>A_B*C`[1]&lt;&amp;&gt;</b> A_B*C`[1]&lt;&amp;&gt; <i>A_B*C`[1]&lt;&amp;&gt;</i> "
+        "<code>A_B*C`[1]&lt;&amp;&gt;</code> <a href=\"https://x.io/a_(b)?c=1&amp;d=2\">x_y</a>")
+    assert compile_template("{ {a} }", 'markdown').render({'a': '1'}) == "{ 1 }"
+
+    processed = apply_hedging_logic(make_synthetic_prices(3_000))
+    stats = SignalStats.from_frame(processed)
+    seen = set()
+    for i in np.flatnonzero(processed['Action'].to_numpy() != 'HOLD')[:4].tolist() + [len(processed) - 1]:
+        last, prev = processed.iloc[i], processed.iloc[i - 1]
+        for locale in LOCALES:
+            for fmt in ('markdown', 'html'):
+                text = get_renderer(locale, fmt).render(build_context(last, prev, stats, locale=locale))
+                assert '{' not in text and format(last['Close'], ',.4f') in text
+        seen.add((last['State'], last['Action']))
+    assert len(seen) >= 3, seen
+    print(f"✓ Report compilati: escape Markdown/HTML corretto, {len(LOCALES)} lingue x 2 formati")
+
+def bench_report(n_messages=10_000):
+    """Render di n_messages report da contesti già pronti, per lingua e formato."""
+    from report import get_renderer, build_context, LOCALES
+    processed = apply_hedging_logic(make_synthetic_prices(n_messages + 200))
+    stats = SignalStats.from_frame(processed)
+    rows = list(processed.iterrows())
+    contexts, t_context = timed(lambda: [build_context(last, prev, stats) for (_, prev), (_, last)
+                                         in zip(rows[:-1], rows[1:])][:n_messages])
+    timings = []
+    for locale in LOCALES:
+        for fmt in ('markdown', 'html'):
+            renderer = get_renderer(locale, fmt)
+            _, elapsed = timed(lambda: [renderer.render(c) for c in contexts])
+            timings.append(f"{locale}/{fmt} {elapsed * 1000:.1f} ms")
+    print(f"Render di {len(contexts):,} report: {', '.join(timings)} "
+          f"(costruzione dei contesti dalle righe {t_context * 1000:.0f} ms)")
+
+def make_dirty_prices(n_rows, seed=42):
+    """Serie sintetica su giorni lavorativi con un'anomalia per ogni controllo di qualità."""
+    df = make_synthetic_prices(n_rows, seed=seed)
+    df.index = pd.bdate_range("1990-01-01", periods=n_rows)
+    mid = n_rows // 2
+    df.iloc[mid, df.columns.get_loc('Close')] *= 1.08                        # stampa errata isolata
+    df.iloc[mid, df.columns.get_loc('high')] = df['Close'].iloc[mid]
+    df.iloc[mid + 100:mid + 107] = df.iloc[[mid + 100] * 7].to_numpy()       # feed fermo (barra ripetuta)
+    df.iloc[mid + 200, df.columns.get_loc('low')] = df['high'].iloc[mid + 200] * 1.01   # high < low
+    df.iloc[mid + 300, df.columns.get_loc('Close')] = np.nan                  # Close mancante
+    df = df.drop(df.index[mid + 400:mid + 405])                               # una settimana mancante
+    order = np.arange(len(df))
+    order[[10, 11]] = order[[11, 10]]                                         # due barre invertite
+    return pd.concat([df.iloc[order], df.iloc[[20]]])                         # una data ripetuta
+
+def check_data_quality(n_rows=3_000):
+    """Gate di qualità: ogni anomalia iniettata è rilevata, corretta o bloccata secondo la policy."""
+    from data_quality import validate_prices, DataQualityError
+    clean = make_synthetic_prices(n_rows)
+    clean.index = pd.bdate_range("1990-01-01", periods=n_rows)
+    result, report = validate_prices(clean)
+    assert report.ok and result is clean, report.summary()
+
+    dirty = make_dirty_prices(n_rows)
+    repaired, report = validate_prices(dirty, {'stale': 'repair'})
+    counts = {check: issue['count'] for check, issue in report.issues.items()}
+    assert counts == {'duplicates': 1, 'unsorted': 2, 'ohlc': 2, 'spikes': 1, 'stale': 6, 'gaps': 1}, counts
+    assert repaired.index.is_monotonic_increasing and repaired.index.is_unique
+    assert len(repaired) == len(dirty) - 1 - 1 - 1 - 6                       # duplicato, NaN, picco, ripetizioni
+    assert (repaired['high'] >= repaired[['Close', 'open', 'low']].max(axis=1)).all()
+    assert (repaired['low'] <= repaired[['Close', 'open']].min(axis=1)).all()
+
+    # Picco sull'ultima barra: scartato senza attendere il rientro
+    tail = clean.copy()
+    tail.iloc[-1, tail.columns.get_loc('Close')] *= 1.08
+    tail.iloc[-1, tail.columns.get_loc('high')] = tail['Close'].iloc[-1]
+    assert validate_prices(tail)[0].index[-1] == clean.index[-2]
+
+    for check in ('duplicates', 'spikes', 'gaps'):
+        try:
+            validate_prices(dirty, {check: 'abort'})
+            raise AssertionError(f"{check}: abort atteso")
+        except DataQualityError as e:
+            assert check in e.report.failed()
+    print("✓ Gate di qualità: anomalie rilevate e corrette, policy abort rispettate")
+
+def bench_data_quality(sizes=(100_000, 1_000_000, 2_000_000)):
+    """Costo del gate di qualità per esecuzione, su serie pulite e con anomalie, rispetto alla strategia."""
+    from data_quality import validate_prices
+    for n_rows in sizes:
+        clean = make_synthetic_prices(n_rows)
+        dirty = make_dirty_prices(n_rows)
+        _, t_clean = timed(validate_prices, clean)
+        _, t_dirty = timed(validate_prices, dirty)
+        _, t_signal = timed(apply_hedging_logic, clean)
+        print(f"Gate di qualità {n_rows:>9,} barre: {t_clean * 1000:.0f} ms pulita, {t_dirty * 1000:.0f} ms con anomalie "
+              f"({t_clean / n_rows * 1e9:.0f} ns/barra, {t_clean / t_signal:.1f}x apply_hedging_logic)")
+
+def check_price_cache(n_rows=500, end="2024-06-28", ticker="EURUSD.FOREX"):
+    """
+    Cache locale dei prezzi contro il server simulato: aggiornamento incrementale
+    dall'ultima barra in cache, policy di staleness e force_refresh, scrittura
+    atomica senza file parziali, merge con l'ultimo valore per le date ripetute.
+    """
+    import utils
+    from price_cache import PriceCache
+    os.environ.setdefault("EODHD_API_KEY", "benchmark")
+    original_url = utils.EODHD_BASE_URL
+    try:
+        with StubServer(n_rows=n_rows, end=end) as stub, tempfile.TemporaryDirectory() as tmp_dir:
+            utils.EODHD_BASE_URL = f"{stub.url}/api"
+            series = stub.series(ticker)
+            start = series['date'].iloc[0]
+            stale = PriceCache(tmp_dir, max_age_hours=0)
+            fresh = PriceCache(tmp_dir, max_age_hours=6)
+
+            full = utils.get_eodhd_data(ticker, start_date=start, cache=stale, validate=False)
+            assert stub.queries == [(ticker, start, None)] and len(full) == n_rows
+
+            # Cache ferma a 100 barre fa: si scarica solo dall'ultima barra salvata (riscaricata perché forse parziale)
+            stale.write(ticker, full.iloc[:-100])
+            last_cached = series['date'].iloc[-101]
+            df = utils.get_eodhd_data(ticker, start_date=start, cache=stale, validate=False)
+            assert stub.queries[-1] == (ticker, last_cached, None), stub.queries[-1]
+            pd.testing.assert_frame_equal(df, full, check_freq=False)
+            assert len(stale.read(ticker)) == n_rows
+
+            # Staleness: file fresco servito senza chiamate, force_refresh riscarica tutto il periodo
+            n_queries = len(stub.queries)
+            assert len(utils.get_eodhd_data(ticker, start_date=start, cache=fresh, validate=False)) == n_rows
+            assert len(stub.queries) == n_queries, "Cache fresca ma API chiamata"
+            utils.get_eodhd_data(ticker, start_date=start, cache=fresh, force_refresh=True, validate=False)
+            assert stub.queries[n_queries:] == [(ticker, start, None)], "force_refresh deve riscaricare da start"
+            # Finestra più lunga della cache: si riscarica dalla nuova data iniziale
+            earlier = (pd.Timestamp(start) - pd.Timedelta(days=30)).strftime('%Y-%m-%d')
+            utils.get_eodhd_data(ticker, start_date=earlier, cache=fresh, validate=False)
+            assert stub.queries[-1] == (ticker, earlier, None)
+
+            # Scrittura interrotta a metà (disco pieno): file precedente intatto e nessun temporaneo orfano
+            def partial_write(frame, tmp_path, *args, **kwargs):
+                with open(tmp_path, 'wb') as f:
+                    f.write(b'PAR1')
+                raise OSError("disco pieno")
+
+            path = fresh.path(ticker)
+            before = open(path, 'rb').read()
+            original_to_parquet = pd.DataFrame.to_parquet
+            pd.DataFrame.to_parquet = partial_write
+            try:
+                fresh.write(ticker, full)
+            except OSError:
+                pass
+            else:
+                raise AssertionError("La scrittura interrotta deve propagare l'errore")
+            finally:
+                pd.DataFrame.to_parquet = original_to_parquet
+            assert open(path, 'rb').read() == before, "File in cache modificato da una scrittura fallita"
+            assert os.listdir(tmp_dir) == [os.path.basename(path)], os.listdir(tmp_dir)
+    finally:
+        utils.EODHD_BASE_URL = original_url
+
+    # Merge: a parità di data vince il dato più recente, indice ordinato e senza duplicati
+    dates = pd.date_range("2024-01-01", periods=4, freq="D")
+    cached = pd.DataFrame({'Close': [1.0, 2.0, 3.0]}, index=dates[:3])
+    merged = PriceCache().merge(cached, pd.DataFrame({'Close': [4.0, 30.0]}, index=dates[[3, 2]]))
+    assert merged.index.equals(dates) and merged['Close'].tolist() == [1.0, 2.0, 30.0, 4.0]
+    print("✓ Cache prezzi: download incrementale, staleness, scrittura atomica e merge corretti")
+
+def check_watcher(n_rows=400, end="2024-06-28", ticker="EURUSD.FOREX"):
+    """
+    Modalità watch deterministica: run_watch con quotazioni e sleep iniettati sul
+    server simulato. Il trigger deve far cambiare regime esattamente alla soglia,
+    l'intervallo di polling seguire la distanza e un attraversamento confermato
+    produrre un solo alert, al prezzo giusto.
+    """
+    import utils
+    from watcher import BandWatcher, run_watch, poll_interval, MIN_INTERVAL, MAX_INTERVAL, NEAR_PCT, FAR_PCT
+    from report import format_number
+
+    assert poll_interval(NEAR_PCT) == MIN_INTERVAL and poll_interval(-FAR_PCT) == MAX_INTERVAL
+    assert np.isclose(poll_interval((NEAR_PCT + FAR_PCT) / 2), (MIN_INTERVAL + MAX_INTERVAL) / 2)
+    warmup = BandWatcher(HysteresisEngine().update_many(make_synthetic_prices(50)), notify=lambda message: True)
+    assert warmup.check(pd.Timestamp.now(), 1.1) == {'trigger': None, 'distance_pct': None,
+                                                     'interval': MAX_INTERVAL, 'alert': False}
+
+    os.environ.setdefault("EODHD_API_KEY", "benchmark")
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+    os.environ.setdefault("TELEGRAM_CHAT_ID", "1")
+    original_urls = utils.EODHD_BASE_URL, utils.TELEGRAM_BASE_URL
+    original_cwd = os.getcwd()
+    try:
+        with StubServer(n_rows=n_rows, end=end) as stub, tempfile.TemporaryDirectory() as tmp_dir:
+            utils.EODHD_BASE_URL, utils.TELEGRAM_BASE_URL = f"{stub.url}/api", stub.url
+            os.chdir(tmp_dir)   # cache prezzi di default (percorso relativo) nella directory temporanea
+            series = stub.series(ticker)
+            bars = pd.DataFrame({'Close': series['adjusted_close'].to_numpy()},
+                                index=pd.to_datetime(series['date']).rename('date'))
+            engine = HysteresisEngine().update_many(bars)
+            state_path = os.path.join(tmp_dir, f"{ticker}.json")
+            engine.save(state_path)
+
+            # Il trigger è la chiusura esatta del cambio di regime (la SMA include la nuova barra)
+            trigger, state = engine.trigger_price(), engine.state
+            beyond = -1 if state == 'BULL' else 1
+            for side, flips in ((beyond, True), (-beyond, False)):
+                probe = HysteresisEngine.from_dict(engine.to_dict())
+                probe.update(trigger * (1 + side * 1e-9), bars.index[-1] + pd.Timedelta(days=1))
+                assert (probe.state != state) == flips, f"Trigger {trigger} errato ({state}, lato {side})"
+
+            def price_at(distance_pct):
+                # Inverso di distance_to_trigger: distanza % positiva dal lato del regime attuale
+                return trigger / (1 - distance_pct / 100) if state == 'BULL' else trigger / (1 + distance_pct / 100)
+
+            # Lontano, vicino, un solo sforamento (non confermato), poi sforamento confermato e persistente
+            distances = [3.0, 1.0, 0.1, -0.05, 0.2, -0.1, -0.2, -0.3, 0.5]
+            prices = iter(price_at(d) for d in distances)
+            sleeps = []
+
+            def quote(requested):
+                assert requested == ticker
+                return pd.Timestamp.now(tz='UTC').tz_localize(None).floor('s'), next(prices)
+
+            watcher = run_watch(ticker, state_path, max_polls=len(distances), quote=quote, sleep=sleeps.append)
+            assert watcher.alerts_sent == 1 and len(stub.messages) == 1, "Atteso un solo alert"
+            assert f"`{format_number(price_at(-0.2))}`" in stub.messages[0]['text'], "Alert al prezzo sbagliato"
+            assert f"`{format_number(trigger)}`" in stub.messages[0]['text']
+            expected_sleeps = [poll_interval(d) for d in distances[:-1]]
+            assert np.allclose(sleeps, expected_sleeps), (sleeps, expected_sleeps)
+
+            # Nuova barra giornaliera: la conferma riparte da zero
+            watcher.beyond = 1
+            watcher.set_engine(HysteresisEngine.from_dict(engine.to_dict()))
+            assert watcher.beyond == 1, "Stesso motore: conferma da mantenere"
+            moved = HysteresisEngine.from_dict(engine.to_dict())
+            moved.update(bars['Close'].iloc[-1], bars.index[-1] + pd.Timedelta(days=1))
+            watcher.set_engine(moved)
+            assert watcher.beyond == 0, "Nuova barra: conferma da azzerare"
+    finally:
+        os.chdir(original_cwd)
+        utils.EODHD_BASE_URL, utils.TELEGRAM_BASE_URL = original_urls
+    print(f"✓ Watch: trigger esatto, polling adattivo e un solo alert confermato su {len(distances)} quotazioni")
+
+def check_snapshot(n_rows=3_000, buffer_pct=0.02):
+    """
+    Snapshot della dashboard: il round trip restituisce lo stesso DF e le stesse
+    statistiche, un formato di versione diversa, vecchio o illeggibile fa
+    ricalcolare dal vivo (None) e l'output compatto conserva i suoi parametri.
+    """
+    import snapshot
+    from snapshot import write_snapshot, load_snapshot
+
+    df = make_synthetic_prices(n_rows)
+    full = apply_hedging_logic(df, buffer_pct)
+    compact = apply_hedging_logic(df, buffer_pct, compact=True)
+    params = {'window': 200, 'buffer_pct': buffer_pct}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_snapshot(full, "FULL", params=params, snapshot_dir=tmp_dir)
+        loaded, meta = load_snapshot("FULL", snapshot_dir=tmp_dir)
+        pd.testing.assert_frame_equal(loaded, full, check_dtype=False, check_index_type=False, check_freq=False)
+        assert meta['params'] == params and meta['last_date'] == full.index[-1].isoformat()
+        assert meta['stats'] == SignalStats.from_frame(full).to_dict(), "Statistiche diverse dal DF"
+
+        # Statistiche passate dal chiamante (es. motore incrementale): salvate tali e quali
+        engine = HysteresisEngine(buffer_pct=buffer_pct).update_many(df)
+        write_snapshot(full, "FULL", params=params, snapshot_dir=tmp_dir, stats=engine.stats)
+        assert load_snapshot("FULL", snapshot_dir=tmp_dir)[1]['stats'] == engine.stats.to_dict()
+
+        # Output compatto: niente colonne delle bande, buffer_pct negli attrs
+        write_snapshot(compact, "COMPACT", params=params, snapshot_dir=tmp_dir)
+        loaded, _ = load_snapshot("COMPACT", snapshot_dir=tmp_dir)
+        assert 'Upper_Band' not in loaded and loaded.attrs['buffer_pct'] == buffer_pct
+        assert loaded['State'].tolist() == full['State'].tolist()
+        assert loaded['Action'].tolist() == full['Action'].tolist()
+        for restored, expected in zip(get_bands(loaded), get_bands(full)):
+            assert np.allclose(restored, expected, rtol=0, atol=1e-12), "Bande diverse dopo il round trip"
+
+        # Fallback: versione diversa, snapshot vecchio, file assente o corrotto
+        original_version = snapshot.FORMAT_VERSION
+        snapshot.FORMAT_VERSION = original_version + 1
+        try:
+            assert load_snapshot("FULL", snapshot_dir=tmp_dir) is None, "Versione diversa accettata"
+        finally:
+            snapshot.FORMAT_VERSION = original_version
+        assert load_snapshot("FULL", max_age_hours=0, snapshot_dir=tmp_dir) is None, "Snapshot vecchio accettato"
+        assert load_snapshot("MISSING", snapshot_dir=tmp_dir) is None
+        with open(snapshot.snapshot_path("FULL", tmp_dir), 'r+b') as f:
+            f.truncate(100)
+        assert load_snapshot("FULL", snapshot_dir=tmp_dir) is None, "Snapshot corrotto accettato"
+    print(f"✓ Snapshot: round trip identico su {len(full):,} righe, fallback e parametri compatti corretti")
+
+def check_backfill(n_tickers=3, n_rows=3_000, end="2024-06-30"):
+    """Backfill interrotto e ripreso: nessun blocco riscaricato, archivio identico alla serie del server."""
+    import utils
+    from backfill import backfill, read_history, year_chunks
+    os.environ.setdefault("EODHD_API_KEY", "benchmark")
+    original_url = utils.EODHD_BASE_URL
+    tickers = [f"T{i}.FOREX" for i in range(n_tickers)]
+    try:
+        # Serie con fine fissa: blocchi e righe attese non dipendono dalla data di esecuzione
+        with StubServer(n_rows=n_rows, end=end) as stub, tempfile.TemporaryDirectory() as tmp_dir:
+            utils.EODHD_BASE_URL = f"{stub.url}/api"
+            # Movimento reale (senza rientro) sull'ultimo giorno di un anno chiuso: deve sopravvivere
+            series = stub.series(tickers[0])
+            jump = series['date'] >= "2022-12-31"
+            series.loc[jump, ['open', 'high', 'low', 'close', 'adjusted_close']] *= 1.08
+            start = series['date'].iloc[0]
+            n_chunks = n_tickers * len(year_chunks(start, end))
+            first = backfill(tickers, start, end, root=tmp_dir, max_chunks=5)    # esecuzione interrotta
+            requests_before = stub.requests
+            second = backfill(tickers, start, end, root=tmp_dir)
+            assert first['chunks'] == 5 and second['skipped'] == 5 and not second['errors']
+            assert stub.requests - requests_before == n_chunks - 5, "Blocchi riscaricati"
+            assert first['bars'] + second['bars'] == n_tickers * n_rows
+            requests_before = stub.requests
+            third = backfill(tickers, start, end, root=tmp_dir)                 # anni tutti chiusi
+            assert third['skipped'] == n_chunks and stub.requests == requests_before
+
+            for ticker in tickers:
+                expected = stub.series(ticker)
+                stored = read_history(ticker, root=tmp_dir)
+                assert list(stored.index.strftime('%Y-%m-%d')) == list(expected['date'])
+                assert np.allclose(stored['Close'], expected['adjusted_close'])
+            assert pd.Timestamp("2022-12-31") in read_history(tickers[0], "2022-12-01", "2022-12-31", root=tmp_dir).index
+            window_start, window_end = "2022-03-01", "2023-06-30"
+            expected_rows = sum(stub.series(t)['date'].between(window_start, window_end).sum() for t in tickers)
+            window = read_history(tickers, window_start, window_end, ['Close'], root=tmp_dir)
+            assert list(window.columns) == ['Close', 'ticker'] and len(window) == expected_rows
+    finally:
+        utils.EODHD_BASE_URL = original_url
+    print("✓ Backfill ripreso dal checkpoint senza riscaricare, letture con pruning corrette")
+
+def bench_backfill(n_tickers=10, n_rows=10_000, workers=(1, 8), latency=0.02):
+    """
+    Backfill di decenni di storico per più ticker dal server locale con una latenza
+    per richiesta simile a quella di rete: barre/s del download a blocchi annuali
+    al variare dei worker, ripresa dal checkpoint e lettura con pruning su colonne e date.
+    """
+    import utils
+    from backfill import backfill, read_history
+    os.environ.setdefault("EODHD_API_KEY", "benchmark")
+    original_url = utils.EODHD_BASE_URL
+    tickers = [f"T{i}.FOREX" for i in range(n_tickers)]
+    try:
+        with StubServer(n_rows=n_rows, latency=latency) as stub:
+            utils.EODHD_BASE_URL = f"{stub.url}/api"
+            for ticker in tickers:
+                stub.records(ticker)
+            start = stub.series(tickers[0])['date'].iloc[0]
+            for n_workers in workers:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    stats = backfill(tickers, start, root=tmp_dir, max_workers=n_workers)
+                    resumed = backfill(tickers, start, root=tmp_dir, max_workers=n_workers)
+                    size_mb = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(tmp_dir)
+                                  for f in files) / 1024 / 1024
+                    full, t_full = timed(read_history, tickers, root=tmp_dir)
+                    pruned, t_pruned = timed(read_history, tickers[:5], "2020-01-01", "2020-12-31", ['Close'],
+                                             root=tmp_dir)
+                print(f"Backfill {n_tickers} ticker x {n_rows:,} giorni, {n_workers} worker: {stats['bars']:,} barre "
+                      f"in {stats['chunks']} blocchi, {stats['elapsed_s']:.1f}s ({stats['bars_per_s']:,.0f} barre/s), "
+                      f"ripresa {resumed['elapsed_s'] * 1000:.0f} ms ({resumed['chunks']} blocchi)")
+    finally:
+        utils.EODHD_BASE_URL = original_url
+    print(f"Archivio {size_mb:.1f} MB: lettura completa {len(full):,} righe {t_full * 1000:.0f} ms, "
+          f"con pruning {len(pruned):,} righe {t_pruned * 1000:.1f} ms")
+
+def bench_cold_start(module="daily_bot_runner", runs=5):
+    """
+    Avvio a freddo del bot: tempo di import del modulo e tempo totale del processo
+    (interprete incluso), migliore di `runs` avvii. Verifica che Streamlit non venga importato.
+    """
+    import subprocess
+    code = (f"import time, sys; t = time.perf_counter(); import {module}; "
+            "print(time.perf_counter() - t, 'streamlit' in sys.modules)")
+    best_import, best_total, streamlit_loaded = float('inf'), float('inf'), False
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+        best_total = min(best_total, time.perf_counter() - start)
+        best_import = min(best_import, float(output[0]))
+        streamlit_loaded = streamlit_loaded or output[1] == 'True'
+    print(f"Avvio a freddo {module}: import {best_import * 1000:.0f} ms, processo {best_total * 1000:.0f} ms, "
+          f"Streamlit {'importato ✗' if streamlit_loaded else 'non importato ✓'}")
+    return {'stage': 'cold_start', 'rows': 0, 'wall_s': best_import, 'peak_kb': 0, 'net_blocks': 0}
+
+def save_results(results, path):
+    """Salva i risultati in JSON con i metadati dell'ambiente, per confronti tra versioni."""
+    payload = {
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'results': results
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    print(f"Risultati salvati in {path}")
+
+def compare_results(results, baseline_path, tolerance=0.25):
+    """
+    Confronta i tempi con un file JSON di riferimento.
+    Segnala come regressione ogni stadio più lento di oltre `tolerance` (25%).
+    Restituisce il numero di regressioni.
+    """
+    with open(baseline_path) as f:
+        baseline = {(r['stage'], r['rows']): r for r in json.load(f)['results']}
+    regressions = 0
+    for result in results:
+        reference = baseline.get((result['stage'], result['rows']))
+        if reference is None or reference['wall_s'] <= 0:
+            continue
+        ratio = result['wall_s'] / reference['wall_s']
+        if ratio > 1 + tolerance:
+            regressions += 1
+            print(f"✗ Regressione {result['stage']} @ {result['rows']:,} righe: {ratio:.2f}x più lento")
+    print("✓ Nessuna regressione" if not regressions else f"{regressions} regressioni rilevate")
+    return regressions
+
+def check_http_client(n_requests=40, rate=100.0):
+    """
+    Verifica il client HTTP contro il server locale: retry sugli errori 500 iniettati,
+    rispetto del rate limit in modalità asyncio e timeout rigido.
+    """
+    with StubServer(n_rows=300, fail_every=3) as stub:
+        url = f"{stub.url}/api/eod/EURUSD.FOREX"
+        client = HttpClient(rate_limits={"127.0.0.1": (rate, 1)}, backoff_base=0.01)
+        assert client.get(url).status_code == 200
+
+        async def burst():
+            return await asyncio.gather(*(client.aget(url) for _ in range(n_requests)))
+
+        responses, elapsed = timed(asyncio.run, burst())
+        assert all(r.status_code == 200 for r in responses), "Retry non riusciti"
+        min_elapsed = (stub.requests - 2) / rate
+        assert elapsed >= min_elapsed * 0.9, f"Rate limit non rispettato ({elapsed:.2f}s)"
+
+    # POST non idempotente (sendMessage): nessun retry su 5xx, che duplicherebbe il messaggio
+    with StubServer(fail_every=1) as failing:
+        client = HttpClient(backoff_base=0.01)
+        assert client.post(f"{failing.url}/botX/sendMessage", json={}).status_code == 500
+        assert failing.requests == 1, "POST ripetuto dopo un 5xx"
+        client.post(f"{failing.url}/botX/sendMessage", json={}, idempotent=True)
+        assert failing.requests == 1 + 1 + client.max_retries
+
+    with StubServer(n_rows=10, latency=0.5) as slow:
+        client = HttpClient(timeout=(1, 0.1), max_retries=1, backoff_base=0.01)
+        try:
+            client.get(f"{slow.url}/api/eod/EURUSD.FOREX")
+            raise AssertionError("Timeout non applicato")
+        except Exception as e:
+            assert "timed out" in str(e).lower(), e
+
+    # Timeout di lettura su POST: il server potrebbe aver già eseguito la richiesta
+    with StubServer(n_rows=10, latency=0.5) as slow:
+        client = HttpClient(timeout=(1, 0.1), max_retries=3, backoff_base=0.01)
+        try:
+            client.post(f"{slow.url}/botX/sendMessage", json={})
+            raise AssertionError("Timeout non applicato")
+        except Exception as e:
+            assert "timed out" in str(e).lower(), e
+        time.sleep(1.0)            # lo stub conta la richiesta dopo la latenza
+        assert slow.requests == 1, "POST ripetuto dopo un timeout di lettura"
+    print(f"✓ Client HTTP: retry, rate limit ({n_requests} richieste async in {elapsed:.2f}s) e timeout")
+
+def bench_dispatch(n_chats=100, n_tickers=10):
+    """
+    Fan-out di n_chats x n_tickers messaggi verso il Telegram simulato, con i limiti
+    reali (30 msg/s globali, 1 msg/s per chat). Una seconda esecuzione non deve
+    reinviare nulla (outbox idempotente).
+    """
+    import utils
+    from notifier import dispatch
+
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+    frames = {f"T{i}.FOREX": apply_hedging_logic(make_synthetic_prices(1_000, seed=i)) for i in range(n_tickers)}
+    subscribers = [{'chat_id': 1000 + c, 'tickers': list(frames)} for c in range(n_chats)]
+    original_url = utils.TELEGRAM_BASE_URL
+    try:
+        with StubServer() as stub, tempfile.TemporaryDirectory() as tmp_dir:
+            utils.TELEGRAM_BASE_URL = stub.url
+            outbox_path = os.path.join(tmp_dir, "outbox.db")
+            (queued, sent, failed), elapsed = timed(dispatch, frames, subscribers, outbox_path=outbox_path)
+            _, resent, _ = dispatch(frames, subscribers, outbox_path=outbox_path)
+            assert resent == 0 and len(stub.messages) == sent, "Messaggi duplicati"
+    finally:
+        utils.TELEGRAM_BASE_URL = original_url
+    print(f"Dispatch: {sent:,} messaggi consegnati ({failed} falliti) in {elapsed:.1f}s, "
+          f"nessun duplicato alla riesecuzione")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark della pipeline di copertura FX")
+    parser.add_argument("--json", help="salva i risultati della pipeline in questo file JSON")
+    parser.add_argument("--compare", help="file JSON di riferimento per rilevare regressioni")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2_000, 20_000, 200_000],
+                        help="lunghezze delle serie sintetiche per il benchmark della pipeline")
+    parser.add_argument("--skip-checks", action="store_true", help="salta le verifiche di parità")
+    parser.add_argument("--monte-carlo", action="store_true",
+                        help="Monte Carlo 10k percorsi x 5000 giorni e walk-forward")
+    parser.add_argument("--signal-log", action="store_true",
+                        help="registro dei segnali con 2 milioni di righe (inserimento e ricerche)")
+    parser.add_argument("--dispatch", action="store_true",
+                        help="esegue il benchmark di fan-out (1000 messaggi, ~35s per i limiti Telegram)")
+    parser.add_argument("--intraday-mb", type=int, nargs="*", default=[],
+                        help="dimensioni (MB) dei file di tick sintetici, es. 256 2048")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.skip_checks:
+        check_parity()
+        check_compact_parity()
+        check_episodes()
+        check_filters()
+        check_engine_parity()
+        check_engine_revision()
+        check_wide_parity()
+        check_sweep_parity()
+        check_monte_carlo_parity()
+        check_collar()
+        check_portfolio()
+        check_intraday_resample()
+        check_price_cache()
+        check_http_client()
+        check_signal_api()
+        check_report()
+        check_snapshot()
+        check_data_quality()
+        check_backfill()
+        check_watcher()
+        check_downsample()
+        check_chart_shading()
+        check_chart_labels()
+    bench_hedging_logic()
+    bench_memory()
+    bench_filters()
+    if args.signal_log:
+        bench_signal_log()
+    bench_sweep()
+    if args.monte_carlo:
+        bench_robustness()
+    bench_collar()
+    bench_portfolio()
+    if args.intraday_mb:
+        bench_intraday(args.intraday_mb)
+    if args.dispatch:
+        bench_dispatch()
+    bench_signal_api()
+    bench_report()
+    bench_data_quality()
+    bench_backfill()
+
+    results = bench_pipeline(args.sizes)
+    results.append(bench_cold_start())
+    if args.json:
+        save_results(results, args.json)
+    if args.compare and compare_results(results, args.compare):
+        sys.exit(1)
@@ -0,0 +1,219 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from strategy import BUFFER_PCT, SMA_WINDOW, get_bands
+
+# Punti massimi per traccia inviati al browser, qualunque sia la lunghezza dello storico
+MAX_CHART_POINTS = 2000
+
+DISTANCE_COLORS = np.array(['#6b7280', '#ef4444', '#10b981'])
+
+def minmax_indices(values, n_buckets):
+    """
+    Indici del minimo e del massimo di ogni bucket (downsampling min/max per pixel).
+    Vettoriale: la serie viene divisa in n_buckets blocchi di uguale ampiezza.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    size = -(-n // n_buckets)  # ceil
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = values
+    blocks = padded.reshape(n_buckets, size)
+    valid = ~np.all(np.isnan(blocks), axis=1)
+    offsets = np.arange(n_buckets)[valid] * size
+    blocks = blocks[valid]
+    lows = offsets + np.nanargmin(blocks, axis=1)
+    highs = offsets + np.nanargmax(blocks, axis=1)
+    return np.unique(np.concatenate([lows, highs, [0, n - 1]]))
+
+def select_window(df, x_range=None):
+    """Righe del DF comprese nella finestra (inizio, fine) visualizzata."""
+    if x_range is None:
+        return df
+    start, end = (pd.Timestamp(x) for x in x_range)
+    end = end + pd.Timedelta(days=1) - pd.Timedelta(1)  # include l'intera giornata finale
+    return df[(df.index >= start) & (df.index <= end)]
+
+def downsample_frame(df, max_points=MAX_CHART_POINTS, x_range=None, column='Close'):
+    """
+    Riduce il DF elaborato a un numero limitato di righe per il grafico.
+    x_range: (inizio, fine) della finestra visualizzata; la risoluzione si adatta
+    alla finestra (zoom), non all'intero storico.
+    Mantiene min/max di `column` per bucket, la prima e l'ultima barra e, finché
+    rientrano in un quarto del budget, le barre con un segnale (Action != HOLD).
+    Il risultato non supera mai max_points righe (almeno 4: min, max, prima e ultima).
+    """
+    if max_points < 4:
+        raise ValueError(f"max_points deve essere almeno 4 (ricevuto {max_points})")
+    df = select_window(df, x_range)
+    if len(df) <= max_points:
+        return df
+
+    signal_rows = np.flatnonzero((df['Action'] != 'HOLD').to_numpy())
+    # Budget dei segnali al netto dei 4 punti sempre presenti (min, max, prima e ultima barra)
+    if len(signal_rows) > (max_points - 4) // 4:
+        signal_rows = signal_rows[:0]
+    # Ogni bucket contribuisce con due punti (min e max), più prima e ultima barra
+    n_buckets = max((max_points - len(signal_rows) - 2) // 2, 1)
+    keep = minmax_indices(df[column].to_numpy(), n_buckets)
+    return df.iloc[np.union1d(keep, signal_rows)]
+
+def band_polygon(df, buffer_pct=None):
+    """Coordinate dell'area tra le bande (fill='toself') costruite con numpy."""
+    lower, upper = get_bands(df, buffer_pct)
+    x = np.concatenate([df.index.to_numpy(), df.index.to_numpy()[::-1]])
+    y = np.concatenate([upper.to_numpy(), lower.to_numpy()[::-1]])
+    return x, y
+
+def distance_colors(distance_pct, band_pct):
+    """Colori delle barre della distanza % (rosso sotto la banda, verde sopra, grigio dentro)."""
+    distance_pct = np.asarray(distance_pct, dtype=float)
+    codes = np.select([distance_pct < -band_pct, distance_pct > band_pct], [1, 2], default=0)
+    return DISTANCE_COLORS[codes]
+
+def build_chart(window_df, max_points=MAX_CHART_POINTS, buffer_pct=None, episodes=None, window=None):
+    """
+    Costruisce il grafico Plotly della dashboard (prezzo, SMA, bande, segnali e
+    distanza %) sulla finestra selezionata, con tracce ridotte a max_points punti.
+    buffer_pct: default quello usato da apply_hedging_logic (df.attrs) o BUFFER_PCT.
+    window: periodo della SMA nelle etichette, default quello di apply_hedging_logic (df.attrs) o SMA_WINDOW.
+    episodes: EpisodeTable opzionale; i periodi in copertura della finestra
+    vengono evidenziati come aree verticali (un rettangolo per episodio).
+    """
+    if buffer_pct is None:
+        buffer_pct = window_df.attrs.get('buffer_pct', BUFFER_PCT)
+    if window is None:
+        window = window_df.attrs.get('window', SMA_WINDOW)
+    sma_label = f"SMA {window}"
+    chart_df = downsample_frame(window_df, max_points)
+    band_x, band_y = band_polygon(chart_df, buffer_pct)
+    lower_band, upper_band = get_bands(chart_df, buffer_pct)
+    
+    # Creiamo subplot con indicatore di distanza
+    fig = make_subplots(
+        rows=2, cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.08,
+        row_heights=[0.75, 0.25],
+        subplot_titles=("EUR/USD con Bande di Isteresi", f"Distanza % dalla {sma_label}")
+    )
+
+    # Banda di isteresi (area colorata)
+    fig.add_trace(go.Scatter(
+        x=band_x,
+        y=band_y,
+        fill='toself',
+        fillcolor='rgba(45, 90, 135, 0.1)',
+        line=dict(color='rgba(0,0,0,0)'),
+        name=f'Buffer Zone (±{buffer_pct * 100:g}%)',
+        hoverinfo='skip',
+        showlegend=True
+    ), row=1, col=1)
+
+    # Banda superiore
+    fig.add_trace(go.Scatter(
+        x=chart_df.index, y=upper_band,
+        mode='lines', name=f'Upper Band (+{buffer_pct * 100:g}%)',
+        line=dict(color='rgba(16, 185, 129, 0.6)', width=1, dash='dot'),
+        hovertemplate='Upper: %{y:.4f}<extra></extra>'
+    ), row=1, col=1)
+    
+    # Banda inferiore
+    fig.add_trace(go.Scatter(
+        x=chart_df.index, y=lower_band,
+        mode='lines', name=f'Lower Band (-{buffer_pct * 100:g}%)',
+        line=dict(color='rgba(239, 68, 68, 0.6)', width=1, dash='dot'),
+        hovertemplate='Lower: %{y:.4f}<extra></extra>'
+    ), row=1, col=1)
+
+    # SMA
+    fig.add_trace(go.Scatter(
+        x=chart_df.index, y=chart_df['SMA200'],
+        mode='lines', name=sma_label,
+        line=dict(color='#f59e0b', width=2),
+        hovertemplate=f'{sma_label}: %{{y:.4f}}<extra></extra>'
+    ), row=1, col=1)
+
+    # Prezzo EUR/USD
+    fig.add_trace(go.Scatter(
+        x=chart_df.index, y=chart_df['Close'],
+        mode='lines', name='EUR/USD',
+        line=dict(color='#1e3a5f', width=1.5),
+        hovertemplate='Spot: %{y:.4f}<extra></extra>'
+    ), row=1, col=1)
+    
+    # Marker per cambi di stato
+    hedge_entries = window_df[window_df['Action'] == 'OPEN_HEDGE']
+    hedge_exits = window_df[window_df['Action'] == 'CLOSE_HEDGE']
+    
+    fig.add_trace(go.Scatter(
+        x=hedge_entries.index, y=hedge_entries['Close'],
+        mode='markers', name='🔴 Entry Hedge',
+        marker=dict(color='#ef4444', size=12, symbol='triangle-down', 
+                   line=dict(color='white', width=2)),
+        hovertemplate='OPEN HEDGE<br>%{x}<br>Price: %{y:.4f}<extra></extra>'
+    ), row=1, col=1)
+    
+    fig.add_trace(go.Scatter(
+        x=hedge_exits.index, y=hedge_exits['Close'],
+        mode='markers', name='🟢 Exit Hedge',
+        marker=dict(color='#10b981', size=12, symbol='triangle-up',
+                   line=dict(color='white', width=2)),
+        hovertemplate='CLOSE HEDGE<br>%{x}<br>Price: %{y:.4f}<extra></extra>'
+    ), row=1, col=1)
+
+    # Periodi in copertura (BEAR) dalla tabella degli episodi. Tutte le forme sono
+    # dict aggiunti al layout in un'unica chiamata: add_vrect/add_hline rivalidano
+    # tutte le forme esistenti a ogni chiamata (costo quadratico negli episodi)
+    shapes = []
+    if episodes is not None and len(window_df):
+        first, last = window_df.index[0], window_df.index[-1]
+        visible = episodes.overlapping(first, last)
+        shapes = [
+            dict(type='rect', xref='x', yref='y domain', x0=max(start, first), x1=min(end, last), y0=0, y1=1,
+                 fillcolor='rgba(239, 68, 68, 0.06)', line_width=0, layer='below')
+            for start, end in visible.loc[visible['regime'] == 'BEAR', ['start', 'end']].itertuples(index=False)
+        ]
+
+    # Subplot: Distanza percentuale
+    band_pct = buffer_pct * 100
+    colors = distance_colors(chart_df['Distance_Pct'], band_pct)
+    fig.add_trace(go.Bar(
+        x=chart_df.index, y=chart_df['Distance_Pct'],
+        marker_color=colors,
+        name='Distanza %',
+        showlegend=False,
+        hovertemplate='Distanza: %{y:.2f}%<extra></extra>'
+    ), row=2, col=1)
+    
+    # Linee di riferimento sul subplot
+    for y, color, dash in ((band_pct, "#10b981", "dash"), (-band_pct, "#ef4444", "dash"), (0, "#9ca3af", None)):
+        shapes.append(dict(type='line', xref='x2 domain', yref='y2', x0=0, x1=1, y0=y, y1=y,
+                           line=dict(color=color, width=1, dash=dash)))
+
+    fig.update_layout(
+        shapes=shapes,
+        height=700,
+        template="plotly_white",
+        hovermode="x unified",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="center",
+            x=0.5,
+            bgcolor="rgba(255,255,255,0.8)"
+        ),
+        margin=dict(l=60, r=40, t=80, b=40),
+        font=dict(family="Inter, sans-serif")
+    )
+    
+    fig.update_xaxes(title_text="", row=1, col=1)
+    fig.update_xaxes(title_text="Data", row=2, col=1)
+    fig.update_yaxes(title_text="Prezzo", row=1, col=1)
+    fig.update_yaxes(title_text="Distanza %", row=2, col=1)
+
+    return fig
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+# Struttura del collar indicata nel report Telegram
+PUT_DELTA = 0.25
+CALL_DELTA = 0.35
+# Scadenza di ogni collar (giorni di calendario): in regime BEAR viene rinnovato a scadenza
+TENOR_DAYS = 30
+DAYS_PER_YEAR = 365.0
+
+def _norm_cdf(x):
+    """Funzione di ripartizione normale standard (erfc di Numerical Recipes, errore < 1.2e-7)."""
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.5 * z)
+    erfc = t * np.exp(-z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418
+        + t * (-0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587
+        + t * (-0.82215223 + t * 0.17087277)))))))))
+    return np.where(x >= 0, 1.0 - 0.5 * erfc, 0.5 * erfc)
+
+def _norm_ppf(p):
+    """Inversa della normale standard (algoritmo di Acklam, errore relativo < 1.2e-9)."""
+    a = [-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+         1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00]
+    b = [-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+         6.680131188771972e+01, -1.328068155288572e+01]
+    c = [-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+         -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00]
+    d = [7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+         3.754408661907416e+00]
+    p = np.asarray(p, dtype=float)
+    p_low = 0.02425
+
+    q = np.sqrt(-2 * np.log(np.where(p < 0.5, p, 1 - p)))
+    tail = (((((c[0] * q + c[1]) * q + c[2]) * q + c[3]) * q + c[4]) * q + c[5]) / \
+           ((((d[0] * q + d[1]) * q + d[2]) * q + d[3]) * q + 1)
+    tail = np.where(p < 0.5, tail, -tail)
+
+    q = p - 0.5
+    r = q * q
+    central = (((((a[0] * r + a[1]) * r + a[2]) * r + a[3]) * r + a[4]) * r + a[5]) * q / \
+              (((((b[0] * r + b[1]) * r + b[2]) * r + b[3]) * r + b[4]) * r + 1)
+
+    return np.where((p < p_low) | (p > 1 - p_low), tail, central)
+
+def garman_kohlhagen(spot, strike, t, sigma, rd, rf, kind):
+    """
+    Prezzo Garman–Kohlhagen di opzioni FX (per unità di valuta estera, in valuta domestica).
+    Per EUR/USD: rd = tasso USD, rf = tasso EUR. kind: 'call' o 'put'.
+    Con t <= 0 restituisce il payoff intrinseco. Tutti gli input sono vettorizzati.
+    """
+    spot, strike, t, sigma, rd, rf = np.broadcast_arrays(*(np.asarray(x, dtype=float)
+                                                           for x in (spot, strike, t, sigma, rd, rf)))
+    sign = 1.0 if kind == 'call' else -1.0
+    intrinsic = np.maximum(sign * (spot - strike), 0.0)
+
+    t_pos = np.where(t > 0, t, 1.0)
+    vol_sqrt_t = sigma * np.sqrt(t_pos)
+    d1 = (np.log(spot / strike) + (rd - rf + 0.5 * sigma ** 2) * t_pos) / vol_sqrt_t
+    d2 = d1 - vol_sqrt_t
+    price = sign * (spot * np.exp(-rf * t_pos) * _norm_cdf(sign * d1)
+                    - strike * np.exp(-rd * t_pos) * _norm_cdf(sign * d2))
+    return np.where(t > 0, price, intrinsic)
+
+def strike_from_delta(spot, t, sigma, rd, rf, delta, kind):
+    """
+    Strike corrispondente a un delta spot (premium non incluso) in Garman–Kohlhagen.
+    delta va passato in valore assoluto (es. 0.25 per la put 25 delta).
+    """
+    spot, t, sigma, rd, rf = (np.asarray(x, dtype=float) for x in (spot, t, sigma, rd, rf))
+    d1 = _norm_ppf(delta * np.exp(rf * t))
+    if kind == 'put':
+        d1 = -d1
+    return spot * np.exp(-d1 * sigma * np.sqrt(t) + (rd - rf + 0.5 * sigma ** 2) * t)
+
+def _as_array(value, index):
+    """Scalare o serie locale (vol, tassi) allineata all'indice del backtest."""
+    if isinstance(value, pd.Series):
+        return value.reindex(index, method='ffill').bfill().to_numpy(dtype=float)
+    return np.full(len(index), float(value))
+
+def _collar_value(spot, k_put, k_call, t, sigma, rd, rf):
+    """Valore del collar lungo put / corto call per unità di EUR."""
+    return (garman_kohlhagen(spot, k_put, t, sigma, rd, rf, 'put')
+            - garman_kohlhagen(spot, k_call, t, sigma, rd, rf, 'call'))
+
+def backtest_collar(df, vol, rd, rf, notional=1.0, put_delta=PUT_DELTA,
+                    call_delta=CALL_DELTA, tenor_days=TENOR_DAYS):
+    """
+    Backtest del collar (Buy Put / Sell Call EUR/USD) sui segnali di apply_hedging_logic.
+    Il collar si apre a ogni OPEN_HEDGE (o alla prima barra se si parte in BEAR),
+    si rinnova alla scadenza finché lo stato resta BEAR e si chiude a mercato su CLOSE_HEDGE.
+    vol, rd (tasso USD), rf (tasso EUR): valori annui, scalari o pd.Series locali.
+    notional: esposizione in EUR (valorizzata in USD al cambio spot).
+
+    Restituisce (equity, trades):
+    - equity: DF giornaliero con 'Unhedged', 'Hedged', 'Collar_PnL', 'Trade_Id'
+    - trades: DF con una riga per collar (strike, premi, uscita, P&L)
+    """
+    index = df.index
+    n = len(index)
+    spot = df['Close'].to_numpy(dtype=float)
+    sigma = _as_array(vol, index)
+    rd = _as_array(rd, index)
+    rf = _as_array(rf, index)
+    day = ((index - index[0]) / pd.Timedelta(days=1)).to_numpy(dtype=float)
+
+    # 1. Calendario dei collar: episodi BEAR suddivisi in rinnovi di tenor_days
+    hedged = (df['State'] == 'BEAR').to_numpy()
+    prev_hedged = np.concatenate([[False], hedged[:-1]])
+    episode_start = hedged & ~prev_hedged
+    start_idx = np.maximum.accumulate(np.where(episode_start, np.arange(n), 0))
+    roll_number = np.where(hedged, (day - day[start_idx]) // tenor_days, -1)
+    prev_roll = np.concatenate([[-1], roll_number[:-1]])
+    new_trade = hedged & (episode_start | (roll_number != prev_roll))
+
+    trade_id = np.where(hedged, np.cumsum(new_trade) - 1, -1)
+    entry_idx = np.flatnonzero(new_trade)
+    n_trades = len(entry_idx)
+
+    # Uscita: barra del trade successivo (rinnovo) o prima barra fuori dal regime BEAR
+    last_hedged_idx = np.flatnonzero(hedged & ~np.concatenate([hedged[1:], [False]]))
+    episode_of_trade = np.cumsum(episode_start)[entry_idx] - 1
+    next_entry = np.full(n_trades, n)
+    next_entry[:-1] = entry_idx[1:]
+    same_episode = np.zeros(n_trades, dtype=bool)
+    same_episode[:-1] = episode_of_trade[1:] == episode_of_trade[:-1]
+    exit_idx = np.where(same_episode, next_entry, last_hedged_idx[episode_of_trade] + 1)
+    closed = exit_idx < n
+
+    # 2. Strike e premi: un'unica operazione vettoriale su tutte le date di ingresso
+    t_entry = np.full(n_trades, tenor_days / DAYS_PER_YEAR)
+    s_in, vol_in, rd_in, rf_in = spot[entry_idx], sigma[entry_idx], rd[entry_idx], rf[entry_idx]
+    k_put = strike_from_delta(s_in, t_entry, vol_in, rd_in, rf_in, put_delta, 'put')
+    k_call = strike_from_delta(s_in, t_entry, vol_in, rd_in, rf_in, call_delta, 'call')
+    put_premium = garman_kohlhagen(s_in, k_put, t_entry, vol_in, rd_in, rf_in, 'put')
+    call_premium = garman_kohlhagen(s_in, k_call, t_entry, vol_in, rd_in, rf_in, 'call')
+    entry_value = put_premium - call_premium
+    expiry_day = day[entry_idx] + tenor_days
+
+    # 3. Mark-to-market giornaliero dei collar attivi (una sola valutazione vettoriale)
+    active = np.flatnonzero(hedged)
+    tid = trade_id[active]
+    mtm = _collar_value(spot[active], k_put[tid], k_call[tid],
+                        (expiry_day[tid] - day[active]) / DAYS_PER_YEAR,
+                        sigma[active], rd[active], rf[active])
+    unrealized = np.zeros(n)
+    unrealized[active] = mtm - entry_value[tid]
+
+    # 4. Chiusure (rinnovo o CLOSE_HEDGE) valutate a mercato
+    safe_exit = np.minimum(exit_idx, n - 1)
+    exit_value = _collar_value(spot[safe_exit], k_put, k_call,
+                               (expiry_day - day[safe_exit]) / DAYS_PER_YEAR,
+                               sigma[safe_exit], rd[safe_exit], rf[safe_exit])
+    exit_value = np.where(closed, exit_value, np.nan)
+    trade_pnl = (exit_value - entry_value) * notional
+
+    realized = np.zeros(n)
+    np.add.at(realized, exit_idx[closed], trade_pnl[closed])
+    collar_pnl = np.cumsum(realized) + unrealized * notional
+
+    unhedged = notional * spot
+    equity = pd.DataFrame({
+        'Unhedged': unhedged,
+        'Hedged': unhedged + collar_pnl,
+        'Collar_PnL': collar_pnl,
+        'Trade_Id': trade_id
+    }, index=index)
+
+    trades = pd.DataFrame({
+        'Entry_Date': index[entry_idx],
+        'Exit_Date': index[safe_exit].where(closed),
+        'Expiry_Date': index[entry_idx] + pd.to_timedelta(tenor_days, unit='D'),
+        'Spot_In': s_in,
+        'Put_Strike': k_put,
+        'Call_Strike': k_call,
+        'Put_Premium': put_premium * notional,
+        'Call_Premium': call_premium * notional,
+        'Net_Premium': entry_value * notional,
+        'Spot_Out': np.where(closed, spot[safe_exit], np.nan),
+        'Exit_Value': exit_value * notional,
+        'PnL': trade_pnl,
+        'Exit_Reason': np.where(~closed, 'OPEN', np.where(same_episode, 'ROLL', 'CLOSE_HEDGE'))
+    })
+    return equity, trades
@@ -0,0 +1,55 @@
+import os
+import sys
+
+# Ordine di ricerca dei secrets (prima fonte che risponde vince)
+SECRETS_BACKENDS = os.environ.get("HEDGE_SECRETS_BACKENDS", "streamlit,env,dotenv")
+DOTENV_PATH = os.environ.get("HEDGE_DOTENV_PATH", ".env")
+
+_dotenv_cache = {}
+
+def _env_backend(key):
+    """Variabili d'ambiente (GitHub Actions, cron)."""
+    return os.environ.get(key)
+
+def _read_dotenv(path):
+    """Legge un file .env con python-dotenv una sola volta (import differito: avvio del bot leggero)."""
+    if path not in _dotenv_cache:
+        from dotenv import dotenv_values
+        _dotenv_cache[path] = dotenv_values(path)
+    return _dotenv_cache[path]
+
+def _dotenv_backend(key):
+    """File .env locale (sviluppo)."""
+    return _read_dotenv(DOTENV_PATH).get(key)
+
+def _streamlit_backend(key):
+    """
+    Streamlit secrets, solo se Streamlit è già caricato (cioè dentro la dashboard):
+    il bot e gli altri job non importano mai Streamlit.
+    """
+    if 'streamlit' not in sys.modules:
+        return None
+    st = sys.modules['streamlit']
+    try:
+        return st.secrets[key]
+    except (FileNotFoundError, AttributeError, KeyError):
+        return None
+
+# Backend disponibili: nome -> funzione (chiave) -> valore o None
+BACKENDS = {
+    'streamlit': _streamlit_backend,
+    'env': _env_backend,
+    'dotenv': _dotenv_backend,
+}
+
+def register_backend(name, lookup):
+    """Aggiunge una fonte di secrets (es. un vault); va poi elencata in HEDGE_SECRETS_BACKENDS."""
+    BACKENDS[name] = lookup
+
+def get_secret(key, default=None):
+    """Valore del secret dalla prima fonte configurata che lo contiene."""
+    for name in SECRETS_BACKENDS.split(','):
+        value = BACKENDS[name.strip()](key)
+        if value is not None:
+            return value
+    return default
@@ -1,131 +1,49 @@
+import os
 from utils import get_eodhd_data, send_telegram_message
-from strategy import apply_hedging_logic
+from strategy import HysteresisEngine, apply_hedging_logic, BUFFER_PCT, DEFAULT_PARAMS
+from report import render_report, pair_label, DEFAULT_LOCALE
+from snapshot import write_snapshot
+from signal_log import SignalLog, params_hash
+from profiling import profile_stage, run_profiled
 import pandas as pd
 from datetime import datetime
 
-def format_number(value, decimals=4):
-    """Formatta un numero con separatore migliaia e decimali specificati."""
-    return f"{value:,.{decimals}f}"
+TICKER = "EURUSD.FOREX"
+# Directory degli snapshot del motore incrementale (persistita tra le esecuzioni)
+STATE_DIR = os.environ.get("HEDGE_STATE_DIR", "state")
+# Parametri della strategia: la loro impronta distingue i segnali nel registro
+PARAMS = DEFAULT_PARAMS
 
-def get_trend_arrow(current, previous):
-    """Restituisce freccia trend basata sul confronto."""
-    if current > previous:
-        return "↗️"
-    elif current < previous:
-        return "↘️"
-    else:
-        return "➡️"
+def build_telegram_message(last_row, prev_row, df=None, stats=None, buffer_pct=BUFFER_PCT,
+                           locale=DEFAULT_LOCALE, fmt='markdown'):
+    """
+    Costruisce il messaggio Telegram dal template compilato della lingua (vedi report.py).
+    stats: SignalStats già aggiornate (se None vengono ricavate da df).
+    buffer_pct: ampiezza delle bande di isteresi mostrata nel report.
+    """
+    return render_report(last_row, prev_row, df=df, stats=stats, buffer_pct=buffer_pct,
+                         locale=locale, fmt=fmt, pair=pair_label(TICKER))
 
-def build_telegram_message(last_row, prev_row, df):
+
+def load_engine(ticker, state_path):
     """
-    Costruisce un messaggio Telegram formattato professionalmente.
+    Ripristina il motore incrementale dallo snapshot e scarica solo le barre
+    dall'ultima elaborata in poi: se la sua chiusura è stata corretta (barra
+    provvisoria) il motore la rielabora. Senza snapshot valido ricostruisce lo
+    stato dall'intero storico.
+    Restituisce (engine, numero di nuove barre).
     """
-    date_str = last_row.name.strftime('%A, %d %B %Y')
-    spot = last_row['Close']
-    prev_spot = prev_row['Close']
-    sma = last_row['SMA200']
-    state = last_row['State']
-    action = last_row['Action']
-    distance_pct = last_row['Distance_Pct']
-    upper_band = last_row['Upper_Band']
-    lower_band = last_row['Lower_Band']
-    
-    # Calcoli
-    daily_change = spot - prev_spot
-    daily_change_pct = (daily_change / prev_spot) * 100
-    trend_arrow = get_trend_arrow(spot, prev_spot)
-    change_sign = "+" if daily_change >= 0 else ""
-    
-    # Header
-    header = "━━━━━━━━━━━━━━━━━━━━━━\n"
-    header += "🛡️  *KRITERION QUANT*\n"
-    header += "      FX Hedging Report\n"
-    header += "━━━━━━━━━━━━━━━━━━━━━━"
-    
-    # Data
-    date_section = f"\n📅 *{date_str}*\n"
-    
-    # Sezione Mercato
-    market_section = "\n┌─────────────────────┐\n"
-    market_section += "│     📊 *MERCATO*         │\n"
-    market_section += "└─────────────────────┘\n\n"
-    market_section += f"💶 *EUR/USD Spot:*  `{format_number(spot)}`\n"
-    market_section += f"      {trend_arrow} {change_sign}{format_number(daily_change)} ({change_sign}{daily_change_pct:.2f}%)\n\n"
-    market_section += f"📈 *SMA 200:*  `{format_number(sma)}`\n"
-    market_section += f"📐 *Distanza:*  `{distance_pct:+.2f}%`\n"
-    
-    # Sezione Bande
-    bands_section = "\n┌─────────────────────┐\n"
-    bands_section += "│   📏 *BANDE ISTERESI*   │\n"
-    bands_section += "└─────────────────────┘\n\n"
-    bands_section += f"🟢 Upper (+1%): `{format_number(upper_band)}`\n"
-    bands_section += f"🔴 Lower (-1%):  `{format_number(lower_band)}`\n"
-    
-    # Sezione Stato
-    state_section = "\n┌─────────────────────┐\n"
-    state_section += "│     📡 *STATO*            │\n"
-    state_section += "└─────────────────────┘\n\n"
-    
-    if state == "BEAR":
-        state_section += "🔴 *Regime: BEAR*\n"
-        state_section += "🛡️ Status: *HEDGED*\n"
-        buffer_to_bull = upper_band - spot
-        state_section += f"📍 Buffer → Bull: `{format_number(buffer_to_bull)}`"
-    else:
-        state_section += "🟢 *Regime: BULL*\n"
-        state_section += "💤 Status: *UNHEDGED*\n"
-        buffer_to_bear = spot - lower_band
-        state_section += f"📍 Buffer → Bear: `{format_number(buffer_to_bear)}`"
-    
-    # Sezione Azione
-    action_section = "\n\n"
-    action_section += "═══════════════════════\n"
-    
-    if action == "OPEN_HEDGE":
-        action_section += "🚨 *SEGNALE: ATTIVARE COPERTURA* 🚨\n"
-        action_section += "═══════════════════════\n\n"
-        action_section += "Eseguire struttura *COLLAR*:\n\n"
-        action_section += "   🔹 *BUY PUT* EUR/USD\n"
-        action_section += "       Delta: 0.25\n"
-        action_section += "       Scopo: Protezione downside\n\n"
-        action_section += "   🔸 *SELL CALL* EUR/USD\n"
-        action_section += "       Delta: 0.35\n"
-        action_section += "       Scopo: Finanziamento premio\n"
-    elif action == "CLOSE_HEDGE":
-        action_section += "✅ *SEGNALE: RIMUOVERE COPERTURA* ✅\n"
-        action_section += "═══════════════════════\n\n"
-        action_section += "   📌 Chiudere posizioni opzionali\n"
-        action_section += "   📌 Tornare in stato *Unhedged*\n"
-    else:
-        if state == "BEAR":
-            action_section += "🛡️ *NESSUN SEGNALE*\n"
-            action_section += "═══════════════════════\n\n"
-            action_section += "   ↳ Mantenere copertura attiva\n"
-            action_section += "   ↳ Collar in essere\n"
-        else:
-            action_section += "💤 *NESSUN SEGNALE*\n"
-            action_section += "═══════════════════════\n\n"
-            action_section += "   ↳ Rimanere unhedged\n"
-            action_section += "   ↳ Nessuna azione richiesta\n"
-    
-    # Footer con statistiche rapide
-    hedge_days = len(df[df['State'] == 'BEAR'])
-    total_days = len(df)
-    hedge_pct = (hedge_days / total_days) * 100
-    
-    footer = "\n\n━━━━━━━━━━━━━━━━━━━━━━\n"
-    footer += f"📊 _Storico: {hedge_pct:.1f}% tempo hedged_\n"
-    footer += "━━━━━━━━━━━━━━━━━━━━━━\n\n"
-    
-    # Link Dashboard
-    dashboard_link = "https://strategiacoperturaeuro-k6pduahqzjxoqtc47alrqr.streamlit.app/"
-    footer += f"🔗 [Dashboard Interattiva]({dashboard_link})\n\n"
-    footer += "_Kriterion Quant — Finanza Quantitativa Accessibile_"
-    
-    # Composizione finale
-    message = header + date_section + market_section + bands_section + state_section + action_section + footer
-    
-    return message
+    engine = HysteresisEngine.load(state_path)
+    if engine is not None and engine.last_timestamp is not None and len(engine.last_rows) == 2:
+        bars = get_eodhd_data(ticker, start_date=engine.last_timestamp)
+        bars = bars[bars.index >= engine.last_timestamp]
+        n_new = int((bars.index > engine.last_timestamp).sum())
+        engine.update_many(bars)
+        return engine, n_new
+
+    df = get_eodhd_data(ticker)
+    engine = HysteresisEngine().update_many(df)
+    return engine, len(df)
 
 
 def run_daily_check():
@@ -134,11 +52,14 @@ def run_daily_check():
     print(f"Avvio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 50)
     
-    # 1. Scarica Dati
+    state_path = os.path.join(STATE_DIR, f"{TICKER}.json")
+
+    # 1. Scarica Dati (solo le barre successive all'ultimo snapshot)
     try:
         print("\n📡 Download dati EODHD...")
-        df = get_eodhd_data("EURUSD.FOREX")
-        print(f"   ✓ Scaricati {len(df)} record")
+        with profile_stage("fetch"):
+            engine, n_new = load_engine(TICKER, state_path)
+        print(f"   ✓ Scaricati {n_new} record")
     except Exception as e:
         print(f"   ✗ Errore download: {e}")
         error_msg = (
@@ -153,27 +74,55 @@ def run_daily_check():
         send_telegram_message(error_msg)
         return
 
-    # 2. Applica Logica
-    print("\n🔧 Elaborazione strategia...")
-    processed_df = apply_hedging_logic(df)
-    last_row = processed_df.iloc[-1]
-    prev_row = processed_df.iloc[-2]
-    
-    print(f"   ✓ Stato attuale: {last_row['State']}")
-    print(f"   ✓ Azione: {last_row['Action']}")
-    
-    # 3. Costruisci Messaggio
-    print("\n📝 Composizione messaggio...")
-    message = build_telegram_message(last_row, prev_row, processed_df)
-    
-    # 4. Invia Telegram
-    print("\n📤 Invio Telegram...")
-    success = send_telegram_message(message)
-    
-    if success:
-        print("   ✓ Messaggio inviato con successo")
-    else:
-        print("   ✗ Errore invio messaggio")
+    log = SignalLog()
+    p_hash = params_hash(PARAMS)
+    try:
+        # 2. Applica Logica
+        print("\n🔧 Elaborazione strategia...")
+        with profile_stage("signal"):
+            last_row = engine.last_row_series(-1)
+            prev_row = engine.last_row_series(-2)
+            engine.save(state_path)
+            log.append(TICKER, p_hash, pd.DataFrame([prev_row, last_row]))
+
+        print(f"   ✓ Stato attuale: {last_row['State']}")
+        print(f"   ✓ Azione: {last_row['Action']}")
+
+        # Esecuzione ripetuta (es. retry del workflow): report già inviato per questa barra
+        if log.is_sent(TICKER, p_hash, last_row.name):
+            print(f"\n⏭️ Report del {last_row.name:%Y-%m-%d} già inviato: nessun nuovo invio")
+        else:
+            # 3. Costruisci Messaggio (statistiche del motore incrementale, senza ricalcolo)
+            print("\n📝 Composizione messaggio...")
+            with profile_stage("render"):
+                message = build_telegram_message(last_row, prev_row, stats=engine.stats)
+
+            # 4. Invia Telegram
+            print("\n📤 Invio Telegram...")
+            with profile_stage("notify"):
+                success = send_telegram_message(message)
+
+            if success:
+                log.mark_sent(TICKER, p_hash, last_row.name)
+                print("   ✓ Messaggio inviato con successo")
+            else:
+                print("   ✗ Errore invio messaggio")
+
+            # 5. Snapshot per la dashboard e storico completo nel registro: la dashboard
+            # disegna tutta la serie, quindi serve il DF completo (calcolato una sola volta,
+            # dalla cache locale appena aggiornata); le statistiche restano quelle del motore
+            # così report e dashboard mostrano gli stessi numeri
+            print("\n💾 Snapshot dashboard...")
+            try:
+                with profile_stage("snapshot"):
+                    processed_df = apply_hedging_logic(get_eodhd_data(TICKER))
+                    path = write_snapshot(processed_df, TICKER, params=PARAMS, stats=engine.stats)
+                    n_logged = log.append(TICKER, p_hash, processed_df)
+                print(f"   ✓ Snapshot salvato: {path} ({n_logged} nuove righe nel registro)")
+            except Exception as e:
+                print(f"   ✗ Errore snapshot: {e}")
+    finally:
+        log.close()
     
     print("\n" + "=" * 50)
     print("Esecuzione completata")
@@ -181,4 +130,5 @@ def run_daily_check():
 
 
 if __name__ == "__main__":
-    run_daily_check()
+    # Con HEDGE_PROFILE=1 l'esecuzione viene profilata (cProfile + tempi per stadio)
+    run_profiled(run_daily_check)
@@ -0,0 +1,211 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Soglie dei controlli di qualità
+SPIKE_Z = float(os.environ.get("HEDGE_DQ_SPIKE_Z", 6.0))       # |z| del rendimento oltre cui è un picco
+SPIKE_WINDOW = 60                                                 # barre per media e deviazione dei rendimenti
+SPIKE_REVERSAL = 0.5       # il rendimento successivo deve rientrare almeno di questa frazione
+STALE_BARS = int(os.environ.get("HEDGE_DQ_STALE_BARS", 5))       # chiusure identiche consecutive = feed fermo
+MAX_MISSING_DAYS = int(os.environ.get("HEDGE_DQ_MAX_MISSING_DAYS", 2))  # giorni lavorativi mancanti tollerati
+# Festività in cui il mercato FX non pubblica la barra giornaliera (mese, giorno)
+FX_HOLIDAYS = [(1, 1), (12, 25)]
+
+# Policy per controllo: 'repair' corregge, 'warn' segnala soltanto, 'abort' solleva DataQualityError
+POLICY_CHOICES = {
+    'duplicates': ('repair', 'abort'),      # date ripetute: resta l'ultima (come PriceCache.merge)
+    'unsorted': ('repair', 'abort'),        # indice non ordinato: riordinato
+    'ohlc': ('repair', 'warn', 'abort'),    # Close non valido (riga scartata), high/low incoerenti (riallineati)
+    'spikes': ('repair', 'warn', 'abort'),  # picco isolato sui rendimenti: barra scartata
+    'stale': ('repair', 'warn', 'abort'),   # chiusure ripetute: ripetizioni scartate
+    'gaps': ('warn', 'abort'),              # buchi nel calendario FX: non ricostruibili
+}
+DEFAULT_POLICIES = {
+    'duplicates': 'repair', 'unsorted': 'repair', 'ohlc': 'repair',
+    'spikes': 'repair', 'stale': 'warn', 'gaps': 'warn',
+}
+MAX_EXAMPLES = 5
+
+def parse_policies(text):
+    """'spikes=abort,gaps=warn' -> dict (sovrascrive DEFAULT_POLICIES)."""
+    policies = dict(DEFAULT_POLICIES)
+    for item in filter(None, (part.strip() for part in (text or "").split(','))):
+        check, _, policy = item.partition('=')
+        policies[check.strip()] = policy.strip()
+    return policies
+
+POLICIES = parse_policies(os.environ.get("HEDGE_DQ_POLICIES"))
+
+class QualityReport:
+    """Esito dei controlli: per ogni controllo con anomalie, numero di barre, esempi e azione applicata."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.issues = {}
+
+    def add(self, check, dates, action):
+        if len(dates):
+            self.issues[check] = {
+                'count': len(dates),
+                'examples': [pd.Timestamp(d).strftime('%Y-%m-%d') for d in dates[:MAX_EXAMPLES]],
+                'action': action,
+            }
+
+    @property
+    def ok(self):
+        return not self.issues
+
+    def failed(self):
+        return [check for check, issue in self.issues.items() if issue['action'] == 'abort']
+
+    def summary(self):
+        if self.ok:
+            return f"{self.rows} barre, nessuna anomalia"
+        parts = [f"{check}: {issue['count']} ({issue['action']}, es. {', '.join(issue['examples'])})"
+                 for check, issue in self.issues.items()]
+        return f"{self.rows} barre, " + "; ".join(parts)
+
+    def to_dict(self):
+        return {'rows': self.rows, 'issues': self.issues}
+
+class DataQualityError(ValueError):
+    """Controllo con policy 'abort' fallito: i dati non devono arrivare alla strategia."""
+
+    def __init__(self, report):
+        super().__init__(f"Controlli qualità falliti ({', '.join(report.failed())}): {report.summary()}")
+        self.report = report
+
+def fx_holidays(first_day, last_day):
+    """Festività FX (FX_HOLIDAYS) tra due date, come datetime64[D] ordinati."""
+    years = np.arange(first_day.astype('datetime64[Y]').astype(int), last_day.astype('datetime64[Y]').astype(int) + 1)
+    years = years.astype('datetime64[Y]').astype('datetime64[M]')
+    days = [(years + (month - 1)).astype('datetime64[D]') + (day - 1) for month, day in FX_HOLIDAYS]
+    return np.sort(np.concatenate(days))
+
+def calendar_gaps(index, max_missing_days=MAX_MISSING_DAYS):
+    """Posizioni delle barre precedute da più di max_missing_days giorni lavorativi FX mancanti."""
+    days = index.values.astype('datetime64[D]')
+    if len(days) < 2:
+        return np.array([], dtype=int)
+    missing = np.busday_count(days[:-1] + 1, days[1:], holidays=fx_holidays(days[0], days[-1]))
+    return np.flatnonzero(missing > max_missing_days) + 1
+
+def spike_mask(close, z=SPIKE_Z, window=SPIKE_WINDOW, reversal=SPIKE_REVERSAL):
+    """
+    Picchi isolati: rendimento logaritmico con |z| > z rispetto alle `window` barre
+    precedenti, seguito da un rientro di segno opposto (una stampa errata, non un
+    movimento reale). Sull'ultima barra il rientro non è ancora osservabile e basta lo z:
+    la barra viene confermata o scartata alla prossima esecuzione.
+    """
+    n = len(close)
+    mask = np.zeros(n, dtype=bool)
+    if n < 3:
+        return mask
+    returns = np.diff(np.log(close))
+    rolling = pd.Series(returns).rolling(window, min_periods=max(window // 2, 2))
+    mean = rolling.mean().shift(1).to_numpy()
+    std = rolling.std().shift(1).to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        extreme = np.abs(returns - mean) > z * std
+    following = np.append(returns[1:], np.nan)
+    reverts = (np.sign(following) == -np.sign(returns)) & (np.abs(following) >= reversal * np.abs(returns))
+    reverts[-1] = True
+    mask[1:] = extreme & reverts
+    return mask
+
+def stale_mask(close, stale_bars=STALE_BARS):
+    """Ripetizioni di una chiusura identica per almeno stale_bars barre consecutive (esclusa la prima)."""
+    n = len(close)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    starts = np.concatenate([[True], close[1:] != close[:-1]])
+    start_pos = np.flatnonzero(starts)
+    lengths = np.diff(np.append(start_pos, n))
+    return ~starts & (np.repeat(lengths, lengths) >= stale_bars)
+
+def validate_prices(df, policies=None, spike_z=SPIKE_Z, spike_window=SPIKE_WINDOW, stale_bars=STALE_BARS,
+                    max_missing_days=MAX_MISSING_DAYS):
+    """
+    Controlli di qualità vettoriali su un DF di prezzi (formato get_eodhd_data) prima
+    della strategia: indice duplicato o non ordinato, Close non valido e coerenza
+    high/low/open/close, picchi sui rendimenti, chiusure ferme, buchi nel calendario FX.
+    policies: dict controllo -> 'repair' / 'warn' / 'abort' (default POLICIES).
+    Restituisce (DF corretto, QualityReport); solleva DataQualityError se un controllo
+    con policy 'abort' trova anomalie. Senza anomalie il DF torna invariato.
+    """
+    policies = {**POLICIES, **(policies or {})}
+    for check, policy in policies.items():
+        if policy not in POLICY_CHOICES[check]:
+            raise ValueError(f"Policy '{policy}' non valida per '{check}': {POLICY_CHOICES[check]}")
+    report = QualityReport(len(df))
+    if df.empty:
+        return df, report
+
+    # 1. Struttura dell'indice (i controlli successivi richiedono date ordinate e uniche)
+    values = df.index.values.view('i8')
+    steps = np.diff(values)
+    unsorted = np.flatnonzero(steps < 0) + 1
+    duplicated = keep = None
+    if len(unsorted) or (steps == 0).any():
+        # Ordinamento stabile: tra date uguali resta l'ultima ricevuta (come PriceCache.merge)
+        order = np.argsort(values, kind='stable') if len(unsorted) else np.arange(len(values))
+        ordered = values[order]
+        repeated = np.append(ordered[1:] == ordered[:-1], False)
+        duplicated = np.sort(order[repeated])
+        keep = order[~repeated]
+    report.add('duplicates', df.index[duplicated] if duplicated is not None else [], policies['duplicates'])
+    report.add('unsorted', df.index[unsorted], policies['unsorted'])
+    if report.failed():
+        raise DataQualityError(report)
+    if keep is not None:
+        df = df.take(keep)
+
+    # 2. Controlli sui valori, tutti sugli stessi array
+    close = df['Close'].to_numpy(dtype=float)
+    bad_close = ~(close > 0) | ~np.isfinite(close)
+    has_range = 'high' in df and 'low' in df
+    if has_range:
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        opened = df['open'].to_numpy(dtype=float) if 'open' in df else close
+        body_high = np.fmax(close, opened)
+        body_low = np.fmin(close, opened)
+        bad_range = ~bad_close & ((high < low) | (high < body_high) | (low > body_low)
+                                  | ~np.isfinite(high) | ~np.isfinite(low))
+    else:
+        bad_range = np.zeros(len(df), dtype=bool)
+
+    # Picchi, chiusure ferme e calendario sulle sole barre con Close valido
+    valid = ~bad_close
+    if valid.all():
+        spikes = spike_mask(close, spike_z, spike_window)
+        stale = stale_mask(close, stale_bars)
+    else:
+        spikes = np.zeros(len(df), dtype=bool)
+        spikes[valid] = spike_mask(close[valid], spike_z, spike_window)
+        stale = np.zeros(len(df), dtype=bool)
+        stale[valid] = stale_mask(close[valid], stale_bars)
+    gaps = calendar_gaps(df.index[valid], max_missing_days)
+
+    report.add('ohlc', df.index[bad_close | bad_range], policies['ohlc'])
+    report.add('spikes', df.index[spikes], policies['spikes'])
+    report.add('stale', df.index[stale], policies['stale'])
+    report.add('gaps', df.index[valid][gaps], policies['gaps'])
+    if report.failed():
+        raise DataQualityError(report)
+
+    # 3. Correzioni
+    drop = np.zeros(len(df), dtype=bool)
+    if policies['ohlc'] == 'repair':
+        drop |= bad_close
+        if bad_range.any():
+            df = df.copy()
+            df['high'] = np.where(bad_range, np.fmax(np.nan_to_num(high, nan=-np.inf), body_high), high)
+            df['low'] = np.where(bad_range, np.fmin(np.nan_to_num(low, nan=np.inf), body_low), low)
+    if policies['spikes'] == 'repair':
+        drop |= spikes
+    if policies['stale'] == 'repair':
+        drop |= stale
+    if drop.any():
+        df = df[~drop]
+    return df, report
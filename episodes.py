@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+EPISODE_COLUMNS = ['start', 'end', 'regime', 'entry_price', 'exit_price', 'duration', 'max_adverse_pct', 'open']
+
+def build_episodes(index, close, is_bull):
+    """
+    Tabella degli episodi di regime (tratti consecutivi BULL o BEAR) dagli array
+    della State Machine, in un'unica passata vettoriale.
+    - entry_price / exit_price: chiusura della prima e dell'ultima barra dell'episodio
+    - duration: barre nell'episodio
+    - max_adverse_pct: movimento peggiore rispetto all'ingresso per il regime:
+      in BULL (non coperti) il ribasso massimo, in BEAR (coperti col collar) il rialzo massimo
+    - open: True per l'episodio in corso
+    """
+    close = np.asarray(close, dtype=float)
+    is_bull = np.asarray(is_bull, dtype=bool)
+    n = len(close)
+    if n == 0:
+        return pd.DataFrame(columns=EPISODE_COLUMNS)
+
+    starts = np.flatnonzero(np.concatenate([[True], is_bull[1:] != is_bull[:-1]]))
+    ends = np.append(starts[1:], n) - 1
+    bull = is_bull[starts]
+    entry = close[starts]
+    lows = np.minimum.reduceat(close, starts)
+    highs = np.maximum.reduceat(close, starts)
+    adverse = np.where(bull, lows, highs) / entry - 1
+
+    index = pd.DatetimeIndex(index)
+    return pd.DataFrame({
+        'start': index[starts],
+        'end': index[ends],
+        'regime': np.where(bull, 'BULL', 'BEAR'),
+        'entry_price': entry,
+        'exit_price': close[ends],
+        'duration': ends - starts + 1,
+        'max_adverse_pct': adverse * 100,
+        'open': np.arange(len(starts)) == len(starts) - 1
+    })
+
+class EpisodeTable:
+    """
+    Episodi di regime ordinati per data con ricerche per intervallo in O(log n):
+    gli episodi sono contigui e non sovrapposti, quindi bastano due ricerche
+    binarie sugli array ordinati di inizio e fine.
+    """
+
+    def __init__(self, episodes):
+        self.episodes = episodes.reset_index(drop=True)
+        self._starts = self.episodes['start'].to_numpy(dtype='datetime64[ns]')
+        self._ends = self.episodes['end'].to_numpy(dtype='datetime64[ns]')
+        self._regimes = self.episodes['regime'].to_numpy(dtype=object)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Episodi di un DF elaborato da apply_hedging_logic (colonne 'Close' e 'State')."""
+        return cls(build_episodes(df.index, df['Close'], (df['State'] == 'BULL').to_numpy()))
+
+    def __len__(self):
+        return len(self.episodes)
+
+    def _position(self, date):
+        return np.searchsorted(self._starts, np.datetime64(pd.Timestamp(date), 'ns'), side='right') - 1
+
+    def episode_at(self, date):
+        """Episodio (pd.Series) in corso alla data, o None se precede lo storico."""
+        i = self._position(date)
+        return None if i < 0 else self.episodes.iloc[i]
+
+    def regime_at(self, date):
+        """Regime ('BULL'/'BEAR') alla data, o None se precede lo storico."""
+        i = self._position(date)
+        return None if i < 0 else self._regimes[i]
+
+    def overlapping(self, start, end):
+        """Episodi che si sovrappongono all'intervallo [start, end]."""
+        lo = np.searchsorted(self._ends, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+        hi = np.searchsorted(self._starts, np.datetime64(pd.Timestamp(end), 'ns'), side='right')
+        return self.episodes.iloc[lo:hi]
+
+    def of_regime(self, regime):
+        return self.episodes[self.episodes['regime'] == regime]
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# Parametri di default dei filtri di conferma
+WEEKLY_SMA_WEEKS = 40      # ~ SMA 200 giornaliera su base settimanale
+ATR_PERIOD = 14
+ATR_MULTIPLIER = 1.0
+CONFIRMATION_DAYS = 3
+
+class RegimeFilter:
+    """
+    Componente di conferma per apply_hedging_logic(filters=[...]).
+    I filtri lavorano su array a lunghezza piena del DF di input e non
+    scorrono mai i dati barra per barra:
+    - bands(df, sma, upper, lower): può ridefinire le bande di isteresi
+    - confirm(df, bull_trigger, bear_trigger): può restringere i segnali decisivi
+    Di default entrambi lasciano tutto invariato.
+    """
+
+    def bands(self, df, sma, upper, lower):
+        return upper, lower
+
+    def confirm(self, df, bull_trigger, bear_trigger):
+        return bull_trigger, bear_trigger
+
+class WeeklySmaFilter(RegimeFilter):
+    """
+    Conferma multi-timeframe: il passaggio a BULL richiede anche la chiusura
+    sopra la SMA settimanale, quello a BEAR sotto.
+    Ogni giorno usa la SMA dell'ultima settimana chiusa (nessun lookahead).
+    """
+
+    def __init__(self, weeks=WEEKLY_SMA_WEEKS):
+        self.weeks = weeks
+
+    def weekly_sma(self, df):
+        """SMA delle chiusure settimanali (settimane sabato-venerdì) allineata alle barre giornaliere."""
+        # Giorni dall'epoch (1970-01-01 è un giovedì): settimana e giorno nella settimana (sabato = 0)
+        days = df.index.to_numpy().astype('datetime64[D]').astype(np.int64)
+        week_id, weekday = np.divmod(days - 2, 7)
+
+        # Chiusura settimanale = ultima barra di ogni settimana (indice ordinato)
+        last_of_week = np.flatnonzero(np.append(week_id[1:] != week_id[:-1], True))
+        weeks = week_id[last_of_week]
+        sma = pd.Series(df['Close'].to_numpy(dtype=float)[last_of_week]).rolling(self.weeks).mean().to_numpy()
+
+        # Ultima settimana chiusa per ogni barra: il venerdì include la propria settimana
+        closed_week = np.where(weekday == 6, week_id, week_id - 1)
+        pos = np.searchsorted(weeks, closed_week, side='right') - 1
+        return np.where(pos >= 0, sma[np.maximum(pos, 0)], np.nan)
+
+    def confirm(self, df, bull_trigger, bear_trigger):
+        close = df['Close'].to_numpy(dtype=float)
+        weekly = self.weekly_sma(df)
+        return bull_trigger & (close > weekly), bear_trigger & (close < weekly)
+
+class AtrBufferFilter(RegimeFilter):
+    """
+    Buffer scalato sulla volatilità: bande a SMA ± multiplier * ATR invece
+    della percentuale fissa. Richiede le colonne 'high' e 'low' (get_eodhd_data).
+    """
+
+    def __init__(self, period=ATR_PERIOD, multiplier=ATR_MULTIPLIER):
+        self.period = period
+        self.multiplier = multiplier
+
+    def atr(self, df):
+        if 'high' not in df or 'low' not in df:
+            raise ValueError("AtrBufferFilter richiede le colonne 'high' e 'low'")
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        prev_close = np.concatenate([[np.nan], df['Close'].to_numpy(dtype=float)[:-1]])
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        # Media di Wilder (EMA con alpha = 1/period)
+        return pd.Series(true_range).ewm(alpha=1 / self.period, min_periods=self.period).mean().to_numpy()
+
+    def bands(self, df, sma, upper, lower):
+        width = self.multiplier * self.atr(df)
+        return sma + width, sma - width
+
+class ConfirmationDaysFilter(RegimeFilter):
+    """
+    Conferma temporale: un cambio di regime scatta solo se la condizione di
+    attraversamento (inclusi i filtri precedenti) è vera da `days` barre consecutive.
+    Va messo per ultimo nella lista dei filtri.
+    """
+
+    def __init__(self, days=CONFIRMATION_DAYS):
+        self.days = days
+
+    @staticmethod
+    def streak(condition):
+        """Lunghezza della serie consecutiva di True che termina a ogni barra."""
+        idx = np.arange(len(condition))
+        last_false = np.maximum.accumulate(np.where(condition, -1, idx))
+        return idx - last_false
+
+    def confirm(self, df, bull_trigger, bear_trigger):
+        return self.streak(bull_trigger) >= self.days, self.streak(bear_trigger) >= self.days
@@ -0,0 +1,217 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# Timeout rigidi (connessione, lettura) in secondi: nessuna chiamata può bloccare il job
+DEFAULT_TIMEOUT = (float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5)), float(os.environ.get("HTTP_READ_TIMEOUT", 30)))
+MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 4))
+BACKOFF_BASE = 0.5   # secondi, raddoppiato a ogni tentativo
+BACKOFF_MAX = 30.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Metodi ripetibili senza effetti doppi; per gli altri (es. POST sendMessage) il retry è
+# solo su 429 e su errori di connessione, quando la richiesta non è mai partita
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+POOL_SIZE = 16
+MAX_PER_HOST = 8
+
+# Limiti di frequenza per host (richieste/secondo, burst), allineati ai piani dei servizi:
+# EODHD ~1000 richieste/minuto sui piani a pagamento, Telegram 30 messaggi/secondo globali
+DEFAULT_RATE_LIMITS = {
+    "eodhd.com": (float(os.environ.get("EODHD_RATE_PER_SEC", 15)), 15),
+    "api.telegram.org": (30.0, 30),
+}
+
+class TokenBucket:
+    """
+    Token bucket thread-safe: `rate` token al secondo, al massimo `capacity` accumulati.
+    reserve() prenota un token e restituisce quanto attendere prima di usarlo,
+    così lo stesso bucket serve sia il codice sincrono sia quello asyncio.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Backoff esponenziale con full jitter: uniforme in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def _retry_after(response):
+    """Secondi indicati dal server (header Retry-After o parametro Telegram), se presenti."""
+    value = response.headers.get("Retry-After")
+    if value is None and response.headers.get("Content-Type", "").startswith("application/json"):
+        try:
+            value = response.json().get("parameters", {}).get("retry_after")
+        except ValueError:
+            value = None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _never_sent(error):
+    """True se l'errore è avvenuto prima che il server ricevesse la richiesta (connessione non stabilita)."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+class HttpClient:
+    """
+    Client HTTP condiviso per EODHD e Telegram:
+    - pool di connessioni riusate (requests.Session)
+    - limite di richieste concorrenti per host
+    - rate limiting token bucket per host
+    - retry con backoff esponenziale e jitter su errori di rete, 429 e 5xx (metodi
+      non idempotenti: solo 429 ed errori di connessione, salvo idempotent=True)
+    - timeout rigidi su connessione e lettura
+    Espone un'interfaccia sincrona (get/post) e una asyncio (aget/apost).
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_retries=MAX_RETRIES, rate_limits=None,
+                 max_per_host=MAX_PER_HOST, pool_size=POOL_SIZE, backoff_base=BACKOFF_BASE):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_per_host = max_per_host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._buckets = {host: TokenBucket(rate, burst)
+                         for host, (rate, burst) in (rate_limits or DEFAULT_RATE_LIMITS).items()}
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host):
+        return self._buckets.get(host)
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
+
+    def _send_once(self, method, url, **kwargs):
+        """Una singola richiesta, entro il limite di concorrenza dell'host."""
+        kwargs.setdefault("timeout", self.timeout)
+        with self._semaphore(urlparse(url).hostname):
+            return self.session.request(method, url, **kwargs)
+
+    def _retry_delay(self, attempt, response, error=None, idempotent=True):
+        """Attesa prima del prossimo tentativo, o None se l'esito è definitivo."""
+        if attempt >= self.max_retries:
+            return None
+        if response is not None and response.status_code not in RETRY_STATUS:
+            return None
+        # Richiesta non ripetibile forse già eseguita dal server (5xx, timeout di lettura)
+        if not idempotent and (response.status_code != 429 if response is not None else not _never_sent(error)):
+            return None
+        delay = backoff_delay(attempt, base=self.backoff_base)
+        if response is not None and response.status_code == 429:
+            delay = max(delay, _retry_after(response) or 0)
+        return delay
+
+    def request(self, method, url, **kwargs):
+        """
+        Richiesta sincrona con rate limiting e retry.
+        Restituisce l'ultima risposta (anche se di errore); solleva l'eccezione di rete
+        solo quando i tentativi sono esauriti.
+        idempotent: forza (o esclude) il retry completo; default secondo IDEMPOTENT_METHODS.
+        """
+        idempotent = kwargs.pop("idempotent", None)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        bucket = self._bucket(urlparse(url).hostname)
+        attempt = 0
+        while True:
+            if bucket:
+                bucket.acquire()
+            response, error = None, None
+            try:
+                response = self._send_once(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            delay = self._retry_delay(attempt, response, error, idempotent)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            time.sleep(delay)
+            attempt += 1
+
+    async def arequest(self, method, url, **kwargs):
+        """
+        Versione asyncio di request(): attese e backoff non bloccano l'event loop,
+        l'I/O della richiesta gira in un thread del pool di default.
+        """
+        idempotent = kwargs.pop("idempotent", None)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        bucket = self._bucket(urlparse(url).hostname)
+        attempt = 0
+        while True:
+            if bucket:
+                await bucket.acquire_async()
+            response, error = None, None
+            try:
+                response = await asyncio.to_thread(self._send_once, method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            delay = self._retry_delay(attempt, response, error, idempotent)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    async def aget(self, url, **kwargs):
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url, **kwargs):
+        return await self.arequest("POST", url, **kwargs)
+
+_default_client = None
+_default_lock = threading.Lock()
+
+def get_client():
+    """Client condiviso dal processo (creato alla prima richiesta)."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
@@ -0,0 +1,88 @@
+import sys
+import pandas as pd
+from strategy import HysteresisEngine, SMA_WINDOW, BUFFER_PCT
+
+# Righe di tick lette per ciascun blocco: la memoria dipende da questo valore, non dal file
+CHUNK_ROWS = 1_000_000
+
+def iter_tick_chunks(path, time_col='timestamp', price_col='price', chunk_rows=CHUNK_ROWS, time_unit=None):
+    """
+    Legge un file di tick (CSV o Parquet) a blocchi.
+    price_col può essere una coppia di colonne (es. ('bid', 'ask')): si usa il mid.
+    time_unit: unità per timestamp numerici epoch (es. 'ms'); None per date testuali.
+    Restituisce blocchi DF con indice temporale e colonna 'price', senza caricare l'intero file.
+    """
+    price_cols = [price_col] if isinstance(price_col, str) else list(price_col)
+    columns = [time_col] + price_cols
+
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        batches = (batch.to_pandas() for batch in
+                   pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns))
+    else:
+        batches = pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+
+    for chunk in batches:
+        timestamps = pd.to_datetime(chunk[time_col], unit=time_unit)
+        prices = chunk[price_cols].mean(axis=1) if len(price_cols) > 1 else chunk[price_cols[0]]
+        yield pd.DataFrame({'price': prices.to_numpy(dtype=float)}, index=pd.DatetimeIndex(timestamps))
+
+def resample_ticks_stream(chunks, rule='1min'):
+    """
+    Ricampiona in streaming i tick in barre OHLC (colonne 'open', 'high', 'low', 'Close').
+    L'ultima barra di ogni blocco può essere incompleta: viene tenuta da parte e
+    fusa con il blocco successivo. Presuppone tick in ordine temporale.
+    Restituisce un generatore di DF di barre complete.
+    """
+    pending = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        buckets = chunk.index.floor(rule)
+        bars = chunk['price'].groupby(buckets).agg(['first', 'max', 'min', 'last'])
+        bars.columns = ['open', 'high', 'low', 'Close']
+
+        if pending is not None:
+            if bars.index[0] == pending.index[0]:
+                first = bars.iloc[0]
+                bars.iloc[0] = [pending['open'].iloc[0],
+                                max(pending['high'].iloc[0], first['high']),
+                                min(pending['low'].iloc[0], first['low']),
+                                first['Close']]
+            else:
+                bars = pd.concat([pending, bars])
+
+        pending = bars.iloc[-1:]
+        if len(bars) > 1:
+            yield bars.iloc[:-1]
+
+    if pending is not None:
+        yield pending
+
+def run_intraday(path, rule='1min', window=SMA_WINDOW, buffer_pct=BUFFER_PCT, engine=None, **read_kwargs):
+    """
+    Valuta il regime su barre intraday ricavate in streaming da un file di tick.
+    La SMA è calcolata su `window` barre della risoluzione scelta.
+    Conserva solo i cambi di stato: la memoria resta costante qualunque sia la dimensione del file.
+    Restituisce (engine con lo stato finale, DF dei segnali OPEN_HEDGE/CLOSE_HEDGE, numero di barre).
+    """
+    engine = engine or HysteresisEngine(window=window, buffer_pct=buffer_pct)
+    signals = []
+    n_bars = 0
+    for bars in resample_ticks_stream(iter_tick_chunks(path, **read_kwargs), rule=rule):
+        n_bars += len(bars)
+        for timestamp, close in zip(bars.index, bars['Close'].to_numpy()):
+            state, action, bands = engine.update(close, timestamp)
+            if action is not None and action != "HOLD":
+                signals.append({'date': timestamp, 'Close': close, 'State': state, 'Action': action,
+                                'Lower_Band': bands[0], 'Upper_Band': bands[1]})
+    signals = pd.DataFrame(signals, columns=['date', 'Close', 'State', 'Action', 'Lower_Band', 'Upper_Band'])
+    return engine, signals.set_index('date'), n_bars
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python intraday.py <file_tick.csv|.parquet> [regola, es. 5min]")
+        sys.exit(1)
+    engine, signals, n_bars = run_intraday(sys.argv[1], rule=sys.argv[2] if len(sys.argv) > 2 else '1min')
+    print(f"Barre elaborate: {n_bars:,} | Stato finale: {engine.state}")
+    print(signals.to_string() if not signals.empty else "Nessun cambio di regime")
@@ -0,0 +1,198 @@
+import os
+import json
+import sqlite3
+import asyncio
+import hashlib
+from itertools import zip_longest
+from datetime import datetime
+from utils import send_telegram_message_async
+from http_client import TokenBucket
+from report import render_report, pair_label, DEFAULT_LOCALE, PARSE_MODES
+
+# Elenco degli abbonati: [{"chat_id": "...", "tickers": ["EURUSD.FOREX", ...], "template": "report",
+#                          "locale": "it", "format": "markdown" | "html"}]
+SUBSCRIBERS_FILE = os.environ.get("HEDGE_SUBSCRIBERS_FILE", "subscribers.json")
+# Outbox persistente: i messaggi non consegnati vengono ritentati all'esecuzione successiva
+OUTBOX_PATH = os.environ.get("HEDGE_OUTBOX_PATH", os.path.join("state", "outbox.db"))
+MAX_WORKERS = 20
+MAX_ATTEMPTS = 5
+# Limiti Telegram: ~30 messaggi/secondo in totale, 1 messaggio/secondo per chat
+GLOBAL_RATE = 30.0
+PER_CHAT_RATE = 1.0
+
+def _report_template(ticker, processed_df, locale=DEFAULT_LOCALE, fmt='markdown'):
+    return render_report(processed_df.iloc[-1], processed_df.iloc[-2], processed_df,
+                         locale=locale, fmt=fmt, pair=pair_label(ticker))
+
+# Template disponibili: nome -> funzione (ticker, DF elaborato, lingua, formato) -> testo
+TEMPLATES = {
+    'report': _report_template,
+}
+
+def load_subscribers(path=SUBSCRIBERS_FILE):
+    """Legge gli abbonati dal file JSON (lista vuota se il file non esiste)."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+class Outbox:
+    """
+    Coda persistente dei messaggi (SQLite).
+    Ogni messaggio ha una chiave idempotente (chat, ticker, data del segnale, template):
+    riaccodarlo non crea duplicati e un messaggio già inviato non viene mai reinviato.
+    """
+
+    def __init__(self, path=OUTBOX_PATH):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                key TEXT PRIMARY KEY,
+                chat_id TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                signal_date TEXT NOT NULL,
+                template TEXT NOT NULL,
+                format TEXT NOT NULL DEFAULT 'markdown',
+                text TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                sent_at TEXT
+            )
+        """)
+        # Outbox creati prima della colonna del formato (messaggi tutti in Markdown)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(outbox)")}
+        if 'format' not in columns:
+            self.conn.execute("ALTER TABLE outbox ADD COLUMN format TEXT NOT NULL DEFAULT 'markdown'")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(chat_id, ticker, signal_date, template):
+        raw = f"{chat_id}|{ticker}|{signal_date}|{template}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def enqueue(self, rows):
+        """Accoda (chat_id, ticker, signal_date, template, format, text); ignora quelli già presenti."""
+        now = datetime.now().isoformat()
+        cursor = self.conn.executemany(
+            "INSERT OR IGNORE INTO outbox (key, chat_id, ticker, signal_date, template, format, text, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(self.make_key(c, t, d, tpl), c, t, d, tpl, fmt, text, now) for c, t, d, tpl, fmt, text in rows]
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def pending(self, max_attempts=MAX_ATTEMPTS):
+        """Messaggi da consegnare: nuovi o falliti con tentativi residui."""
+        return self.conn.execute(
+            "SELECT key, chat_id, text, format FROM outbox WHERE status != 'sent' AND attempts < ? ORDER BY created_at",
+            (max_attempts,)
+        ).fetchall()
+
+    def mark(self, key, sent):
+        if sent:
+            self.conn.execute("UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = ? WHERE key = ?",
+                              (datetime.now().isoformat(), key))
+        else:
+            self.conn.execute("UPDATE outbox SET status = 'failed', attempts = attempts + 1 WHERE key = ?", (key,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def render_messages(processed_frames, subscribers):
+    """
+    Prepara i messaggi per tutti gli abbonati.
+    Ogni (ticker, template, lingua, formato) viene renderizzato una sola volta e riusato per tutte le chat.
+    processed_frames: dict ticker -> DF di apply_hedging_logic.
+    Restituisce righe (chat_id, ticker, signal_date, template, format, text) per l'outbox.
+    """
+    rendered = {}
+    rows = []
+    for subscriber in subscribers:
+        template = subscriber.get('template', 'report')
+        locale = subscriber.get('locale', DEFAULT_LOCALE)
+        fmt = subscriber.get('format', 'markdown')
+        for ticker in subscriber.get('tickers', []):
+            df = processed_frames.get(ticker)
+            if df is None or len(df) < 2:
+                continue
+            key = (ticker, template, locale, fmt)
+            if key not in rendered:
+                rendered[key] = TEMPLATES[template](ticker, df, locale, fmt)
+            signal_date = df.index[-1].strftime('%Y-%m-%d')
+            rows.append((str(subscriber['chat_id']), ticker, signal_date, template, fmt, rendered[key]))
+    return rows
+
+async def deliver(outbox, send=send_telegram_message_async, max_workers=MAX_WORKERS,
+                  global_rate=GLOBAL_RATE, per_chat_rate=PER_CHAT_RATE):
+    """
+    Consegna concorrente dei messaggi in attesa con un pool limitato di worker,
+    rispettando il limite globale e quello per chat. L'esito di ogni messaggio
+    viene registrato subito nell'outbox.
+    Restituisce (inviati, falliti).
+    """
+    # Ordine round-robin tra le chat: i worker non restano in coda sul limite della stessa chat
+    by_chat = {}
+    for item in outbox.pending():
+        by_chat.setdefault(item[1], []).append(item)
+    queue = asyncio.Queue()
+    for round_items in zip_longest(*by_chat.values()):
+        for item in round_items:
+            if item is not None:
+                queue.put_nowait(item)
+
+    global_bucket = TokenBucket(global_rate, global_rate)
+    chat_buckets = {}
+    counts = {'sent': 0, 'failed': 0}
+
+    async def worker():
+        while True:
+            try:
+                key, chat_id, text, fmt = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            bucket = chat_buckets.setdefault(chat_id, TokenBucket(per_chat_rate, 1))
+            await bucket.acquire_async()
+            await global_bucket.acquire_async()
+            ok = await send(text, chat_id=chat_id, parse_mode=PARSE_MODES[fmt])
+            outbox.mark(key, ok)
+            counts['sent' if ok else 'failed'] += 1
+
+    await asyncio.gather(*(worker() for _ in range(max_workers)))
+    return counts['sent'], counts['failed']
+
+def dispatch(processed_frames, subscribers, outbox_path=OUTBOX_PATH, **deliver_kwargs):
+    """
+    Fan-out completo: render una volta per (ticker, template, lingua, formato), accodamento
+    idempotente nell'outbox e consegna concorrente (inclusi i falliti delle esecuzioni precedenti).
+    Restituisce (nuovi accodati, inviati, falliti).
+    """
+    outbox = Outbox(outbox_path)
+    try:
+        queued = outbox.enqueue(render_messages(processed_frames, subscribers))
+        sent, failed = asyncio.run(deliver(outbox, **deliver_kwargs))
+    finally:
+        outbox.close()
+    return queued, sent, failed
+
+def run_dispatch():
+    """Job di invio a tutti gli abbonati: scarica i ticker richiesti ed esegue il fan-out."""
+    from pipeline import fetch_many
+    from strategy import apply_hedging_logic
+
+    subscribers = load_subscribers()
+    tickers = sorted({ticker for s in subscribers for ticker in s.get('tickers', [])})
+    frames, errors = fetch_many(tickers)
+    for ticker, error in errors.items():
+        print(f"   ✗ {ticker}: {error}")
+    processed = {ticker: apply_hedging_logic(df) for ticker, df in frames.items()}
+    queued, sent, failed = dispatch(processed, subscribers)
+    print(f"Accodati {queued}, inviati {sent}, falliti {failed}")
+
+if __name__ == "__main__":
+    run_dispatch()
@@ -0,0 +1,79 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from utils import get_eodhd_data
+from strategy import apply_hedging_logic_wide, BUFFER_PCT, SMA_WINDOW
+
+# Paniere di default delle esposizioni coperte
+DEFAULT_TICKERS = [
+    "EURUSD.FOREX", "GBPUSD.FOREX", "USDJPY.FOREX", "USDCHF.FOREX", "EURCHF.FOREX"
+]
+# Limite ai download simultanei (rispettoso del piano EODHD)
+MAX_WORKERS = 8
+
+def fetch_many(tickers, max_workers=MAX_WORKERS, **fetch_kwargs):
+    """
+    Scarica più ticker in parallelo con un pool di thread limitato.
+    Un errore su un ticker non interrompe gli altri.
+    Restituisce (dict ticker -> DF, dict ticker -> messaggio di errore).
+    """
+    frames, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(get_eodhd_data, ticker, **fetch_kwargs): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                frames[ticker] = future.result()
+            except Exception as e:
+                errors[ticker] = str(e)
+    return frames, errors
+
+def build_signal_table(frames, buffer_pct=BUFFER_PCT, window=SMA_WINDOW):
+    """
+    Applica la logica di copertura a tutti i ticker in un'unica passata
+    sulla matrice larga dei Close.
+    Restituisce (tabella segnali per ticker, dict dei DF larghi degli indicatori).
+    """
+    if not frames:
+        return pd.DataFrame(), {}
+    close = pd.DataFrame({ticker: df['Close'] for ticker, df in frames.items()}).sort_index()
+    wide = apply_hedging_logic_wide(close, buffer_pct=buffer_pct, window=window)
+
+    rows = []
+    for ticker in close.columns:
+        valid = wide['State'][ticker].dropna()
+        if valid.empty:
+            continue
+        date = valid.index[-1]
+        rows.append({
+            'Ticker': ticker,
+            'Date': date,
+            'Close': close.at[date, ticker],
+            'SMA200': wide['SMA200'].at[date, ticker],
+            'Upper_Band': wide['Upper_Band'].at[date, ticker],
+            'Lower_Band': wide['Lower_Band'].at[date, ticker],
+            'State': valid.iloc[-1],
+            'Action': wide['Action'].at[date, ticker],
+            'Distance_Pct': wide['Distance_Pct'].at[date, ticker]
+        })
+    return pd.DataFrame(rows).set_index('Ticker'), wide
+
+def run_batch(tickers=DEFAULT_TICKERS, buffer_pct=BUFFER_PCT, window=SMA_WINDOW, max_workers=MAX_WORKERS,
+              **fetch_kwargs):
+    """
+    Pipeline multi-ticker: download concorrente + segnali in un'unica passata.
+    Restituisce (tabella segnali, errori per ticker).
+    """
+    frames, errors = fetch_many(tickers, max_workers=max_workers, **fetch_kwargs)
+    signals, _ = build_signal_table(frames, buffer_pct=buffer_pct, window=window)
+    for ticker in tickers:
+        if ticker in frames and ticker not in signals.index:
+            errors[ticker] = f"Storico insufficiente per la SMA {window}"
+    return signals, errors
+
+if __name__ == "__main__":
+    tickers = sys.argv[1:] or DEFAULT_TICKERS
+    signals, errors = run_batch(tickers)
+    print(signals.to_string() if not signals.empty else "Nessun segnale disponibile")
+    for ticker, error in errors.items():
+        print(f"✗ {ticker}: {error}")
@@ -0,0 +1,196 @@
+import time
+import numpy as np
+import pandas as pd
+
+BASE_CURRENCY = 'EUR'
+# Finestra della covarianza dei rendimenti valutari (giorni)
+COV_WINDOW = 60
+# Regolarizzazione relativa dei sistemi a varianza minima
+RIDGE = 1e-10
+
+def parse_pair(ticker):
+    """'GBPUSD.FOREX' -> ('GBP', 'USD')."""
+    symbol = ticker.split('.')[0]
+    return symbol[:3], symbol[3:6]
+
+def pair_matrix(pairs, currencies, base=BASE_CURRENCY):
+    """
+    Matrice valute x coppie dell'effetto di una copertura: comprare 1 (in valuta base
+    del portafoglio) della coppia BBB/QQQ aggiunge +1 di esposizione a BBB e -1 a QQQ.
+    La valuta base del portafoglio non compare tra le righe.
+    """
+    row = {c: i for i, c in enumerate(currencies)}
+    A = np.zeros((len(currencies), len(pairs)))
+    for j, ticker in enumerate(pairs):
+        first, second = parse_pair(ticker)
+        if first != base:
+            A[row[first], j] += 1.0
+        if second != base:
+            A[row[second], j] -= 1.0
+    return A
+
+def currency_returns(rates, base=BASE_CURRENCY):
+    """
+    Rendimenti logaritmici del valore di ogni valuta in valuta base.
+    rates: DF (date x valuta) dei cambi base/valuta (es. colonna 'USD' = EURUSD).
+    """
+    return -np.log(rates).diff().iloc[1:]
+
+class RollingCovariance:
+    """
+    Covarianza mobile aggiornata in modo incrementale: somme e somme dei prodotti
+    esterni della finestra, con l'osservazione che esce sottratta. Ogni nuovo
+    giorno costa O(n^2) invece di O(window * n^2).
+    """
+
+    def __init__(self, n, window=COV_WINDOW):
+        self.window = window
+        self.buffer = np.zeros((window, n))
+        self.count = 0
+        self._sum = np.zeros(n)
+        self._outer = np.zeros((n, n))
+
+    def update(self, x):
+        x = np.asarray(x, dtype=float)
+        slot = self.count % self.window
+        if self.count >= self.window:
+            old = self.buffer[slot]
+            self._sum -= old
+            self._outer -= np.outer(old, old)
+        self.buffer[slot] = x
+        self._sum += x
+        self._outer += np.outer(x, x)
+        self.count += 1
+
+    @property
+    def covariance(self):
+        """Covarianza campionaria della finestra (None finché la finestra non è piena)."""
+        if self.count < self.window:
+            return None
+        mean = self._sum / self.window
+        return (self._outer - self.window * np.outer(mean, mean)) / (self.window - 1)
+
+def rolling_covariances(returns, window=COV_WINDOW):
+    """
+    Versione batch della stessa ricorrenza: somme cumulative dei prodotti esterni,
+    la finestra è la differenza tra due istanti. Restituisce un array
+    (tempo x n x n), NaN prima che la finestra sia piena.
+    """
+    x = np.asarray(returns, dtype=float)
+    T, n = x.shape
+    cum_sum = np.cumsum(x, axis=0)
+    cum_outer = np.einsum('ti,tj->tij', x, x)
+    np.cumsum(cum_outer, axis=0, out=cum_outer)
+
+    cov = np.full((T, n, n), np.nan)
+    if T >= window:
+        sums = cum_sum[window - 1:].copy()
+        sums[1:] -= cum_sum[:-window]
+        outer = cov[window - 1:]
+        outer[0] = cum_outer[window - 1]
+        np.subtract(cum_outer[window:], cum_outer[:-window], out=outer[1:])
+        mean = sums / window
+        outer -= window * mean[:, :, None] * mean[:, None, :]
+        outer /= window - 1
+    return cov
+
+def _batched_solve(M, rhs):
+    """
+    Risolve M x = rhs per ogni giorno con un ridge relativo minimo: con cross
+    ridondanti (es. EURUSD, EURGBP e GBPUSD tutti attivi) M è singolare, e il
+    ridge dà la soluzione di norma minima senza una SVD per giorno.
+    """
+    scale = np.trace(M, axis1=1, axis2=2) / M.shape[1]
+    M = M + np.eye(M.shape[1]) * (RIDGE * scale)[:, None, None]
+    return np.linalg.solve(M, rhs[:, :, None])[:, :, 0]
+
+def compute_portfolio_hedges(exposures, rates, states, window=COV_WINDOW, base=BASE_CURRENCY):
+    """
+    Coperture a livello di portafoglio su una matrice di esposizioni multi-valuta.
+    exposures: pd.Series valuta -> esposizione (in valuta base), oppure DF
+        (entità x valuta) che viene nettato per valuta.
+    rates: DF (date x valuta) dei cambi base/valuta, es. colonna 'USD' = EURUSD.
+    states: DF (date x coppia, es. 'EURUSD.FOREX', 'GBPUSD.FOREX') con i regimi
+        di apply_hedging_logic_wide: le coppie in BEAR sono gli strumenti di copertura attivi.
+
+    Due soluzioni per ogni giorno, entrambe in forma matriciale:
+    - binaria: le coppie attive coprono integralmente le esposizioni delle valute
+      che toccano (minimi quadrati: i cross sovrapposti non raddoppiano la copertura)
+    - a varianza minima: nozionali delle coppie attive che minimizzano la varianza
+      del P&L del portafoglio data la covarianza mobile dei rendimenti valutari
+    Le soluzioni binarie si calcolano una volta per combinazione di coppie attive.
+
+    Restituisce un dict di DF: 'net_hedge' e 'pair_notionals' (binari),
+    'minvar_net_hedge', 'minvar_pair_notionals', 'hedge_ratio' (varianza minima,
+    frazione coperta dell'esposizione di ciascuna valuta) e 'elapsed_s'.
+    """
+    start = time.perf_counter()
+    if isinstance(exposures, pd.DataFrame):
+        exposures = exposures.sum(axis=0)
+    currencies = [c for c in exposures.index if c != base]
+    pairs = list(states.columns)
+    e = exposures[currencies].to_numpy(dtype=float)
+    A = pair_matrix(pairs, currencies, base)
+
+    returns = currency_returns(rates[currencies], base)
+    dates = returns.index.intersection(states.index)
+    r = returns.loc[dates].to_numpy()
+    active = (states.loc[dates] == 'BEAR').to_numpy()
+    T, p = active.shape
+
+    # --- Copertura binaria: una soluzione per ogni combinazione distinta di coppie attive ---
+    patterns, inverse = np.unique(active, axis=0, return_inverse=True)
+    binary_n = np.zeros((len(patterns), p))
+    for k, mask in enumerate(patterns):
+        if mask.any():
+            A_s = A[:, mask]
+            touched = np.abs(A_s).sum(axis=1) > 0
+            binary_n[k, mask] = np.linalg.lstsq(A_s, -e * touched, rcond=None)[0]
+    pair_n = binary_n[inverse.ravel()]
+
+    # --- Copertura a varianza minima con covarianza mobile ---
+    cov = rolling_covariances(r, window)
+    ready = slice(window - 1, None)              # giorni con la finestra piena
+    m = active[ready].astype(float)
+    S = cov[ready]
+    AtS = np.matmul(A.T, S)                      # (t x p x c)
+    M = np.matmul(AtS, A)                        # (t x p x p)
+    rhs = -np.einsum('tpc,c->tp', AtS, e)
+    # Coppie non attive: riga/colonna identità e termine noto nullo -> nozionale zero
+    M = M * m[:, :, None] * m[:, None, :] + np.eye(p) * (1 - m)[:, :, None]
+    minvar_n = np.full((T, p), np.nan)
+    minvar_n[ready] = _batched_solve(M, rhs * m)
+
+    minvar_net = minvar_n @ A.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(e != 0, -minvar_net / e, np.nan)
+
+    def frame(values, columns):
+        return pd.DataFrame(values, index=dates, columns=columns)
+
+    return {
+        'pair_notionals': frame(pair_n, pairs),
+        'net_hedge': frame(pair_n @ A.T, currencies),
+        'minvar_pair_notionals': frame(minvar_n, pairs),
+        'minvar_net_hedge': frame(minvar_net, currencies),
+        'hedge_ratio': frame(ratio, currencies),
+        'elapsed_s': time.perf_counter() - start,
+    }
+
+if __name__ == "__main__":
+    from pipeline import fetch_many
+    from strategy import apply_hedging_logic_wide
+
+    exposures = pd.Series({'USD': 1_000_000, 'GBP': 300_000, 'JPY': 200_000, 'CHF': 150_000})
+    pairs = ["EURUSD.FOREX", "EURGBP.FOREX", "EURJPY.FOREX", "EURCHF.FOREX", "GBPUSD.FOREX"]
+    frames, errors = fetch_many(pairs)
+    for ticker, error in errors.items():
+        print(f"✗ {ticker}: {error}")
+    close = pd.DataFrame({t: df['Close'] for t, df in frames.items()})
+    rates = close[[f"EUR{c}.FOREX" for c in exposures.index]].set_axis(list(exposures.index), axis=1)
+    result = compute_portfolio_hedges(exposures, rates.dropna(), apply_hedging_logic_wide(close)['State'])
+    print("Copertura netta per valuta (ultimo giorno):")
+    print(result['net_hedge'].iloc[-1].round(0).to_string())
+    print("\nHedge ratio a varianza minima (ultimo giorno):")
+    print(result['hedge_ratio'].iloc[-1].round(3).to_string())
+    print(f"\nCalcolato in {result['elapsed_s'] * 1000:.1f} ms")
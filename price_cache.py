@@ -0,0 +1,63 @@
+import os
+import time
+import pandas as pd
+
+# Directory di default della cache locale dei prezzi
+DEFAULT_CACHE_DIR = os.environ.get("EODHD_CACHE_DIR", os.path.join(".cache", "eodhd"))
+# Policy di staleness: entro questo intervallo dall'ultimo aggiornamento la cache
+# viene servita senza alcuna chiamata API
+DEFAULT_MAX_AGE_HOURS = float(os.environ.get("EODHD_CACHE_MAX_AGE_HOURS", 6))
+
+class PriceCache:
+    """
+    Cache persistente su disco dei prezzi EODHD: un file Parquet per ticker.
+    Le scritture sono atomiche (file temporaneo + rename) così i lettori
+    concorrenti (dashboard e bot) non vedono mai file scritti a metà.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_age_hours=DEFAULT_MAX_AGE_HOURS):
+        self.cache_dir = cache_dir
+        self.max_age_hours = max_age_hours
+
+    def path(self, ticker):
+        safe_name = ticker.replace("/", "_")
+        return os.path.join(self.cache_dir, f"{safe_name}.parquet")
+
+    def read(self, ticker):
+        """Restituisce il DF in cache oppure None se assente o illeggibile."""
+        try:
+            return pd.read_parquet(self.path(ticker))
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+
+    def write(self, ticker, df):
+        """Scrive il DF in modo atomico (write-then-rename)."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(ticker)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            # Nessun file temporaneo orfano: il file in cache resta quello precedente
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def is_fresh(self, ticker):
+        """True se il file è stato aggiornato entro max_age_hours."""
+        try:
+            age_seconds = time.time() - os.path.getmtime(self.path(ticker))
+        except OSError:
+            return False
+        return age_seconds < self.max_age_hours * 3600
+
+    def merge(self, cached, new_bars):
+        """Unisce barre nuove e cache: a parità di data vince il dato più recente."""
+        if cached is None or cached.empty:
+            return new_bars.sort_index()
+        if new_bars.empty:
+            return cached
+        combined = pd.concat([cached, new_bars])
+        combined = combined[~combined.index.duplicated(keep='last')]
+        return combined.sort_index()
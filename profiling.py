@@ -0,0 +1,77 @@
+import os
+import time
+import cProfile
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# Profiling opzionale in produzione: HEDGE_PROFILE=1 lo attiva
+PROFILE_ENV = "HEDGE_PROFILE"
+PROFILE_DIR = os.environ.get("HEDGE_PROFILE_DIR", "profiles")
+
+def profiling_enabled():
+    return os.environ.get(PROFILE_ENV, "").lower() not in ("", "0", "false")
+
+def measure(func, *args, repeat=3, **kwargs):
+    """
+    Misura una funzione: tempo di esecuzione, picco di memoria Python e blocchi
+    di memoria allocati (e ancora vivi) al termine.
+    Il tempo è il migliore di `repeat` esecuzioni senza tracemalloc, che le rallenterebbe.
+    Restituisce (risultato, dict con 'wall_s', 'peak_kb', 'net_blocks').
+    """
+    wall_s = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        wall_s = min(wall_s, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        result = func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    net_blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    return result, {'wall_s': wall_s, 'peak_kb': peak / 1024, 'net_blocks': net_blocks}
+
+@contextmanager
+def profile_stage(name):
+    """
+    Misura tempo e picco di memoria di uno stadio della pipeline (fetch, signal, ...).
+    Senza HEDGE_PROFILE non fa nulla.
+    """
+    if not profiling_enabled():
+        yield
+        return
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        if not already_tracing:
+            tracemalloc.stop()
+        print(f"   ⏱️ [{name}] {elapsed * 1000:.1f} ms, picco memoria {peak / 1024:.0f} KB")
+
+def run_profiled(func, *args, **kwargs):
+    """
+    Esegue func; con HEDGE_PROFILE attivo la esegue sotto cProfile, salva il
+    profilo in PROFILE_DIR (leggibile con pstats/snakeviz) e stampa le funzioni più costose.
+    """
+    if not profiling_enabled():
+        return func(*args, **kwargs)
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{func.__name__}_{datetime.now():%Y%m%d_%H%M%S}.prof")
+    profiler.dump_stats(path)
+    print(f"\n📊 Profilo salvato in {path}")
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+    return result
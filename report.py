@@ -0,0 +1,364 @@
+import os
+import re
+from operator import itemgetter
+from strategy import SignalStats, BUFFER_PCT
+
+# Lingua di default dei report e link alla dashboard pubblica
+DEFAULT_LOCALE = os.environ.get("HEDGE_REPORT_LOCALE", "it")
+DASHBOARD_URL = "https://strategiacoperturaeuro-k6pduahqzjxoqtc47alrqr.streamlit.app/"
+# parse_mode di Telegram per ogni formato di output
+PARSE_MODES = {'markdown': 'Markdown', 'html': 'HTML'}
+
+RULE = "━━━━━━━━━━━━━━━━━━━━━━"
+DOUBLE_RULE = "═══════════════════════"
+BOX_TOP = "┌─────────────────────┐"
+BOX_BOTTOM = "└─────────────────────┘"
+
+# Layout per lingua in un markup neutro: <b>, <i>, <code>, <a href="..."> e campi {nome}.
+# {state_block} e {action_block} vengono sostituiti dalle varianti per stato e azione.
+# I layout vengono compilati una sola volta per (lingua, formato, stato, azione).
+LOCALES = {
+    'it': {
+        'days': ['lunedì', 'martedì', 'mercoledì', 'giovedì', 'venerdì', 'sabato', 'domenica'],
+        'months': ['gennaio', 'febbraio', 'marzo', 'aprile', 'maggio', 'giugno', 'luglio',
+                   'agosto', 'settembre', 'ottobre', 'novembre', 'dicembre'],
+        'layout': (
+            f"{RULE}\n"
+            "🛡️  <b>KRITERION QUANT</b>\n"
+            "      FX Hedging Report\n"
+            f"{RULE}"
+            "\n📅 <b>{date}</b>\n"
+            f"\n{BOX_TOP}\n"
+            "│     📊 <b>MERCATO</b>         │\n"
+            f"{BOX_BOTTOM}\n\n"
+            "💶 <b>{pair} Spot:</b>  <code>{spot}</code>\n"
+            "      {arrow} {change} ({change_pct}%)\n\n"
+            "📈 <b>SMA 200:</b>  <code>{sma}</code>\n"
+            "📐 <b>Distanza:</b>  <code>{distance}%</code>\n"
+            f"\n{BOX_TOP}\n"
+            "│   📏 <b>BANDE ISTERESI</b>   │\n"
+            f"{BOX_BOTTOM}\n\n"
+            "🟢 Upper (+{buffer}%): <code>{upper}</code>\n"
+            "🔴 Lower (-{buffer}%):  <code>{lower}</code>\n"
+            f"\n{BOX_TOP}\n"
+            "│     📡 <b>STATO</b>            │\n"
+            f"{BOX_BOTTOM}\n\n"
+            "{state_block}"
+            "\n\n"
+            f"{DOUBLE_RULE}\n"
+            "{action_block}"
+            f"\n\n{RULE}\n"
+            "📊 <i>Storico: {hedge_pct}% tempo hedged</i>\n"
+            "⏳ <i>Copertura media: {avg_hedge_days} giorni ({switches} segnali)</i>\n"
+            f"{RULE}\n\n"
+            "🔗 <a href=\"{dashboard_url}\">Dashboard Interattiva</a>\n\n"
+            "<i>Kriterion Quant — Finanza Quantitativa Accessibile</i>"
+        ),
+        'state_blocks': {
+            'BEAR': "🔴 <b>Regime: BEAR</b>\n🛡️ Status: <b>HEDGED</b>\n📍 Buffer → Bull: <code>{buffer_distance}</code>",
+            'BULL': "🟢 <b>Regime: BULL</b>\n💤 Status: <b>UNHEDGED</b>\n📍 Buffer → Bear: <code>{buffer_distance}</code>",
+        },
+        'action_blocks': {
+            'OPEN_HEDGE': (
+                "🚨 <b>SEGNALE: ATTIVARE COPERTURA</b> 🚨\n"
+                f"{DOUBLE_RULE}\n\n"
+                "Eseguire struttura <b>COLLAR</b>:\n\n"
+                "   🔹 <b>BUY PUT</b> {pair}\n"
+                "       Delta: 0.25\n"
+                "       Scopo: Protezione downside\n\n"
+                "   🔸 <b>SELL CALL</b> {pair}\n"
+                "       Delta: 0.35\n"
+                "       Scopo: Finanziamento premio\n"
+            ),
+            'CLOSE_HEDGE': (
+                "✅ <b>SEGNALE: RIMUOVERE COPERTURA</b> ✅\n"
+                f"{DOUBLE_RULE}\n\n"
+                "   📌 Chiudere posizioni opzionali\n"
+                "   📌 Tornare in stato <b>Unhedged</b>\n"
+            ),
+            'HOLD_BEAR': (
+                "🛡️ <b>NESSUN SEGNALE</b>\n"
+                f"{DOUBLE_RULE}\n\n"
+                "   ↳ Mantenere copertura attiva\n"
+                "   ↳ Collar in essere\n"
+            ),
+            'HOLD_BULL': (
+                "💤 <b>NESSUN SEGNALE</b>\n"
+                f"{DOUBLE_RULE}\n\n"
+                "   ↳ Rimanere unhedged\n"
+                "   ↳ Nessuna azione richiesta\n"
+            ),
+        },
+    },
+    'en': {
+        'days': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+        'months': ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                   'August', 'September', 'October', 'November', 'December'],
+        'layout': (
+            f"{RULE}\n"
+            "🛡️  <b>KRITERION QUANT</b>\n"
+            "      FX Hedging Report\n"
+            f"{RULE}"
+            "\n📅 <b>{date}</b>\n"
+            f"\n{BOX_TOP}\n"
+            "│     📊 <b>MARKET</b>          │\n"
+            f"{BOX_BOTTOM}\n\n"
+            "💶 <b>{pair} Spot:</b>  <code>{spot}</code>\n"
+            "      {arrow} {change} ({change_pct}%)\n\n"
+            "📈 <b>SMA 200:</b>  <code>{sma}</code>\n"
+            "📐 <b>Distance:</b>  <code>{distance}%</code>\n"
+            f"\n{BOX_TOP}\n"
+            "│  📏 <b>HYSTERESIS BANDS</b>  │\n"
+            f"{BOX_BOTTOM}\n\n"
+            "🟢 Upper (+{buffer}%): <code>{upper}</code>\n"
+            "🔴 Lower (-{buffer}%):  <code>{lower}</code>\n"
+            f"\n{BOX_TOP}\n"
+            "│     📡 <b>STATUS</b>           │\n"
+            f"{BOX_BOTTOM}\n\n"
+            "{state_block}"
+            "\n\n"
+            f"{DOUBLE_RULE}\n"
+            "{action_block}"
+            f"\n\n{RULE}\n"
+            "📊 <i>History: {hedge_pct}% of time hedged</i>\n"
+            "⏳ <i>Average hedge: {avg_hedge_days} days ({switches} signals)</i>\n"
+            f"{RULE}\n\n"
+            "🔗 <a href=\"{dashboard_url}\">Interactive Dashboard</a>\n\n"
+            "<i>Kriterion Quant — Accessible Quantitative Finance</i>"
+        ),
+        'state_blocks': {
+            'BEAR': "🔴 <b>Regime: BEAR</b>\n🛡️ Status: <b>HEDGED</b>\n📍 Buffer → Bull: <code>{buffer_distance}</code>",
+            'BULL': "🟢 <b>Regime: BULL</b>\n💤 Status: <b>UNHEDGED</b>\n📍 Buffer → Bear: <code>{buffer_distance}</code>",
+        },
+        'action_blocks': {
+            'OPEN_HEDGE': (
+                "🚨 <b>SIGNAL: OPEN HEDGE</b> 🚨\n"
+                f"{DOUBLE_RULE}\n\n"
+                "Execute a <b>COLLAR</b> structure:\n\n"
+                "   🔹 <b>BUY PUT</b> {pair}\n"
+                "       Delta: 0.25\n"
+                "       Purpose: downside protection\n\n"
+                "   🔸 <b>SELL CALL</b> {pair}\n"
+                "       Delta: 0.35\n"
+                "       Purpose: premium financing\n"
+            ),
+            'CLOSE_HEDGE': (
+                "✅ <b>SIGNAL: REMOVE HEDGE</b> ✅\n"
+                f"{DOUBLE_RULE}\n\n"
+                "   📌 Close option positions\n"
+                "   📌 Return to <b>Unhedged</b> status\n"
+            ),
+            'HOLD_BEAR': (
+                "🛡️ <b>NO SIGNAL</b>\n"
+                f"{DOUBLE_RULE}\n\n"
+                "   ↳ Keep the hedge active\n"
+                "   ↳ Collar in place\n"
+            ),
+            'HOLD_BULL': (
+                "💤 <b>NO SIGNAL</b>\n"
+                f"{DOUBLE_RULE}\n\n"
+                "   ↳ Stay unhedged\n"
+                "   ↳ No action required\n"
+            ),
+        },
+    },
+}
+
+# Escape per formato e contesto del campo (fuori da entità, grassetto, corsivo, codice, URL).
+# Markdown (legacy) di Telegram: fuori dalle entità si antepone '\' a _ * ` [;
+# dentro un'entità non si può fare escape, quindi si chiude, si scrive il carattere e si riapre.
+ESCAPES = {
+    'markdown': {
+        None: str.maketrans({'_': '\\_', '*': '\\*', '`': '\\`', '[': '\\['}),
+        'b': str.maketrans({'*': '*\\**'}),
+        'i': str.maketrans({'_': '_\\__'}),
+        'code': str.maketrans({'`': "'"}),
+        'a': str.maketrans({'_': '\\_', '*': '\\*', '`': '\\`', '[': '\\[', ']': ')'}),
+        'url': str.maketrans({')': '%29', ' ': '%20'}),
+    },
+    'html': {
+        None: str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'}),
+        'url': str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}),
+    },
+}
+for _mode in ('b', 'i', 'code', 'a'):
+    ESCAPES['html'][_mode] = ESCAPES['html'][None]
+
+# Marcatori delle entità nei due formati: tag neutro -> (apertura, chiusura)
+MARKUP = {
+    'markdown': {'b': ('*', '*'), 'i': ('_', '_'), 'code': ('`', '`')},
+    'html': {'b': ('<b>', '</b>'), 'i': ('<i>', '</i>'), 'code': ('<code>', '</code>')},
+}
+
+_TOKEN = re.compile(r'(</?(?:b|i|code)>|<a href="[^"]*">|</a>|\{\w+\})')
+_FIELD = re.compile(r'\{(\w+)\}')
+
+class CompiledTemplate:
+    """
+    Template già analizzato: letterali già sottoposti a escape, alternati ai campi
+    (nome, tabella di escape, caratteri speciali). render() fa translate solo dei
+    valori che contengono caratteri speciali e un'unica join.
+    """
+
+    def __init__(self, literals, fields):
+        self.parts = [None] * (2 * len(fields) + 1)
+        self.parts[::2] = literals
+        self.fields = [name for name, _ in fields]
+        # itemgetter con un solo nome restituisce il valore e non una tupla
+        self._values = itemgetter(*self.fields) if len(fields) > 1 else (lambda c: [c[n] for n in self.fields])
+        self._escapes = [(table, frozenset(chr(c) for c in table)) for _, table in fields]
+
+    def render(self, context):
+        parts = self.parts.copy()
+        parts[1::2] = [value if specials.isdisjoint(value) else value.translate(table)
+                       for value, (table, specials) in zip(self._values(context), self._escapes)]
+        return ''.join(parts)
+
+def compile_template(source, fmt='markdown'):
+    """Analizza un template in markup neutro e lo traduce nel formato di output (markdown o html)."""
+    escapes = ESCAPES[fmt]
+    literals, fields = [], []
+    out = []
+    stack = []
+
+    def emit_text(text, mode):
+        # Letterali e campi con l'escape del contesto corrente
+        for i, part in enumerate(_FIELD.split(text)):
+            if i % 2:
+                literals.append(''.join(out))
+                out.clear()
+                fields.append((part, escapes[mode]))
+            else:
+                out.append(part.translate(escapes[mode]))
+
+    for i, token in enumerate(_TOKEN.split(source)):
+        if i % 2 == 0:
+            emit_text(token, stack[-1][0] if stack else None)
+        elif token.startswith('<a '):
+            href = token[len('<a href="'):-2]
+            stack.append(('a', href))
+            if fmt == 'html':
+                out.append('<a href="')
+                emit_text(href, 'url')
+                out.append('">')
+            else:
+                out.append('[')
+        elif token == '</a>':
+            _, href = stack.pop()
+            if fmt == 'html':
+                out.append('</a>')
+            else:
+                out.append('](')
+                emit_text(href, 'url')
+                out.append(')')
+        elif token.startswith('</'):
+            tag = token[2:-1]
+            stack.pop()
+            out.append(MARKUP[fmt][tag][1])
+        elif token.startswith('<'):
+            tag = token[1:-1]
+            stack.append((tag, None))
+            out.append(MARKUP[fmt][tag][0])
+        else:
+            emit_text(token, stack[-1][0] if stack else None)
+    if stack:
+        raise ValueError(f"Tag non chiuso nel template: {stack[-1][0]}")
+    literals.append(''.join(out))
+    return CompiledTemplate(literals, fields)
+
+class ReportRenderer:
+    """
+    Report di una lingua in un formato: tutte le combinazioni stato x azione
+    vengono compilate alla creazione, render() riempie solo i campi del contesto.
+    """
+
+    def __init__(self, locale=DEFAULT_LOCALE, fmt='markdown'):
+        spec = LOCALES[locale]
+        self.locale = locale
+        self.fmt = fmt
+        self.templates = {}
+        for state, state_block in spec['state_blocks'].items():
+            for action, action_block in spec['action_blocks'].items():
+                source = spec['layout'].replace('{state_block}', state_block).replace('{action_block}', action_block)
+                self.templates[(state, action)] = compile_template(source, fmt)
+
+    def render(self, context):
+        state, action = context['state'], context['action']
+        if action == 'HOLD':
+            action = f"HOLD_{state}"
+        return self.templates[(state, action)].render(context)
+
+_renderers = {}
+
+def get_renderer(locale=DEFAULT_LOCALE, fmt='markdown'):
+    """Renderer condiviso per (lingua, formato), compilato al primo uso."""
+    key = (locale, fmt)
+    if key not in _renderers:
+        _renderers[key] = ReportRenderer(locale, fmt)
+    return _renderers[key]
+
+def format_number(value, decimals=4):
+    """Formatta un numero con separatore migliaia e decimali specificati."""
+    return f"{value:,.{decimals}f}"
+
+def get_trend_arrow(current, previous):
+    """Restituisce freccia trend basata sul confronto."""
+    if current > previous:
+        return "↗️"
+    elif current < previous:
+        return "↘️"
+    else:
+        return "➡️"
+
+def pair_label(ticker):
+    """'EURUSD.FOREX' -> 'EUR/USD'."""
+    symbol = ticker.split('.')[0]
+    return f"{symbol[:3]}/{symbol[3:]}" if len(symbol) == 6 else symbol
+
+def build_context(last_row, prev_row, stats, buffer_pct=BUFFER_PCT, locale=DEFAULT_LOCALE,
+                  pair="EUR/USD", dashboard_url=DASHBOARD_URL):
+    """Campi del report (già formattati come testo) dalle ultime due righe e dalle statistiche."""
+    spec = LOCALES[locale]
+    date = last_row.name
+    spot = last_row['Close']
+    prev_spot = prev_row['Close']
+    state = last_row['State']
+    upper_band = last_row['Upper_Band']
+    lower_band = last_row['Lower_Band']
+
+    daily_change = spot - prev_spot
+    daily_change_pct = (daily_change / prev_spot) * 100
+    change_sign = "+" if daily_change >= 0 else ""
+    buffer_distance = upper_band - spot if state == "BEAR" else spot - lower_band
+
+    return {
+        'state': state,
+        'action': last_row['Action'],
+        'date': f"{spec['days'][date.weekday()]}, {date.day:02d} {spec['months'][date.month - 1]} {date.year}",
+        'pair': pair,
+        'spot': format_number(spot),
+        'arrow': get_trend_arrow(spot, prev_spot),
+        'change': f"{change_sign}{format_number(daily_change)}",
+        'change_pct': f"{change_sign}{daily_change_pct:.2f}",
+        'sma': format_number(last_row['SMA200']),
+        'distance': f"{last_row['Distance_Pct']:+.2f}",
+        'buffer': f"{buffer_pct * 100:g}",
+        'upper': format_number(upper_band),
+        'lower': format_number(lower_band),
+        'buffer_distance': format_number(buffer_distance),
+        'hedge_pct': f"{stats.hedge_pct:.1f}",
+        'avg_hedge_days': f"{stats.avg_hedge_duration:.0f}",
+        'switches': str(stats.switches),
+        'dashboard_url': dashboard_url,
+    }
+
+def render_report(last_row, prev_row, df=None, stats=None, buffer_pct=BUFFER_PCT, locale=DEFAULT_LOCALE,
+                  fmt='markdown', pair="EUR/USD"):
+    """
+    Report giornaliero nella lingua e nel formato richiesti.
+    stats: SignalStats già aggiornate (se None vengono ricavate da df).
+    """
+    if stats is None:
+        stats = SignalStats.from_frame(df)
+    context = build_context(last_row, prev_row, stats, buffer_pct, locale, pair)
+    return get_renderer(locale, fmt).render(context)
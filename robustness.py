@@ -0,0 +1,133 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from strategy import compute_hysteresis_states, SMA_WINDOW, BUFFER_PCT
+from sweep import run_parameter_sweep, hedge_metrics, WHIPSAW_DAYS
+
+# Walk-forward: ~6 anni di addestramento, 1 anno fuori campione per fold
+TRAIN_DAYS = 1500
+TEST_DAYS = 250
+# Monte Carlo: lunghezza dei blocchi di rendimenti ricampionati (mantiene autocorrelazione e cluster di volatilità)
+BLOCK_SIZE = 20
+# Percorsi generati e valutati da ciascun task del process pool
+CHUNK_PATHS = 250
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+def walk_forward(close, windows, buffers, train_days=TRAIN_DAYS, test_days=TEST_DAYS,
+                 objective='pnl_hedged_pct', whipsaw_days=WHIPSAW_DAYS, max_workers=None):
+    """
+    Ottimizzazione walk-forward di finestra SMA e buffer.
+    Per ogni fold la griglia viene valutata sul periodo di addestramento
+    (run_parameter_sweep) e la combinazione migliore secondo `objective`
+    viene applicata ai test_days successivi, mai visti in ottimizzazione.
+    Lo stato di isteresi nel test prosegue da quello dell'addestramento.
+    close: pd.Series dei prezzi di chiusura.
+    Restituisce un DF per fold con parametri scelti, metrica in-sample e metriche fuori campione.
+    """
+    close = pd.Series(close, dtype=float)
+    values = close.to_numpy()
+    folds = []
+    for train_start in range(0, len(values) - train_days - test_days + 1, test_days):
+        test_start = train_start + train_days
+        test_end = test_start + test_days
+        grid = run_parameter_sweep(values[train_start:test_start], windows, buffers,
+                                   whipsaw_days=whipsaw_days, max_workers=max_workers)
+        window, buffer_pct = grid[objective].idxmax()
+
+        segment = values[train_start:test_end]
+        sma = pd.Series(segment).rolling(window).mean().to_numpy()
+        start = window - 1
+        c, s = segment[start:], sma[start:]
+        is_bull, prev_bull = compute_hysteresis_states(
+            c[:, None], s[:, None] * (1 + buffer_pct), s[:, None] * (1 - buffer_pct), c[0] > s[0]
+        )
+        metrics = hedge_metrics(c, is_bull, prev_bull, train_days - start, whipsaw_days)
+        folds.append({
+            'test_start': close.index[test_start],
+            'test_end': close.index[test_end - 1],
+            'window': window,
+            'buffer_pct': buffer_pct,
+            f'train_{objective}': grid.loc[(window, buffer_pct), objective],
+            **{name: value[0] for name, value in metrics.items()}
+        })
+    return pd.DataFrame(folds)
+
+def block_bootstrap_paths(log_returns, n_paths, n_days, block_size=BLOCK_SIZE, start_price=1.0, rng=None):
+    """
+    Percorsi sintetici di prezzo (percorsi x tempo) ottenuti concatenando blocchi
+    di rendimenti storici estratti a caso (moving block bootstrap).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    log_returns = np.asarray(log_returns, dtype=float)
+    n_blocks = -(-(n_days - 1) // block_size)  # ceil
+    starts = rng.integers(0, len(log_returns) - block_size + 1, size=(n_paths, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :n_days - 1]
+    paths = np.empty((n_paths, n_days))
+    paths[:, 0] = 0.0
+    np.cumsum(log_returns[idx], axis=1, out=paths[:, 1:])
+    return start_price * np.exp(paths)
+
+def _simulate_chunk(args):
+    """
+    Genera un blocco di percorsi e applica la regola di isteresi a tutti insieme
+    in un'unica passata 2-D (tempo x percorsi).
+    """
+    log_returns, n_paths, n_days, window, buffer_pct, block_size, start_price, seed, whipsaw_days = args
+    paths = block_bootstrap_paths(log_returns, n_paths, n_days, block_size, start_price,
+                                  np.random.default_rng(seed)).T
+
+    csum = np.vstack([np.zeros((1, n_paths)), np.cumsum(paths, axis=0)])
+    sma = (csum[window:] - csum[:-window]) / window  # sma[i] corrisponde a paths[window - 1 + i]
+    c = paths[window - 1:]
+    is_bull, prev_bull = compute_hysteresis_states(c, sma * (1 + buffer_pct), sma * (1 - buffer_pct), c[0] > sma[0])
+    return pd.DataFrame(hedge_metrics(c, is_bull, prev_bull, whipsaw_days=whipsaw_days))
+
+def monte_carlo(close, n_paths=10_000, n_days=5_000, window=SMA_WINDOW, buffer_pct=BUFFER_PCT,
+                block_size=BLOCK_SIZE, chunk_paths=CHUNK_PATHS, seed=0,
+                whipsaw_days=WHIPSAW_DAYS, max_workers=None):
+    """
+    Monte Carlo della regola SMA/isteresi su percorsi block-bootstrap dei rendimenti storici.
+    I percorsi vengono generati direttamente nei processi del pool, a blocchi di
+    chunk_paths: la memoria per processo non dipende da n_paths e il risultato,
+    a parità di seed, non dipende dal numero di worker.
+    Le metriche partono dalla prima barra con SMA disponibile.
+    Restituisce un DF con una riga per percorso (hedge_time_pct, switches,
+    whipsaws, pnl_hedged_pct, pnl_unhedged_pct).
+    """
+    close = np.asarray(close, dtype=float)
+    if n_days <= window:
+        raise ValueError(f"n_days ({n_days}) deve superare la finestra SMA ({window})")
+    log_returns = np.diff(np.log(close))
+    sizes = [min(chunk_paths, n_paths - i) for i in range(0, n_paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(log_returns, size, n_days, window, buffer_pct, block_size, close[-1], child, whipsaw_days)
+             for size, child in zip(sizes, seeds)]
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        results = [_simulate_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_simulate_chunk, tasks))
+    return pd.concat(results, ignore_index=True).rename_axis('path')
+
+def summarize_distribution(results, quantiles=QUANTILES):
+    """Media, deviazione standard e quantili di ciascuna metrica (una riga per metrica)."""
+    summary = results.quantile(list(quantiles)).T
+    summary.columns = [f"p{q * 100:g}" for q in quantiles]
+    summary.insert(0, 'std', results.std())
+    summary.insert(0, 'mean', results.mean())
+    return summary
+
+if __name__ == "__main__":
+    from utils import get_eodhd_data
+
+    df = get_eodhd_data("EURUSD.FOREX", days=8000)
+    folds = walk_forward(df['Close'], windows=range(50, 301, 25), buffers=[0.0025, 0.005, 0.01, 0.015, 0.02])
+    print("Walk-forward (fuori campione):")
+    print(folds.to_string(index=False))
+
+    results = monte_carlo(df['Close'], n_paths=2_000, n_days=2_500)
+    print("\nMonte Carlo (block bootstrap):")
+    print(summarize_distribution(results).round(2).to_string())
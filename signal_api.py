@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs, unquote
+import numpy as np
+import pandas as pd
+from utils import get_eodhd_data
+from strategy import apply_hedging_logic, DEFAULT_PARAMS
+from signal_log import params_hash
+
+# Servizio HTTP/JSON dei segnali per i sistemi di tesoreria e risk
+API_HOST = os.environ.get("HEDGE_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("HEDGE_API_PORT", 8080))
+# Cache in-process: voci massime e durata (secondi); il dato cambia una volta al giorno
+CACHE_SIZE = int(os.environ.get("HEDGE_API_CACHE_SIZE", 256))
+CACHE_TTL = float(os.environ.get("HEDGE_API_CACHE_TTL", 300))
+
+HISTORY_COLUMNS = ['Close', 'SMA200', 'Upper_Band', 'Lower_Band', 'State', 'Action', 'Distance_Pct']
+
+class TTLCache:
+    """Cache LRU con scadenza: al massimo `maxsize` voci, ognuna valida per `ttl` secondi."""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None or item[0] <= self.clock():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key, value):
+        self._data[key] = (self.clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+def _record(date, row):
+    """Riga del DF elaborato come dict JSON (NaN -> null)."""
+    record = {'date': date.strftime('%Y-%m-%d')}
+    for column, value in zip(HISTORY_COLUMNS, row):
+        if isinstance(value, (float, np.floating)):
+            value = None if np.isnan(value) else round(float(value), 6)
+        record[column] = value
+    return record
+
+class Response:
+    """Corpo JSON già serializzato con il suo ETag (hash del contenuto)."""
+
+    def __init__(self, status, body, max_age=0):
+        self.status = status
+        self.body = json.dumps(body, separators=(',', ':')).encode()
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:16] + '"' if status == 200 else None
+        self.max_age = max_age
+
+class SignalService:
+    """
+    Segnali per ticker sulla stessa strada del bot: get_eodhd_data -> apply_hedging_logic.
+    Due livelli di cache TTL/LRU: il DF elaborato per (ticker, parametri) e le risposte
+    già serializzate per richiesta, con ETag. Richieste concorrenti per lo stesso
+    ticker non in cache condividono un solo calcolo.
+    """
+
+    def __init__(self, fetch=get_eodhd_data, params=None, cache_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.fetch = fetch
+        self.params = dict(params or DEFAULT_PARAMS)
+        self.ttl = ttl
+        self.frames = TTLCache(cache_size, ttl)
+        self.responses = TTLCache(cache_size * 4, ttl)
+        self._pending = {}
+
+    def _compute(self, ticker, params):
+        return apply_hedging_logic(self.fetch(ticker), buffer_pct=params['buffer_pct'], window=params['window'])
+
+    async def processed(self, ticker, params):
+        """DF elaborato dalla cache, o calcolato in un thread (una sola volta per chiave)."""
+        key = (ticker, params_hash(params))
+        df = self.frames.get(key)
+        if df is not None:
+            return df
+        if key not in self._pending:
+            self._pending[key] = asyncio.ensure_future(asyncio.to_thread(self._compute, ticker, params))
+        try:
+            df = await asyncio.shield(self._pending[key])
+        finally:
+            self._pending.pop(key, None)
+        self.frames.set(key, df)
+        return df
+
+    def parse_params(self, query):
+        """Parametri della strategia dalla query string (?buffer_pct=&window=), default DEFAULT_PARAMS."""
+        params = dict(self.params)
+        if 'buffer_pct' in query:
+            params['buffer_pct'] = float(query['buffer_pct'][0])
+        if 'window' in query:
+            params['window'] = int(query['window'][0])
+        if not 0 <= params['buffer_pct'] < 1 or params['window'] < 2:
+            raise ValueError("buffer_pct deve essere in [0, 1) e window >= 2")
+        return params
+
+    def _signal_body(self, ticker, params, df):
+        last = df.iloc[-1]
+        return {
+            'ticker': ticker,
+            'params': params,
+            **_record(df.index[-1], last[HISTORY_COLUMNS].to_numpy()),
+            'hedge_active': last['State'] == 'BEAR',
+        }
+
+    def _history_body(self, ticker, params, df, query):
+        start = query.get('start', [None])[0]
+        end = query.get('end', [None])[0]
+        index = df.index
+        lo = index.searchsorted(pd.Timestamp(start)) if start else 0
+        hi = index.searchsorted(pd.Timestamp(end), side='right') if end else len(index)
+        rows = df[HISTORY_COLUMNS].iloc[lo:hi]
+        records = [_record(date, row) for date, row in zip(rows.index, rows.itertuples(index=False, name=None))]
+        return {'ticker': ticker, 'params': params, 'signals': records}
+
+    async def handle(self, path, query):
+        """
+        Instrada una GET:
+        - /health                      -> stato del servizio e della cache
+        - /signal/<ticker>             -> ultimo stato, bande, distanza e azione
+        - /signal/<ticker>/history     -> storico (?start=YYYY-MM-DD&end=YYYY-MM-DD)
+        Restituisce una Response; quelle di /signal sono messe in cache.
+        """
+        parts = [unquote(p) for p in path.strip('/').split('/') if p]
+        if parts == ['health']:
+            return Response(200, {'status': 'ok', 'cached_frames': len(self.frames),
+                                  'cache_hits': self.responses.hits, 'cache_misses': self.responses.misses})
+        if not parts or parts[0] != 'signal' or len(parts) not in (2, 3) or parts[2:] not in ([], ['history']):
+            return Response(404, {'error': 'not found'})
+
+        cache_key = (path, tuple(sorted((k, tuple(v)) for k, v in query.items())))
+        response = self.responses.get(cache_key)
+        if response is not None:
+            return response
+
+        ticker = parts[1].upper()
+        try:
+            params = self.parse_params(query)
+            history = len(parts) == 3
+            df = await self.processed(ticker, params)
+            if df.empty:
+                return Response(404, {'error': f"nessun segnale disponibile per {ticker}"})
+            body = self._history_body(ticker, params, df, query) if history else self._signal_body(ticker, params, df)
+        except ValueError as e:
+            return Response(400, {'error': str(e)})
+        except Exception as e:
+            print(f"❌ {ticker}: {e}")
+            return Response(502, {'error': f"dati non disponibili per {ticker}"})
+        response = Response(200, body, max_age=int(self.ttl))
+        self.responses.set(cache_key, response)
+        return response
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 502: 'Bad Gateway'}
+
+class SignalServer:
+    """
+    Server HTTP/1.1 minimale su asyncio (solo GET, connessioni keep-alive).
+    Con If-None-Match uguale all'ETag risponde 304 senza corpo.
+    """
+
+    def __init__(self, service, host=API_HOST, port=API_PORT):
+        self.service = service
+        self.host = host
+        self.port = port
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"📡 API segnali in ascolto su {self.url}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length', 0)):
+                    await reader.readexactly(int(headers['content-length']))
+
+                if method != 'GET':
+                    response = Response(405, {'error': 'method not allowed'})
+                else:
+                    url = urlsplit(target)
+                    response = await self.service.handle(url.path, parse_qs(url.query))
+                not_modified = response.etag is not None and headers.get('if-none-match') == response.etag
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version.strip() == 'HTTP/1.1')
+                writer.write(self._encode(response, not_modified, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _encode(response, not_modified, keep_alive):
+        status = 304 if not_modified else response.status
+        body = b'' if not_modified else response.body
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                 "Content-Type: application/json",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if response.etag:
+            lines.append(f"ETag: {response.etag}")
+            lines.append(f"Cache-Control: max-age={response.max_age}")
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(SignalServer(SignalService()).serve_forever())
+    except KeyboardInterrupt:
+        print("\n👋 API segnali arrestata")
@@ -0,0 +1,122 @@
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+import pandas as pd
+from strategy import get_bands
+
+# Storico persistente dei segnali (append-only), condiviso da bot e dashboard
+SIGNAL_LOG_PATH = os.environ.get("HEDGE_SIGNAL_LOG", os.path.join("state", "signals.db"))
+
+# Colonne del DF elaborato conservate nel registro (nell'ordine della tabella)
+COLUMNS = ['Close', 'SMA200', 'Upper_Band', 'Lower_Band', 'State', 'Action', 'Distance_Pct']
+
+def params_hash(params):
+    """Impronta breve dei parametri della strategia (window, buffer_pct, ...)."""
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+class SignalLog:
+    """
+    Registro dei segnali su SQLite, una riga per (ticker, params_hash, data).
+    Le righe non vengono mai riscritte: reinserire una data già presente non ha
+    effetto. Cambia solo lo stato di invio del report.
+    La chiave primaria (ticker, params_hash, date) è anche l'indice delle
+    ricerche per ticker e intervallo di date (tabella WITHOUT ROWID, ordinata per chiave).
+    """
+
+    def __init__(self, path=SIGNAL_LOG_PATH):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS signals (
+                ticker TEXT NOT NULL,
+                params_hash TEXT NOT NULL,
+                date TEXT NOT NULL,
+                close REAL,
+                sma REAL,
+                upper_band REAL,
+                lower_band REAL,
+                state TEXT,
+                action TEXT,
+                distance_pct REAL,
+                message_sent INTEGER NOT NULL DEFAULT 0,
+                sent_at TEXT,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (ticker, params_hash, date)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def append(self, ticker, p_hash, df):
+        """
+        Registra le righe di un DF elaborato (apply_hedging_logic o righe del motore).
+        Le date già presenti vengono ignorate. Restituisce il numero di righe nuove.
+        """
+        if df.empty:
+            return 0
+        lower, upper = get_bands(df)
+        frame = pd.DataFrame({
+            'date': pd.DatetimeIndex(df.index).strftime('%Y-%m-%d'),
+            'close': df['Close'].to_numpy(dtype=float),
+            'sma': df['SMA200'].to_numpy(dtype=float),
+            'upper_band': upper.to_numpy(dtype=float),
+            'lower_band': lower.to_numpy(dtype=float),
+            'state': df['State'].astype(str).to_numpy(),
+            'action': df['Action'].astype(str).to_numpy(),
+            'distance_pct': df['Distance_Pct'].to_numpy(dtype=float),
+        })
+        now = datetime.now().isoformat()
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO signals (ticker, params_hash, date, close, sma, upper_band, lower_band, "
+            "state, action, distance_pct, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((ticker, p_hash, *row, now) for row in frame.itertuples(index=False, name=None))
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def last_date(self, ticker, p_hash):
+        row = self.conn.execute("SELECT MAX(date) FROM signals WHERE ticker = ? AND params_hash = ?",
+                                (ticker, p_hash)).fetchone()
+        return pd.Timestamp(row[0]) if row[0] else None
+
+    def is_sent(self, ticker, p_hash, date):
+        row = self.conn.execute(
+            "SELECT message_sent FROM signals WHERE ticker = ? AND params_hash = ? AND date = ?",
+            (ticker, p_hash, pd.Timestamp(date).strftime('%Y-%m-%d'))
+        ).fetchone()
+        return bool(row and row[0])
+
+    def mark_sent(self, ticker, p_hash, date):
+        self.conn.execute(
+            "UPDATE signals SET message_sent = 1, sent_at = ? WHERE ticker = ? AND params_hash = ? AND date = ?",
+            (datetime.now().isoformat(), ticker, p_hash, pd.Timestamp(date).strftime('%Y-%m-%d'))
+        )
+        self.conn.commit()
+
+    def history(self, ticker, p_hash, start=None, end=None):
+        """
+        Storico dei segnali nell'intervallo [start, end] come DF con le colonne
+        di apply_hedging_logic (più 'Message_Sent'), indicizzato per data.
+        """
+        query = ("SELECT date, close, sma, upper_band, lower_band, state, action, distance_pct, message_sent "
+                 "FROM signals WHERE ticker = ? AND params_hash = ?")
+        args = [ticker, p_hash]
+        if start is not None:
+            query += " AND date >= ?"
+            args.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end is not None:
+            query += " AND date <= ?"
+            args.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+        rows = self.conn.execute(query + " ORDER BY date", args).fetchall()
+        df = pd.DataFrame(rows, columns=['date', *COLUMNS, 'Message_Sent'])
+        df['date'] = pd.to_datetime(df['date'])
+        df['Message_Sent'] = df['Message_Sent'].astype(bool)
+        return df.set_index('date')
+
+    def close(self):
+        self.conn.close()
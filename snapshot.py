@@ -0,0 +1,77 @@
+import os
+import json
+import zipfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from strategy import STATE_CODES, ACTION_CODES, SignalStats
+
+# Directory degli snapshot precalcolati per la dashboard
+SNAPSHOT_DIR = os.environ.get("HEDGE_SNAPSHOT_DIR", "snapshots")
+# Oltre questa età lo snapshot è considerato vecchio e la dashboard ricalcola dal vivo
+SNAPSHOT_MAX_AGE_HOURS = float(os.environ.get("HEDGE_SNAPSHOT_MAX_AGE_HOURS", 26))
+# Versione del formato: snapshot con versione diversa vengono ignorati
+FORMAT_VERSION = 3
+
+def snapshot_path(ticker, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, f"{ticker}.snapshot.npz")
+
+def write_snapshot(df, ticker, params=None, snapshot_dir=SNAPSHOT_DIR, stats=None):
+    """
+    Salva il DF elaborato da apply_hedging_logic in un file .npz compatto:
+    colonne numeriche come array float64, State/Action come codici int8 e
+    metadati (parametri e SignalStats, letti dalla dashboard senza riscandire il DF) in JSON.
+    stats: SignalStats già aggiornate (es. quelle del motore incrementale usate nel report), altrimenti ricavate da df.
+    Scrittura atomica: file temporaneo + rename.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    numeric_cols = [c for c in df.columns if c not in ('State', 'Action')]
+    meta = {
+        'version': FORMAT_VERSION,
+        'ticker': ticker,
+        'created_at': datetime.now().isoformat(),
+        'params': params or {},
+        'columns': numeric_cols,
+        'order': list(df.columns),
+        'index_name': df.index.name,
+        # Parametri del DF (es. buffer_pct dell'output compatto, senza colonne delle bande)
+        'attrs': dict(df.attrs),
+        'last_date': df.index[-1].isoformat() if len(df) else None,
+        'stats': (stats if stats is not None else SignalStats.from_frame(df)).to_dict()
+    }
+    arrays = {f"col_{i}": df[c].to_numpy(dtype=float) for i, c in enumerate(numeric_cols)}
+    arrays['index'] = df.index.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    arrays['state'] = df['State'].map(STATE_CODES.index).to_numpy(dtype=np.int8)
+    arrays['action'] = df['Action'].map(ACTION_CODES.index).to_numpy(dtype=np.int8)
+    arrays['meta'] = np.array(json.dumps(meta))
+
+    path = snapshot_path(ticker, snapshot_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+def load_snapshot(ticker, max_age_hours=SNAPSHOT_MAX_AGE_HOURS, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Carica lo snapshot della dashboard.
+    Restituisce (DF elaborato, metadati) oppure None se manca, è illeggibile, è di un'altra
+    versione o è più vecchio di max_age_hours (la dashboard ricalcola dal vivo).
+    """
+    try:
+        with np.load(snapshot_path(ticker, snapshot_dir)) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != FORMAT_VERSION:
+                return None
+            age_hours = (datetime.now() - datetime.fromisoformat(meta['created_at'])).total_seconds() / 3600
+            if max_age_hours is not None and age_hours > max_age_hours:
+                return None
+            index = pd.DatetimeIndex(data['index'].view('datetime64[ns]'), name=meta['index_name'])
+            df = pd.DataFrame({c: data[f"col_{i}"] for i, c in enumerate(meta['columns'])}, index=index)
+            df['State'] = np.array(STATE_CODES, dtype=object)[data['state']]
+            df['Action'] = np.array(ACTION_CODES, dtype=object)[data['action']]
+            df = df[meta['order']]
+            df.attrs.update(meta.get('attrs', {}))
+    except (FileNotFoundError, OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+    return df, meta
@@ -1,59 +1,570 @@
+import os
+import json
+from collections import deque
 import pandas as pd
 import numpy as np
+from episodes import EpisodeTable, build_episodes
 
-def apply_hedging_logic(df, buffer_pct=0.01):
+# Parametri di default della strategia (calibrabili per coppia con sweep.py)
+SMA_WINDOW = 200
+BUFFER_PCT = 0.01
+DEFAULT_PARAMS = {'window': SMA_WINDOW, 'buffer_pct': BUFFER_PCT}
+
+# Categorie (in ordine di codice) di State e Action nell'output compatto e negli snapshot
+STATE_CODES = ['BEAR', 'BULL']
+ACTION_CODES = ['HOLD', 'OPEN_HEDGE', 'CLOSE_HEDGE']
+# Segnali recenti conservati nelle statistiche (dashboard e report)
+LAST_SIGNALS = 10
+
+def compute_hysteresis_states(close, upper, lower, initial_bull):
+    """
+    Motore vettoriale della State Machine con isteresi.
+    Restituisce un array booleano (True = BULL) e lo stato precedente di ogni barra.
+    Accetta array 1-D (una serie) o 2-D (tempo x ticker, con initial_bull per colonna).
+
+    Lo stato cambia solo quando il prezzo esce da una banda:
+    close > upper forza BULL, close < lower forza BEAR, altrimenti si mantiene
+    lo stato precedente. Basta quindi propagare in avanti l'ultimo
+    attraversamento decisivo, partendo dallo stato iniziale.
+    """
+    close = np.asarray(close, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    lower = np.asarray(lower, dtype=float)
+    return hysteresis_from_signals(close > upper, close < lower, initial_bull)
+
+def hysteresis_from_signals(bull_trigger, bear_trigger, initial_bull):
+    """
+    State Machine a partire dai segnali decisivi già calcolati (array booleani):
+    bull_trigger forza BULL, bear_trigger forza BEAR, altrimenti si mantiene lo stato.
+    Restituisce (is_bull, prev_bull) come compute_hysteresis_states.
+    """
+    bull_trigger = np.asarray(bull_trigger, dtype=bool)
+    initial_bull = np.broadcast_to(np.asarray(initial_bull, dtype=bool), bull_trigger.shape[1:])
+    n = bull_trigger.shape[0]
+
+    # Segnale decisivo: +1 sopra la banda alta, -1 sotto la banda bassa, 0 dentro il buffer
+    signal = np.zeros(bull_trigger.shape, dtype=np.int8)
+    signal[bull_trigger] = 1
+    signal[np.asarray(bear_trigger, dtype=bool)] = -1
+
+    # Indice dell'ultimo attraversamento decisivo (forward-fill via accumulate)
+    rows = np.arange(n).reshape((n,) + (1,) * (bull_trigger.ndim - 1))
+    last_idx = np.where(signal != 0, rows, -1)
+    np.maximum.accumulate(last_idx, axis=0, out=last_idx)
+
+    last_signal = np.take_along_axis(signal, np.maximum(last_idx, 0), axis=0)
+    is_bull = np.where(last_idx >= 0, last_signal > 0, initial_bull)
+    prev_bull = np.empty(bull_trigger.shape, dtype=bool)
+    if n:
+        prev_bull[0] = initial_bull
+        prev_bull[1:] = is_bull[:-1]
+    return is_bull, prev_bull
+
+def evaluate_filters(df, sma, buffer_pct, filters):
+    """
+    Bande e segnali decisivi con i filtri di conferma (vedi filters.py), su
+    array a lunghezza piena. Ogni filtro può ridefinire le bande (bands) e/o
+    restringere i segnali (confirm): gli indicatori sono precalcolati una volta
+    e combinati elemento per elemento, poi la State Machine fa un'unica passata
+    qualunque sia il numero di filtri.
+    Restituisce (upper, lower, bull_trigger, bear_trigger).
+    """
+    upper = sma * (1 + buffer_pct)
+    lower = sma * (1 - buffer_pct)
+    for f in filters:
+        upper, lower = f.bands(df, sma, upper, lower)
+    close = df['Close'].to_numpy(dtype=float)
+    bull_trigger = close > upper
+    bear_trigger = close < lower
+    for f in filters:
+        bull_trigger, bear_trigger = f.confirm(df, bull_trigger, bear_trigger)
+    return upper, lower, bull_trigger, bear_trigger
+
+def apply_hedging_logic(df, buffer_pct=BUFFER_PCT, window=SMA_WINDOW, compact=False, float_dtype=None, copy=False,
+                        return_episodes=False, filters=None):
     """
     Applica la logica SMA 200 + Hysteresis Buffer.
     Restituisce il DF arricchito con colonne 'State', 'Action', 'Regime'.
+    window: periodo della SMA (la colonna resta 'SMA200' per compatibilità).
+    compact: 'State'/'Action' come Categorical (codici int8, categorie STATE_CODES
+        e ACTION_CODES) e bande non materializzate: si ricavano con get_bands().
+    float_dtype: es. np.float32 per le colonne di prezzo del risultato
+        (i calcoli restano in float64).
+    copy: copia anche i dati dell'input; di default il DF restituito è un nuovo
+        oggetto che condivide le colonne originali senza duplicarle.
+    return_episodes: restituisce (df, EpisodeTable) con gli episodi di regime
+        ricavati dagli stessi array della State Machine.
+    filters: filtri di conferma opzionali (es. filters.WeeklySmaFilter()),
+        applicati in un'unica passata; le bande restituite sono quelle effettive.
     """
-    df = df.copy()
-    
     # 1. Calcolo Indicatori
-    df['SMA200'] = df['Close'].rolling(window=200).mean()
-    df['Upper_Band'] = df['SMA200'] * (1 + buffer_pct)
-    df['Lower_Band'] = df['SMA200'] * (1 - buffer_pct)
-    
-    # Rimuoviamo i NaN iniziali
-    df.dropna(subset=['SMA200'], inplace=True)
-    
-    # 2. Logica a Stati (State Machine) vettoriale (iterativa per stato)
-    # Dobbiamo iterare perché lo stato al tempo T dipende dallo stato al tempo T-1
-    states = []
-    actions = []
-    
+    sma = df['Close'].rolling(window=window).mean()
+    if filters:
+        # Filtri calcolati sull'intero storico (il loro riscaldamento precede quello della SMA)
+        filtered = evaluate_filters(df, sma.to_numpy(), buffer_pct, filters)
+
+    # Rimuoviamo i NaN iniziali (senza copiare i dati se sono solo in testa)
+    valid = sma.notna().to_numpy()
+    first = int(np.argmax(valid)) if valid.any() else len(valid)
+    if valid[first:].all():
+        rows = slice(first, None)
+        df = df.iloc[rows].copy(deep=copy)
+    else:
+        rows = valid
+        df = df[rows].copy(deep=copy)
+    sma = sma.to_numpy()[rows]
+    close = df['Close'].to_numpy(dtype=float)
+
+    # 2. Logica a Stati (State Machine) vettoriale
     # Stato Iniziale (Assunto basandosi solo sulla posizione rispetto alla SMA pura)
-    current_state = 'BULL' if df['Close'].iloc[0] > df['SMA200'].iloc[0] else 'BEAR'
-    
-    for index, row in df.iterrows():
-        close = row['Close']
-        upper = row['Upper_Band']
-        lower = row['Lower_Band']
-        
-        previous_state = current_state
-        
-        # Logica di Transizione
-        if current_state == 'BULL':
-            if close < lower:
-                current_state = 'BEAR'
-        elif current_state == 'BEAR':
-            if close > upper:
-                current_state = 'BULL'
-        
-        states.append(current_state)
-        
-        # Determina Azione (Solo se cambia lo stato)
-        if current_state != previous_state:
-            if current_state == 'BEAR':
-                actions.append("OPEN_HEDGE") # Entrata in copertura
-            else:
-                actions.append("CLOSE_HEDGE") # Uscita copertura
-        else:
-            actions.append("HOLD") # Nessun cambiamento
-            
-    df['State'] = states
-    df['Action'] = actions
-    
+    initial_bull = len(df) > 0 and close[0] > sma[0]
+    if filters:
+        upper, lower, bull_trigger, bear_trigger = (a[rows] for a in filtered)
+        is_bull, prev_bull = hysteresis_from_signals(bull_trigger, bear_trigger, initial_bull)
+    else:
+        upper = sma * (1 + buffer_pct)
+        lower = sma * (1 - buffer_pct)
+        is_bull, prev_bull = compute_hysteresis_states(close, upper, lower, initial_bull)
+
+    # Determina Azione (Solo se cambia lo stato)
+    changed = is_bull != prev_bull
+    df['SMA200'] = sma
+    df.attrs['buffer_pct'] = buffer_pct
+    df.attrs['window'] = window
+    if compact:
+        df['State'] = pd.Categorical.from_codes(is_bull.astype(np.int8), categories=STATE_CODES)
+        # Codici: 0 HOLD, 1 OPEN_HEDGE (entrata in copertura), 2 CLOSE_HEDGE (uscita)
+        action_codes = np.where(changed, np.where(is_bull, 2, 1), 0).astype(np.int8)
+        df['Action'] = pd.Categorical.from_codes(action_codes, categories=ACTION_CODES)
+        if filters:
+            # Bande ridefinite dai filtri: non ricavabili dalla sola SMA
+            df['Upper_Band'] = upper
+            df['Lower_Band'] = lower
+    else:
+        df['Upper_Band'] = upper
+        df['Lower_Band'] = lower
+        df['State'] = np.where(is_bull, 'BULL', 'BEAR')
+        df['Action'] = np.where(
+            changed,
+            np.where(is_bull, "CLOSE_HEDGE", "OPEN_HEDGE"),  # Uscita / Entrata in copertura
+            "HOLD"  # Nessun cambiamento
+        )
+
     # Arricchimento per visualizzazione
-    df['Distance_Pct'] = ((df['Close'] - df['SMA200']) / df['SMA200']) * 100
-    
+    df['Distance_Pct'] = ((close - sma) / sma) * 100
+
+    if float_dtype is not None:
+        df = df.astype({c: float_dtype for c in df.columns if df[c].dtype.kind == 'f'})
+    if return_episodes:
+        return df, EpisodeTable(build_episodes(df.index, close, is_bull))
     return df
+
+def get_bands(df, buffer_pct=None):
+    """
+    Bande di isteresi (Lower_Band, Upper_Band) di un DF elaborato: le colonne
+    se presenti, altrimenti ricavate dalla SMA (output compatto).
+    buffer_pct: default quello usato da apply_hedging_logic (df.attrs) o BUFFER_PCT.
+    """
+    if 'Upper_Band' in df and 'Lower_Band' in df:
+        return df['Lower_Band'], df['Upper_Band']
+    if buffer_pct is None:
+        buffer_pct = df.attrs.get('buffer_pct', BUFFER_PCT)
+    sma = df['SMA200']
+    return (sma * (1 - buffer_pct)).rename('Lower_Band'), (sma * (1 + buffer_pct)).rename('Upper_Band')
+
+def apply_hedging_logic_wide(close, buffer_pct=BUFFER_PCT, window=SMA_WINDOW):
+    """
+    Applica la logica SMA + Hysteresis Buffer a più ticker in un'unica passata.
+    close: DF largo (date x ticker) dei prezzi di chiusura, anche con NaN
+    per date mancanti su alcuni ticker.
+    Restituisce un dict di DF larghi: 'SMA200', 'Upper_Band', 'Lower_Band',
+    'State', 'Action', 'Distance_Pct' (NaN/None dove la SMA non è disponibile).
+    """
+    # La SMA si calcola sulle sole barre valide di ciascun ticker, come nella versione singola
+    if close.notna().all().all():
+        sma = close.rolling(window=window).mean()
+    else:
+        sma = pd.DataFrame({col: close[col].dropna().rolling(window=window).mean()
+                            for col in close.columns}).reindex(close.index)
+    upper = sma * (1 + buffer_pct)
+    lower = sma * (1 - buffer_pct)
+
+    values = close.to_numpy(dtype=float)
+    sma_values = sma.to_numpy(dtype=float)
+    valid = ~np.isnan(sma_values)
+
+    # Stato Iniziale per colonna: posizione rispetto alla SMA alla prima barra valida
+    first_valid = np.argmax(valid, axis=0)
+    cols = np.arange(values.shape[1])
+    initial_bull = values[first_valid, cols] > sma_values[first_valid, cols]
+
+    is_bull, prev_bull = compute_hysteresis_states(values, upper.to_numpy(), lower.to_numpy(), initial_bull)
+    changed = is_bull != prev_bull
+
+    state = np.where(is_bull, 'BULL', 'BEAR').astype(object)
+    action = np.where(changed, np.where(is_bull, "CLOSE_HEDGE", "OPEN_HEDGE"), "HOLD").astype(object)
+    state[~valid] = None
+    action[~valid] = None
+
+    return {
+        'SMA200': sma,
+        'Upper_Band': upper,
+        'Lower_Band': lower,
+        'State': pd.DataFrame(state, index=close.index, columns=close.columns),
+        'Action': pd.DataFrame(action, index=close.index, columns=close.columns),
+        'Distance_Pct': ((close - sma) / sma) * 100
+    }
+
+class SignalStats:
+    """
+    Statistiche riassuntive dei segnali: giorni hedged, cambi di regime, durata
+    dei periodi (run) per regime e ultimi segnali.
+    Si costruisce una volta dal DF elaborato (from_frame, vettoriale) e si
+    aggiorna con update() a ogni nuova barra in O(1).
+    """
+
+    def __init__(self, last_n=LAST_SIGNALS):
+        self.total_days = 0
+        self.hedge_days = 0
+        self.switches = 0
+        self.current_state = None
+        self.current_run = 0
+        self.run_counts = {'BULL': 0, 'BEAR': 0}
+        self.longest_run = {'BULL': 0, 'BEAR': 0}
+        self.recent_signals = deque(maxlen=last_n)
+
+    def update(self, state, action, close=None, timestamp=None):
+        """Registra una barra elaborata (stato e azione di apply_hedging_logic o del motore)."""
+        self.total_days += 1
+        if state == 'BEAR':
+            self.hedge_days += 1
+        if state != self.current_state:
+            self.current_state = state
+            self.current_run = 0
+            self.run_counts[state] += 1
+        self.current_run += 1
+        self.longest_run[state] = max(self.longest_run[state], self.current_run)
+        if action is not None and action != 'HOLD':
+            self.switches += 1
+            self.recent_signals.append({
+                'date': None if timestamp is None else pd.Timestamp(timestamp).isoformat(),
+                'action': action,
+                'close': None if close is None else float(close)
+            })
+
+    @classmethod
+    def from_frame(cls, df, last_n=LAST_SIGNALS):
+        """Statistiche dell'intero DF elaborato in un'unica passata vettoriale."""
+        stats = cls(last_n)
+        bear = (df['State'] == 'BEAR').to_numpy()
+        n = len(bear)
+        if n == 0:
+            return stats
+        stats.total_days = n
+        stats.hedge_days = int(bear.sum())
+
+        # Run: tratti consecutivi con lo stesso regime
+        starts = np.flatnonzero(np.concatenate([[True], bear[1:] != bear[:-1]]))
+        lengths = np.diff(np.append(starts, n))
+        run_bear = bear[starts]
+        for state, mask in (('BEAR', run_bear), ('BULL', ~run_bear)):
+            stats.run_counts[state] = int(mask.sum())
+            stats.longest_run[state] = int(lengths[mask].max()) if mask.any() else 0
+        stats.current_state = 'BEAR' if bear[-1] else 'BULL'
+        stats.current_run = int(lengths[-1])
+
+        is_signal = (df['Action'] != 'HOLD').to_numpy()
+        stats.switches = int(is_signal.sum())
+        signals = df[is_signal].tail(last_n)
+        for timestamp, action, close in zip(signals.index, signals['Action'], signals['Close']):
+            stats.recent_signals.append({'date': timestamp.isoformat(), 'action': str(action), 'close': float(close)})
+        return stats
+
+    @property
+    def unhedged_days(self):
+        return self.total_days - self.hedge_days
+
+    @property
+    def hedge_pct(self):
+        return (self.hedge_days / self.total_days) * 100 if self.total_days else 0.0
+
+    @property
+    def avg_hedge_duration(self):
+        """Durata media (barre) dei periodi in copertura, incluso quello in corso."""
+        return self.hedge_days / self.run_counts['BEAR'] if self.run_counts['BEAR'] else 0.0
+
+    @property
+    def avg_unhedged_duration(self):
+        return self.unhedged_days / self.run_counts['BULL'] if self.run_counts['BULL'] else 0.0
+
+    @property
+    def last_signal(self):
+        return self.recent_signals[-1] if self.recent_signals else None
+
+    def to_dict(self):
+        return {
+            'total_days': self.total_days,
+            'hedge_days': self.hedge_days,
+            'switches': self.switches,
+            'current_state': self.current_state,
+            'current_run': self.current_run,
+            'run_counts': dict(self.run_counts),
+            'longest_run': dict(self.longest_run),
+            'last_n': self.recent_signals.maxlen,
+            'recent_signals': list(self.recent_signals)
+        }
+
+    def copy(self):
+        stats = SignalStats.__new__(SignalStats)
+        stats.__dict__.update(self.__dict__)
+        stats.run_counts = dict(self.run_counts)
+        stats.longest_run = dict(self.longest_run)
+        stats.recent_signals = self.recent_signals.copy()
+        return stats
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data.get('last_n', LAST_SIGNALS))
+        stats.total_days = data['total_days']
+        stats.hedge_days = data['hedge_days']
+        stats.switches = data['switches']
+        stats.current_state = data['current_state']
+        stats.current_run = data['current_run']
+        stats.run_counts.update(data['run_counts'])
+        stats.longest_run.update(data['longest_run'])
+        stats.recent_signals.extend(data['recent_signals'])
+        return stats
+
+class HysteresisEngine:
+    """
+    Versione incrementale (streaming) di apply_hedging_logic.
+    Mantiene un ring buffer degli ultimi `window` prezzi con la somma corrente
+    della SMA e il regime attuale: ogni nuova barra costa O(1).
+    L'ultima barra resta rivedibile (revise): EODHD può pubblicare una chiusura
+    provvisoria poi corretta, e il motore conserva lo stato precedente per rielaborarla.
+    Lo stato può essere salvato su disco e ripristinato tra un'esecuzione e l'altra.
+    """
+
+    SNAPSHOT_VERSION = 3
+
+    def __init__(self, window=SMA_WINDOW, buffer_pct=BUFFER_PCT):
+        self.window = window
+        self.buffer_pct = buffer_pct
+        self.prices = deque(maxlen=window)
+        self._sum = 0.0
+        self._compensation = 0.0  # Somma di Kahan per evitare drift numerico
+        self.state = None
+        self.last_timestamp = None
+        self.bars_seen = 0
+        self.stats = SignalStats()
+        self.last_rows = deque(maxlen=2)
+        self._undo = None  # stato prima dell'ultima barra (per revise)
+
+    def _add_to_sum(self, value):
+        y = value - self._compensation
+        t = self._sum + y
+        self._compensation = (t - self._sum) - y
+        self._sum = t
+
+    @property
+    def sma(self):
+        if len(self.prices) < self.window:
+            return None
+        return self._sum / self.window
+
+    def update(self, close, timestamp=None):
+        """
+        Elabora una nuova barra.
+        Restituisce (state, action, (lower_band, upper_band)); durante il
+        riscaldamento della SMA restituisce (None, None, None).
+        """
+        self._undo = {
+            'evicted': self.prices[0] if len(self.prices) == self.window else None,
+            'sum': self._sum,
+            'compensation': self._compensation,
+            'state': self.state,
+            'last_timestamp': self.last_timestamp,
+            'bars_seen': self.bars_seen,
+            'stats': self.stats.copy(),
+            'last_rows': list(self.last_rows),
+        }
+        return self._advance(close, timestamp)
+
+    def _advance(self, close, timestamp):
+        """Elabora una barra senza conservare lo stato precedente (vedi update)."""
+        close = float(close)
+        if len(self.prices) == self.window:
+            self._add_to_sum(-self.prices[0])
+        self.prices.append(close)
+        self._add_to_sum(close)
+        self.bars_seen += 1
+        if timestamp is not None:
+            self.last_timestamp = pd.Timestamp(timestamp)
+
+        sma = self.sma
+        if sma is None:
+            return None, None, None
+
+        upper = sma * (1 + self.buffer_pct)
+        lower = sma * (1 - self.buffer_pct)
+
+        # Stato Iniziale (stessa regola della versione batch)
+        if self.state is None:
+            self.state = 'BULL' if close > sma else 'BEAR'
+
+        previous_state = self.state
+        if self.state == 'BULL' and close < lower:
+            self.state = 'BEAR'
+        elif self.state == 'BEAR' and close > upper:
+            self.state = 'BULL'
+
+        if self.state != previous_state:
+            action = "OPEN_HEDGE" if self.state == 'BEAR' else "CLOSE_HEDGE"
+        else:
+            action = "HOLD"
+
+        self.stats.update(self.state, action, close, timestamp)
+
+        self.last_rows.append({
+            'date': None if timestamp is None else pd.Timestamp(timestamp).isoformat(),
+            'Close': close,
+            'SMA200': sma,
+            'Upper_Band': upper,
+            'Lower_Band': lower,
+            'State': self.state,
+            'Action': action,
+            'Distance_Pct': ((close - sma) / sma) * 100
+        })
+        return self.state, action, (lower, upper)
+
+    def revise(self, close, timestamp=None):
+        """
+        Sostituisce la chiusura dell'ultima barra elaborata (es. barra provvisoria
+        corretta dal fornitore): ripristina lo stato precedente e la rielabora.
+        """
+        if self._undo is None or not self.prices:
+            raise ValueError("Nessuna barra da rivedere")
+        undo = self._undo
+        self.prices.pop()
+        if undo['evicted'] is not None:
+            self.prices.appendleft(undo['evicted'])
+        self._sum = undo['sum']
+        self._compensation = undo['compensation']
+        self.state = undo['state']
+        self.last_timestamp = undo['last_timestamp']
+        self.bars_seen = undo['bars_seen']
+        self.stats = undo['stats']
+        self.last_rows = deque(undo['last_rows'], maxlen=2)
+        return self.update(close, timestamp)
+
+    def trigger_price(self):
+        """
+        Prezzo di chiusura della prossima barra che farebbe cambiare regime,
+        tenendo conto che anche la SMA (e quindi la banda) include quella chiusura.
+        BULL: cambio se close < trigger; BEAR: cambio se close > trigger.
+        Restituisce None durante il riscaldamento.
+        """
+        if self.state is None or len(self.prices) < self.window:
+            return None
+        # Somma delle window-1 chiusure che resteranno nella finestra
+        rest = self._sum - self.prices[0]
+        k = 1 - self.buffer_pct if self.state == 'BULL' else 1 + self.buffer_pct
+        # close < k * (rest + close) / window  <=>  close < k * rest / (window - k)
+        return k * rest / (self.window - k)
+
+    def update_many(self, df):
+        """
+        Alimenta il motore con tutte le barre di un DF (colonna 'Close').
+        Una barra con la stessa data dell'ultima elaborata la rivede se la chiusura è cambiata.
+        """
+        closes = df['Close']
+        if len(closes) and self.last_timestamp is not None and closes.index[0] == self.last_timestamp:
+            if float(closes.iloc[0]) != self.prices[-1]:
+                self.revise(closes.iloc[0], closes.index[0])
+            closes = closes.iloc[1:]
+        # Lo stato precedente serve solo per l'ultima barra
+        items = list(closes.items())
+        for timestamp, close in items[:-1]:
+            self._advance(close, timestamp)
+        for timestamp, close in items[-1:]:
+            self.update(close, timestamp)
+        return self
+
+    def last_row_series(self, offset=-1):
+        """Restituisce una riga (-1 ultima, -2 precedente) come pd.Series compatibile con il DF batch."""
+        row = dict(self.last_rows[offset])
+        date = row.pop('date')
+        return pd.Series(row, name=pd.Timestamp(date) if date else None)
+
+    @property
+    def hedge_pct(self):
+        return self.stats.hedge_pct
+
+    # --- Persistenza ---
+    def to_dict(self):
+        return {
+            'version': self.SNAPSHOT_VERSION,
+            'window': self.window,
+            'buffer_pct': self.buffer_pct,
+            'prices': list(self.prices),
+            'sum': self._sum,
+            'compensation': self._compensation,
+            'state': self.state,
+            'last_timestamp': None if self.last_timestamp is None else self.last_timestamp.isoformat(),
+            'bars_seen': self.bars_seen,
+            'stats': self.stats.to_dict(),
+            'last_rows': list(self.last_rows),
+            'undo': None if self._undo is None else {
+                **self._undo,
+                'last_timestamp': None if self._undo['last_timestamp'] is None
+                else self._undo['last_timestamp'].isoformat(),
+                'stats': self._undo['stats'].to_dict(),
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        engine = cls(window=data['window'], buffer_pct=data['buffer_pct'])
+        engine.prices.extend(data['prices'])
+        engine._sum = data['sum']
+        engine._compensation = data['compensation']
+        engine.state = data['state']
+        if data['last_timestamp']:
+            engine.last_timestamp = pd.Timestamp(data['last_timestamp'])
+        engine.bars_seen = data['bars_seen']
+        engine.stats = SignalStats.from_dict(data['stats'])
+        engine.last_rows.extend(data['last_rows'])
+        undo = data.get('undo')
+        if undo is not None:
+            engine._undo = {
+                **undo,
+                'last_timestamp': pd.Timestamp(undo['last_timestamp']) if undo['last_timestamp'] else None,
+                'stats': SignalStats.from_dict(undo['stats']),
+            }
+        return engine
+
+    def save(self, path):
+        """Salva lo snapshot in JSON con scrittura atomica (write-then-rename)."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, window=SMA_WINDOW, buffer_pct=BUFFER_PCT):
+        """
+        Ripristina lo snapshot da disco.
+        Restituisce None se il file manca, è illeggibile o usa parametri diversi.
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if (data.get('version') != cls.SNAPSHOT_VERSION
+                or data.get('window') != window
+                or data.get('buffer_pct') != buffer_pct):
+            return None
+        return cls.from_dict(data)
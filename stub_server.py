@@ -0,0 +1,147 @@
+import json
+import time
+import zlib
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+
+def make_eod_rows(n_rows, seed=42, end=None, start_price=1.10, daily_vol=0.006):
+    """Barre giornaliere sintetiche nel formato JSON di EODHD (/api/eod)."""
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, daily_vol, n_rows)))
+    end = pd.Timestamp(end or pd.Timestamp.now()).normalize()
+    dates = pd.date_range(end=end, periods=n_rows, freq="D").strftime('%Y-%m-%d')
+    return pd.DataFrame({
+        'date': dates, 'open': close, 'high': close * 1.002, 'low': close * 0.998,
+        'close': close, 'adjusted_close': close, 'volume': 0
+    })
+
+class StubServer:
+    """
+    Server HTTP locale che imita EODHD e l'API Telegram, per benchmark e prove
+    senza rete né API key reali.
+    - GET  /api/eod/<ticker>?from=YYYY-MM-DD&to=YYYY-MM-DD → barre sintetiche (una serie per ticker)
+    - GET  /api/real-time/<ticker>           → ultima chiusura più un random walk per richiesta
+    - POST /bot<token>/sendMessage           → {"ok": true}, messaggi conservati in `messages`
+    latency: ritardo artificiale per richiesta (secondi).
+    fail_every: se > 0, una richiesta ogni fail_every risponde 500 (errori iniettati).
+    end: data dell'ultima barra delle serie (default oggi), fissa per verifiche riproducibili.
+    Le richieste /api/eod ricevute restano in `queries` come (ticker, from, to).
+    """
+
+    def __init__(self, n_rows=2000, latency=0.0, fail_every=0, end=None):
+        self.n_rows = n_rows
+        self.end = end
+        self.latency = latency
+        self.fail_every = fail_every
+        self.requests = 0
+        self.messages = []
+        self.queries = []
+        self._series = {}
+        self._records = {}
+        self._quotes = {}
+        self._rng = np.random.default_rng(0)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def series(self, ticker):
+        with self._lock:
+            if ticker not in self._series:
+                self._series[ticker] = make_eod_rows(self.n_rows, seed=zlib.crc32(ticker.encode()), end=self.end)
+            return self._series[ticker]
+
+    def records(self, ticker, start=None, end=None):
+        """Barre JSON tra start e end (inclusi): righe pre-serializzate, intervallo per bisezione sulle date."""
+        if ticker not in self._records:
+            rows = self.series(ticker)
+            with self._lock:
+                self._records[ticker] = (list(rows['date']), rows.to_dict(orient='records'))
+        dates, records = self._records[ticker]
+        lo = bisect.bisect_left(dates, start) if start else 0
+        hi = bisect.bisect_right(dates, end) if end else len(dates)
+        return records[lo:hi]
+
+    def quote(self, ticker, step_vol=0.0005):
+        """Quotazione corrente: parte dall'ultima chiusura e si muove a ogni richiesta."""
+        last_close = self.series(ticker)['close'].iloc[-1]
+        with self._lock:
+            price = self._quotes.get(ticker, last_close) * np.exp(self._rng.normal(0, step_vol))
+            self._quotes[ticker] = price
+        return {'code': ticker, 'timestamp': int(time.time()), 'close': float(price)}
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            return self.fail_every > 0 and self.requests % self.fail_every == 0
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # il client ha già chiuso (es. timeout lato client)
+
+            def do_GET(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlparse(self.path)
+                if stub._should_fail():
+                    return self._reply(500, {'error': 'stub failure'})
+                if url.path.startswith('/api/real-time/'):
+                    return self._reply(200, stub.quote(url.path.rsplit('/', 1)[-1]))
+                if not url.path.startswith('/api/eod/'):
+                    return self._reply(404, {'error': 'not found'})
+                query = parse_qs(url.query)
+                ticker, start, end = (url.path.rsplit('/', 1)[-1],
+                                      query.get('from', [None])[0], query.get('to', [None])[0])
+                with stub._lock:
+                    stub.queries.append((ticker, start, end))
+                self._reply(200, stub.records(ticker, start, end))
+
+            def do_POST(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if stub._should_fail():
+                    return self._reply(500, {'ok': False})
+                with stub._lock:
+                    stub.messages.append(json.loads(body or b'{}'))
+                self._reply(200, {'ok': True})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
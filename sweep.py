@@ -0,0 +1,88 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from strategy import compute_hysteresis_states
+
+# Un cambio di regime annullato entro questo numero di barre conta come whipsaw
+WHIPSAW_DAYS = 20
+
+def hedge_metrics(close, is_bull, prev_bull, offset=0, whipsaw_days=WHIPSAW_DAYS):
+    """
+    Metriche di una o più colonne (tempo x colonne) dalla barra `offset` in poi:
+    hedge_time_pct, switches, whipsaws, pnl_hedged_pct, pnl_unhedged_pct.
+    close: 1-D (stessa serie per tutte le colonne) o 2-D (una serie per colonna).
+    """
+    bull = is_bull[offset:]
+    changed = (is_bull != prev_bull)[offset:]
+    n = bull.shape[0]
+
+    # Whipsaw: cambio di stato a meno di whipsaw_days barre dal cambio precedente
+    rows = np.arange(n)[:, None]
+    last_switch = np.maximum.accumulate(np.where(changed, rows, -1), axis=0)
+    prev_switch = np.vstack([np.full((1, bull.shape[1]), -1), last_switch[:-1]])
+    whipsaws = changed & (prev_switch >= 0) & (rows - prev_switch <= whipsaw_days)
+
+    # P&L dell'esposizione lunga EUR/USD (quella protetta dalla put del collar):
+    # coperta (rendimento nullo) quando il giorno precedente era BEAR
+    log_ret = np.diff(np.log(close[offset:]), axis=0)
+    if log_ret.ndim == 1:
+        log_ret = log_ret[:, None]
+
+    return {
+        'hedge_time_pct': (~bull).mean(axis=0) * 100,
+        'switches': changed.sum(axis=0),
+        'whipsaws': whipsaws.sum(axis=0),
+        'pnl_hedged_pct': np.expm1((log_ret * bull[:-1]).sum(axis=0)) * 100,
+        'pnl_unhedged_pct': np.expm1(np.broadcast_to(log_ret.sum(axis=0), bull.shape[1:])) * 100
+    }
+
+def _evaluate_window(csum, close, window, buffers, eval_start, whipsaw_days):
+    """
+    Valuta tutti i buffer per una singola finestra SMA in una passata 2-D
+    (tempo x buffer). La SMA si ricava dalla somma cumulativa condivisa.
+    """
+    start = window - 1
+    sma = (csum[window:] - csum[:-window]) / window  # sma[i] corrisponde a close[start + i]
+    c = close[start:]
+    b = np.asarray(buffers, dtype=float)
+
+    upper = sma[:, None] * (1 + b)
+    lower = sma[:, None] * (1 - b)
+    prices = np.broadcast_to(c[:, None], upper.shape)
+    is_bull, prev_bull = compute_hysteresis_states(prices, upper, lower, c[0] > sma[0])
+
+    # Metriche sul periodo comune a tutte le finestre
+    metrics = hedge_metrics(c, is_bull, prev_bull, eval_start - start, whipsaw_days)
+    return pd.DataFrame({'window': window, 'buffer_pct': b, **metrics})
+
+def _evaluate_window_task(args):
+    return _evaluate_window(*args)
+
+def run_parameter_sweep(close, windows, buffers, whipsaw_days=WHIPSAW_DAYS, max_workers=None):
+    """
+    Griglia finestre SMA x buffer di isteresi.
+    close: pd.Series (o array) dei prezzi di chiusura.
+    Tutte le celle sono valutate sullo stesso periodo (dalla finestra più lunga in poi)
+    per renderle confrontabili. max_workers=1 esegue senza process pool.
+    Restituisce un DF indicizzato per (window, buffer_pct) con hedge_time_pct,
+    switches, whipsaws, pnl_hedged_pct, pnl_unhedged_pct.
+    """
+    close = np.asarray(close, dtype=float)
+    windows = sorted(set(int(w) for w in windows))
+    if windows[-1] > len(close) - 1:
+        raise ValueError(f"Storico insufficiente: {len(close)} barre per una SMA {windows[-1]}")
+
+    # Un'unica somma cumulativa condivisa da tutte le finestre
+    csum = np.concatenate([[0.0], np.cumsum(close)])
+    eval_start = windows[-1] - 1
+    tasks = [(csum, close, w, list(buffers), eval_start, whipsaw_days) for w in windows]
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        results = [_evaluate_window_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_evaluate_window_task, tasks))
+
+    return pd.concat(results, ignore_index=True).set_index(['window', 'buffer_pct'])
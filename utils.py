@@ -1,39 +1,44 @@
 import os
-import requests
 import pandas as pd
-import streamlit as st
 from datetime import datetime, timedelta
+from price_cache import PriceCache
+from data_quality import validate_prices
+from http_client import get_client
+# Secrets da Streamlit (solo dentro la dashboard), variabili d'ambiente o .env: vedi config.py
+from config import get_secret
 
-# Funzione per recuperare i secrets in modo ibrido (Streamlit o OS Environment)
-def get_secret(key):
-    # Prova a prendere da Streamlit Secrets (se siamo in app)
-    try:
-        return st.secrets[key]
-    except (FileNotFoundError, AttributeError, KeyError):
-        # Altrimenti prova da variabili d'ambiente (se siamo in GitHub Actions)
-        return os.environ.get(key)
+# Endpoint EODHD (sovrascrivibile per puntare a un server locale di test)
+EODHD_BASE_URL = os.environ.get("EODHD_BASE_URL", "https://eodhd.com/api")
+TELEGRAM_BASE_URL = os.environ.get("TELEGRAM_BASE_URL", "https://api.telegram.org")
 
-def get_eodhd_data(ticker="EURUSD.FOREX", days=2000):
+def _download_eodhd(ticker, from_date, to_date=None):
     """
-    Scarica i dati storici da EODHD.
-    ticker: es. 'EURUSD.FOREX'
+    Chiamata HTTP a EODHD: scarica le barre giornaliere da from_date in poi
+    (fino a to_date incluso, se indicata).
     """
     api_key = get_secret("EODHD_API_KEY")
     if not api_key:
         raise ValueError("EODHD_API_KEY non trovata nei secrets.")
 
-    base_url = f"https://eodhd.com/api/eod/{ticker}"
+    base_url = f"{EODHD_BASE_URL}/eod/{ticker}"
     params = {
         "api_token": api_key,
         "fmt": "json",
         "order": "a", # ascendente
-        "from": (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        "from": pd.Timestamp(from_date).strftime('%Y-%m-%d')
     }
+    if to_date is not None:
+        params["to"] = pd.Timestamp(to_date).strftime('%Y-%m-%d')
 
-    response = requests.get(base_url, params=params)
+    # Client condiviso: pool di connessioni, rate limit, retry con backoff e timeout
+    response = get_client().get(base_url, params=params)
     
     if response.status_code == 200:
         data = response.json()
+        if not data:
+            # Nessuna nuova barra nel periodo richiesto
+            return pd.DataFrame(columns=['Close', 'high', 'low', 'open', 'volume'],
+                                index=pd.DatetimeIndex([], name='date'))
         df = pd.DataFrame(data)
         df['date'] = pd.to_datetime(df['date'])
         df.set_index('date', inplace=True)
@@ -44,26 +49,123 @@ def get_eodhd_data(ticker="EURUSD.FOREX", days=2000):
     else:
         raise ConnectionError(f"Errore API EODHD: {response.status_code} - {response.text}")
 
-def send_telegram_message(message):
+def _check_quality(ticker, df, policies=None):
+    """Gate di qualità prima della strategia: corregge o blocca secondo le policy (vedi data_quality.py)."""
+    df, report = validate_prices(df, policies)
+    if not report.ok:
+        print(f"⚠️ Qualità dati {ticker}: {report.summary()}")
+    return df
+
+def get_eodhd_data(ticker="EURUSD.FOREX", days=2000, start_date=None,
+                   force_refresh=False, use_cache=True, cache=None, validate=True, quality_policies=None):
     """
-    Invia un messaggio al bot Telegram configurato.
+    Scarica i dati storici da EODHD, passando per la cache locale su disco.
+    ticker: es. 'EURUSD.FOREX'
+    start_date: se indicata (datetime o 'YYYY-MM-DD') sostituisce la finestra `days`
+    force_refresh: ignora la cache e riscarica l'intero periodo richiesto
+    use_cache: False per la sola chiamata API (comportamento originale)
+    validate: controlli di qualità sui dati scaricati prima di restituirli e
+        salvarli in cache; con policy 'abort' solleva DataQualityError
+    quality_policies: policy per controllo (default data_quality.POLICIES)
+
+    Con la cache viene richiesto solo l'intervallo successivo all'ultima barra
+    salvata; se il file è ancora fresco (policy di staleness) non si chiama l'API.
     """
+    if start_date is None:
+        start_date = datetime.now() - timedelta(days=days)
+    start_date = pd.Timestamp(start_date).normalize()
+
+    if not use_cache:
+        df = _download_eodhd(ticker, start_date)
+        return _check_quality(ticker, df, quality_policies) if validate else df
+
+    cache = cache or PriceCache()
+    cached = cache.read(ticker)
+    covers_start = (not force_refresh and cached is not None and not cached.empty
+                    and cached.index[0] <= start_date)
+
+    if covers_start and cache.is_fresh(ticker):
+        # Già validato prima di essere scritto in cache
+        return cached[cached.index >= start_date]
+
+    if covers_start:
+        # Riscarichiamo anche l'ultima barra in cache: potrebbe essere stata parziale
+        new_bars = _download_eodhd(ticker, cached.index[-1])
+        df = cache.merge(cached, new_bars)
+    else:
+        df = cache.merge(cached, _download_eodhd(ticker, start_date))
+
+    # Il gate precede la scrittura: con 'abort' la cache resta quella dell'ultima esecuzione valida
+    if validate:
+        df = _check_quality(ticker, df, quality_policies)
+    cache.write(ticker, df)
+    return df[df.index >= start_date]
+
+def get_realtime_quote(ticker="EURUSD.FOREX"):
+    """
+    Ultima quotazione (ritardata) da EODHD /real-time.
+    Restituisce (timestamp, prezzo).
+    """
+    api_key = get_secret("EODHD_API_KEY")
+    if not api_key:
+        raise ValueError("EODHD_API_KEY non trovata nei secrets.")
+
+    response = get_client().get(f"{EODHD_BASE_URL}/real-time/{ticker}",
+                                params={"api_token": api_key, "fmt": "json"})
+    if response.status_code != 200:
+        raise ConnectionError(f"Errore API EODHD: {response.status_code} - {response.text}")
+    data = response.json()
+    price = data.get("close")
+    if price in (None, "NA"):
+        raise ValueError(f"Quotazione non disponibile per {ticker}")
+    return pd.Timestamp(int(data["timestamp"]), unit="s"), float(price)
+
+def _telegram_request(message, chat_id=None, parse_mode="Markdown"):
+    """URL e payload di sendMessage, oppure None se mancano token o chat ID."""
     bot_token = get_secret("TELEGRAM_BOT_TOKEN")
-    chat_id = get_secret("TELEGRAM_CHAT_ID")
+    chat_id = chat_id or get_secret("TELEGRAM_CHAT_ID")
 
     if not bot_token or not chat_id:
         print("Telegram Token o Chat ID mancanti.")
-        return False
+        return None
 
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    url = f"{TELEGRAM_BASE_URL}/bot{bot_token}/sendMessage"
     payload = {
         "chat_id": chat_id,
         "text": message,
-        "parse_mode": "Markdown"
+        "parse_mode": parse_mode
     }
+    return url, payload
+
+def send_telegram_message(message, chat_id=None, parse_mode="Markdown"):
+    """
+    Invia un messaggio al bot Telegram configurato.
+    chat_id: destinatario (default: TELEGRAM_CHAT_ID dai secrets).
+    parse_mode: "Markdown" o "HTML" (vedi report.PARSE_MODES).
+    """
+    request = _telegram_request(message, chat_id, parse_mode)
+    if request is None:
+        return False
+    url, payload = request
+
+    try:
+        response = get_client().post(url, json=payload)
+        return response.status_code == 200
+    except Exception as e:
+        print(f"Errore invio Telegram: {e}")
+        return False
+
+async def send_telegram_message_async(message, chat_id=None, parse_mode="Markdown"):
+    """
+    Versione asyncio di send_telegram_message, per invii concorrenti a molte chat.
+    """
+    request = _telegram_request(message, chat_id, parse_mode)
+    if request is None:
+        return False
+    url, payload = request
 
     try:
-        response = requests.post(url, json=payload)
+        response = await get_client().apost(url, json=payload)
         return response.status_code == 200
     except Exception as e:
         print(f"Errore invio Telegram: {e}")
@@ -0,0 +1,149 @@
+import os
+import time
+import pandas as pd
+from utils import get_realtime_quote, send_telegram_message
+from daily_bot_runner import TICKER, STATE_DIR, load_engine
+from report import format_number
+
+# Intervallo di polling: minimo vicino al trigger, massimo quando il prezzo è lontano
+MIN_INTERVAL = int(os.environ.get("WATCH_MIN_INTERVAL", 60))      # secondi
+MAX_INTERVAL = int(os.environ.get("WATCH_MAX_INTERVAL", 3600))    # secondi
+# Distanza % dal trigger sotto la quale si usa MIN_INTERVAL e oltre la quale MAX_INTERVAL
+NEAR_PCT = 0.25
+FAR_PCT = 2.0
+# Quotazioni consecutive oltre il trigger per considerare confermato l'attraversamento
+CONFIRM_POLLS = 2
+
+def poll_interval(distance_pct, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                  near_pct=NEAR_PCT, far_pct=FAR_PCT):
+    """Secondi fino alla prossima quotazione, interpolati linearmente sulla distanza dal trigger."""
+    distance = abs(distance_pct)
+    if distance <= near_pct:
+        return min_interval
+    if distance >= far_pct:
+        return max_interval
+    fraction = (distance - near_pct) / (far_pct - near_pct)
+    return min_interval + fraction * (max_interval - min_interval)
+
+def distance_to_trigger(price, trigger, state):
+    """
+    Margine % prima del cambio di regime: positivo finché il prezzo resta
+    dal lato del regime attuale, negativo quando il trigger è stato superato.
+    """
+    if state == 'BULL':
+        return (price - trigger) / price * 100
+    return (trigger - price) / price * 100
+
+def build_alert_message(ticker, state, price, trigger, timestamp):
+    """Messaggio Telegram di attraversamento intraday (da confermare in chiusura)."""
+    if state == 'BULL':
+        title = "🚨 *BANDA INFERIORE ATTRAVERSATA*"
+        action = "Attivare la copertura (*COLLAR*) se la chiusura lo conferma"
+    else:
+        title = "✅ *BANDA SUPERIORE ATTRAVERSATA*"
+        action = "Rimuovere la copertura se la chiusura lo conferma"
+    return (
+        "━━━━━━━━━━━━━━━━━━━━━━\n"
+        "⚡ *KRITERION QUANT*\n"
+        "      Alert Intraday\n"
+        "━━━━━━━━━━━━━━━━━━━━━━\n\n"
+        f"{title}\n\n"
+        f"💶 *{ticker}:*  `{format_number(price)}`\n"
+        f"🎯 *Trigger:*  `{format_number(trigger)}`\n"
+        f"🕒 {timestamp:%d/%m/%Y %H:%M} UTC\n\n"
+        f"   📌 {action}"
+    )
+
+class BandWatcher:
+    """
+    Sorveglianza intraday di un ticker: il motore di isteresi resta in memoria e
+    ogni quotazione viene confrontata con il prezzo di chiusura che farebbe
+    cambiare regime (HysteresisEngine.trigger_price), costante fino alla
+    prossima barra giornaliera. Ogni controllo è O(1).
+    L'alert parte una sola volta per barra e regime, dopo `confirm_polls`
+    quotazioni consecutive oltre il trigger.
+    """
+
+    def __init__(self, engine, ticker=TICKER, confirm_polls=CONFIRM_POLLS, notify=send_telegram_message):
+        self.engine = engine
+        self.ticker = ticker
+        self.confirm_polls = confirm_polls
+        self.notify = notify
+        self.beyond = 0
+        self.alerts_sent = 0
+        self._alerted_for = None
+
+    def set_engine(self, engine):
+        """Sostituisce il motore dopo l'arrivo di nuove barre giornaliere."""
+        if engine.last_timestamp != self.engine.last_timestamp:
+            self.beyond = 0
+        self.engine = engine
+
+    def check(self, timestamp, price):
+        """
+        Valuta una quotazione.
+        Restituisce un dict con trigger, distanza %, intervallo di polling
+        suggerito e se è stato inviato un alert.
+        """
+        trigger = self.engine.trigger_price()
+        if trigger is None:
+            return {'trigger': None, 'distance_pct': None, 'interval': MAX_INTERVAL, 'alert': False}
+
+        state = self.engine.state
+        distance = distance_to_trigger(price, trigger, state)
+        self.beyond = self.beyond + 1 if distance < 0 else 0
+
+        alert = False
+        alert_key = (self.engine.last_timestamp, state)
+        if self.beyond >= self.confirm_polls and self._alerted_for != alert_key:
+            alert = bool(self.notify(build_alert_message(self.ticker, state, price, trigger, timestamp)))
+            if alert:
+                self._alerted_for = alert_key
+                self.alerts_sent += 1
+
+        return {'trigger': trigger, 'distance_pct': distance, 'interval': poll_interval(distance), 'alert': alert}
+
+def run_watch(ticker=TICKER, state_path=None, max_polls=None, quote=get_realtime_quote, sleep=time.sleep):
+    """
+    Modalità watch: ripristina il motore dallo snapshot del bot giornaliero,
+    poi interroga le quotazioni con frequenza adattiva. Al cambio di giorno
+    il motore viene riallineato scaricando solo le nuove barre.
+    Lo snapshot su disco resta di proprietà del bot giornaliero (qui solo letto).
+    """
+    state_path = state_path or os.path.join(STATE_DIR, f"{ticker}.json")
+    engine, _ = load_engine(ticker, state_path)
+    watcher = BandWatcher(engine, ticker)
+    quote_day = None
+    polls = 0
+    interval = MIN_INTERVAL
+
+    trigger = engine.trigger_price()
+    # Durante il warm-up (meno di `window` barre) il trigger non esiste ancora
+    print(f"👁️ Watch {ticker}: regime {engine.state}, trigger {format_number(trigger) if trigger is not None else 'n/d'}")
+    while max_polls is None or polls < max_polls:
+        polls += 1
+        try:
+            timestamp, price = quote(ticker)
+            if quote_day is not None and timestamp.normalize() != quote_day:
+                engine, n_new = load_engine(ticker, state_path)
+                watcher.set_engine(engine)
+                print(f"   ↻ Nuovo giorno: {n_new} nuove barre, regime {engine.state}")
+            quote_day = timestamp.normalize()
+
+            result = watcher.check(timestamp, price)
+            interval = result['interval']
+            # Quotazione ferma (mercato chiuso): inutile interrogare spesso
+            if pd.Timestamp.now(tz='UTC').tz_localize(None) - timestamp > pd.Timedelta(seconds=MAX_INTERVAL):
+                interval = MAX_INTERVAL
+            if result['trigger'] is not None:
+                print(f"   {timestamp:%H:%M} {format_number(price)} → trigger {format_number(result['trigger'])} "
+                      f"({result['distance_pct']:+.2f}%), prossimo controllo tra {interval:.0f}s"
+                      + (" 🚨 alert inviato" if result['alert'] else ""))
+        except Exception as e:
+            print(f"   ✗ Errore quotazione: {e}")
+        if max_polls is None or polls < max_polls:
+            sleep(interval)
+    return watcher
+
+if __name__ == "__main__":
+    run_watch()